@@ -0,0 +1,132 @@
+"""
+Response compression negotiated from Accept-Encoding: brotli when the client
+accepts it and the brotli package is installed, otherwise gzip.
+
+Only complete bodies are compressed. Streaming responses (exports, the SSE
+feed, LLM chat) carry no Content-Length; they pass through untouched as soon
+as their start message arrives, because compressing them would hold back
+chunks the client is waiting for. Bodies under COMPRESSION_MIN_BYTES, or
+that don't get smaller, are sent as they are. Compression of large bodies runs
+in a worker thread so it doesn't stall the event loop.
+
+A compressed response's ETag is made weak, since its bytes differ from the
+uncompressed representation; If-None-Match comparisons ignore the W/ prefix.
+"""
+
+from typing import Optional
+import gzip
+import os
+
+from anyio import to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Bodies larger than this are compressed off the event loop
+COMPRESSION_THREAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "application/geo+json", "application/x-ndjson", "text/")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    if BROTLI_AVAILABLE and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def _compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "")
+    return (
+        "content-encoding" not in headers
+        and content_type.startswith(COMPRESSIBLE_TYPES)
+        and not content_type.startswith("text/event-stream")
+    )
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Pure ASGI, so it can tell a complete body from the first chunk of a stream."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if not _compressible(headers) or "content-length" not in headers:
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if int(headers["content-length"]) < self.minimum_size:
+                    await send(message)
+                    return
+                # Held back until the body arrives, since compressing changes the headers
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            headers = MutableHeaders(raw=pending["headers"])
+            body = message.get("body", b"")
+            if message.get("more_body"):
+                await send(pending)
+                await send(message)
+                return
+            if len(body) > COMPRESSION_THREAD_BYTES:
+                compressed = await to_thread.run_sync(_compress, body, encoding)
+            else:
+                compressed = _compress(body, encoding)
+            if len(compressed) >= len(body):
+                await send(pending)
+                await send(message)
+                return
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(pending)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
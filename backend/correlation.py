@@ -0,0 +1,260 @@
+"""
+Groups sightings that are probably the same drone: two sightings are linked
+when they are within CORRELATION_DISTANCE_KM and CORRELATION_WINDOW_MINUTES of
+each other, and a group is everything connected through such links. Reports of
+one incident collapse into a tight group; a drone moving across several
+observers chains into a track.
+
+Neighbours are found through a grid bucketed by time window and by cells at
+least the link distance across, so a new sighting is compared with the handful
+of sightings in the 3 x 3 x 3 buckets around it rather than with every row.
+Inserts merge the groups they touch; a delete re-clusters only the group it
+left. Like the tile pyramid, the engine follows this process's writes, and
+sighting_sync picks up the other workers' writes.
+"""
+
+from collections import Counter
+from datetime import datetime, timezone
+from math import cos, floor, radians
+from typing import Dict, List, Optional, Set, Tuple
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+import database, schemas, sighting_sync, spatial_index
+
+CORRELATION_DISTANCE_KM = float(os.getenv("CORRELATION_DISTANCE_KM", "5"))
+CORRELATION_WINDOW_MINUTES = float(os.getenv("CORRELATION_WINDOW_MINUTES", "15"))
+
+Key = Tuple[int, int, int]
+# (epoch seconds, lat, lon, lat in radians, lon in radians, cos(lat), unit)
+Point = Tuple[float, float, float, float, float, float, Optional[str]]
+
+
+class Group:
+    __slots__ = ("members", "lat_sum", "lon_sum", "start", "end")
+
+    def __init__(self):
+        self.members: Set[int] = set()
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.start = float("inf")
+        self.end = float("-inf")
+
+    def add(self, sighting_id: int, point: Point) -> None:
+        self.members.add(sighting_id)
+        self.lat_sum += point[1]
+        self.lon_sum += point[2]
+        self.start = min(self.start, point[0])
+        self.end = max(self.end, point[0])
+
+    def absorb(self, other: "Group") -> None:
+        self.members |= other.members
+        self.lat_sum += other.lat_sum
+        self.lon_sum += other.lon_sum
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+
+
+class CorrelationEngine(sighting_sync.Mirror):
+    def __init__(self, distance_km: float = CORRELATION_DISTANCE_KM,
+                 window_minutes: float = CORRELATION_WINDOW_MINUTES):
+        super().__init__()
+        self.distance_km = distance_km
+        self.window_s = window_minutes * 60.0
+        self.cell_deg = distance_km / spatial_index.KM_PER_DEG
+        self._lon_cells = max(int(360.0 / self.cell_deg), 1)
+        self._buckets: Dict[Key, Set[int]] = {}
+        self._points: Dict[int, Point] = {}
+        self._keys: Dict[int, Key] = {}
+        self._group_of: Dict[int, Group] = {}
+        # Groups of two or more, which are all the listing ever shows
+        self._multi: Set[Group] = set()
+
+    def _key(self, t: float, lat: float, lon: float) -> Key:
+        return (
+            int(floor(t / self.window_s)),
+            int(floor((lat + 90.0) / self.cell_deg)),
+            int(floor((lon + 180.0) / self.cell_deg)) % self._lon_cells,
+        )
+
+    def _neighbours(self, point: Point, among: Optional[Set[int]] = None) -> List[int]:
+        """Ids linked to a point: close enough in both space and time."""
+        t, lat, lon, lat_r, lon_r, cos_r, _ = point
+        bt, cy, cx = self._key(t, lat, lon)
+        # Longitude cells shrink towards the poles, so reach further east and west there,
+        # using the narrowest latitude a neighbour can be at
+        edge_cos = cos(radians(min(89.999, abs(lat) + self.cell_deg)))
+        reach = min(int(1.0 / max(edge_cos, 1e-6)) + 1, self._lon_cells // 2)
+        found = []
+        for b in (bt - 1, bt, bt + 1):
+            for y in (cy - 1, cy, cy + 1):
+                for dx in range(-reach, reach + 1):
+                    for other in self._buckets.get((b, y, (cx + dx) % self._lon_cells), ()):
+                        if among is not None and other not in among:
+                            continue
+                        o = self._points[other]
+                        if abs(o[0] - t) <= self.window_s and \
+                                spatial_index._distance(lat_r, lon_r, cos_r, o[3], o[4], o[5]) <= self.distance_km:
+                            found.append(other)
+        return found
+
+    def _place(self, sighting_id: int, point: Point) -> None:
+        key = self._key(point[0], point[1], point[2])
+        self._points[sighting_id] = point
+        self._keys[sighting_id] = key
+        self._buckets.setdefault(key, set()).add(sighting_id)
+
+    def _unplace(self, sighting_id: int) -> None:
+        self._points.pop(sighting_id)
+        key = self._keys.pop(sighting_id)
+        bucket = self._buckets[key]
+        bucket.discard(sighting_id)
+        if not bucket:
+            del self._buckets[key]
+
+    def _set_group(self, group: Group) -> None:
+        for member in group.members:
+            self._group_of[member] = group
+        if len(group.members) > 1:
+            self._multi.add(group)
+        else:
+            self._multi.discard(group)
+
+    def add(self, sighting_id: int, when: datetime, lat: float, lon: float, unit: Optional[str]) -> None:
+        """Insert or move a sighting. Safe to call more than once for the same id."""
+        lat_r = radians(lat)
+        point = (when.timestamp(), lat, lon, lat_r, radians(lon), cos(lat_r), unit)
+        with self._lock:
+            self._record("add", sighting_id, when, lat, lon, unit)
+            old = self._points.get(sighting_id)
+            if old == point:
+                return
+            if old is not None:
+                self._remove(sighting_id)
+            groups = sorted({self._group_of[n] for n in self._neighbours(point)},
+                            key=lambda g: len(g.members), reverse=True)
+            self._place(sighting_id, point)
+            # Merge into the largest touching group, so relabelling costs the smaller groups' sizes
+            group = groups[0] if groups else Group()
+            for other in groups[1:]:
+                self._multi.discard(other)
+                group.absorb(other)
+                for member in other.members:
+                    self._group_of[member] = group
+            group.add(sighting_id, point)
+            self._group_of[sighting_id] = group
+            if len(group.members) > 1:
+                self._multi.add(group)
+
+    def remove(self, sighting_id: int) -> None:
+        with self._lock:
+            self._record("remove", sighting_id)
+            self._remove(sighting_id)
+
+    def _remove(self, sighting_id: int) -> None:
+        group = self._group_of.pop(sighting_id, None)
+        if group is None:
+            return
+        self._unplace(sighting_id)
+        self._multi.discard(group)
+        # The group may have been held together by this sighting; split what is left
+        remaining = group.members - {sighting_id}
+        while remaining:
+            seed = remaining.pop()
+            component = Group()
+            component.add(seed, self._points[seed])
+            frontier = [seed]
+            while frontier:
+                for other in self._neighbours(self._points[frontier.pop()], remaining):
+                    remaining.discard(other)
+                    component.add(other, self._points[other])
+                    frontier.append(other)
+            self._set_group(component)
+
+    def add_row(self, row) -> None:
+        self.add(row.id, row.time, row.latitude, row.longitude, row.unit)
+
+    def _empty(self) -> "CorrelationEngine":
+        return CorrelationEngine(self.distance_km, self.window_s / 60.0)
+
+    def _adopt(self, fresh: "CorrelationEngine") -> None:
+        self._buckets, self._points, self._keys = fresh._buckets, fresh._points, fresh._keys
+        self._group_of, self._multi = fresh._group_of, fresh._multi
+
+    def group_of(self, sighting_id: int) -> Optional[Dict]:
+        with self._lock:
+            group = self._group_of.get(sighting_id)
+            return self._describe(group) if group is not None else None
+
+    def groups(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+               min_size: int = 2, limit: int = 100) -> List[Dict]:
+        """Groups overlapping [start, end] with at least min_size sightings, most recent first."""
+        lo = start.timestamp() if start else float("-inf")
+        hi = end.timestamp() if end else float("inf")
+        with self._lock:
+            found = [g for g in self._multi if len(g.members) >= min_size and g.end >= lo and g.start <= hi]
+            found.sort(key=lambda g: (g.end, min(g.members)), reverse=True)
+            return [self._describe(g) for g in found[:limit]]
+
+    def _describe(self, group: Group) -> Dict:
+        count = len(group.members)
+        lat, lon = group.lat_sum / count, group.lon_sum / count
+        lat0 = radians(lat)
+        extent = 0.0
+        units: Counter = Counter()
+        for member in group.members:
+            p = self._points[member]
+            extent = max(extent, spatial_index._distance(lat0, radians(lon), cos(lat0), p[3], p[4], p[5]))
+            if p[6]:
+                units[p[6]] += 1
+        return {
+            # The earliest-inserted sighting names the group
+            "id": min(group.members),
+            "count": count,
+            "latitude": lat,
+            "longitude": lon,
+            "start_time": datetime.fromtimestamp(group.start, timezone.utc),
+            "end_time": datetime.fromtimestamp(group.end, timezone.utc),
+            "extent_km": extent,
+            # Everything within the link distance of the centre reads as one incident
+            "kind": "incident" if extent <= self.distance_km else "track",
+            "units": [u for u, _ in units.most_common()],
+            "sighting_ids": sorted(group.members),
+        }
+
+
+# Shared per-process engine, kept in sync by the sighting create/delete routes
+correlator = CorrelationEngine()
+sighting_sync.follower.register(correlator)
+
+router = APIRouter()
+
+
+@router.get("/sightings/groups", response_model=List[schemas.SightingGroup])
+def list_groups(
+    start_time: Optional[datetime] = Query(None, description="Only groups still active after this time"),
+    end_time: Optional[datetime] = Query(None, description="Only groups that started before this time"),
+    min_size: int = Query(2, ge=2),
+    limit: int = Query(100, gt=0, le=1000),
+    db: Session = Depends(database.get_db),
+):
+    """
+    Correlated sightings: reports linked by CORRELATION_DISTANCE_KM and
+    CORRELATION_WINDOW_MINUTES, with centroid, time span and reporting units.
+    """
+    if start_time and end_time and end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must be >= start_time")
+    correlator.sync(db)
+    return correlator.groups(start_time, end_time, min_size, limit)
+
+
+@router.get("/sightings/{sighting_id}/group", response_model=schemas.SightingGroup)
+def get_sighting_group(sighting_id: int, db: Session = Depends(database.get_db)):
+    """The group a sighting belongs to; a lone sighting is a group of one."""
+    correlator.sync(db)
+    group = correlator.group_of(sighting_id)
+    if group is None:
+        raise HTTPException(status_code=404, detail="Sighting not found")
+    return group
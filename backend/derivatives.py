@@ -0,0 +1,186 @@
+"""
+Thumbnail and preview derivatives of uploaded images.
+
+Derivatives are fixed-size WebP renditions, created eagerly at upload time or
+lazily on first request, and kept in a size-bounded on-disk cache with LRU
+eviction. Upload names are content hashes, so derivatives never change and are
+served with long-lived immutable cache headers.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+from uuid import uuid4
+import os
+import re
+import threading
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from PIL import Image
+
+import image_pool
+from image_store import UPLOADS_DIR
+from upload_urls import URL_PREFIX
+
+# name -> longest edge in pixels
+SIZES = {"thumb": 256, "preview": 1024}
+WEBP_QUALITY = 80
+
+DERIVATIVES_DIR = Path(os.getenv("DERIVATIVE_CACHE_DIR", "cache/derivatives"))
+DERIVATIVE_CACHE_MAX_BYTES = int(os.getenv("DERIVATIVE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+DERIVATIVES_EAGER = os.getenv("DERIVATIVES_EAGER", "true").lower() == "true"
+
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+router = APIRouter()
+
+
+def derivative_path(name: str, size: str) -> Path:
+    return DERIVATIVES_DIR / size / f"{Path(name).stem}.webp"
+
+
+def render(img: Image.Image, dst_path: str, max_dim: int) -> None:
+    """Write a WebP rendition of an already-decoded image. Runs in a pool worker."""
+    copy = img.copy()
+    copy.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    copy.info = {}
+    tmp_path = f"{dst_path}.{uuid4().hex}.tmp"
+    copy.save(tmp_path, format="WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp_path, dst_path)
+
+
+def _render_from_file(src_path: str, dst_path: str, max_dim: int) -> None:
+    """Lazy path: decode a stored upload and render one derivative. Runs in a pool worker."""
+    try:
+        img = Image.open(src_path)
+        if img.format == "JPEG":
+            img.draft("RGB", (max_dim, max_dim))
+        img.load()
+    except Exception as e:
+        raise image_pool.ImageProcessingError(f"Invalid image file: {str(e)}")
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    render(img, dst_path, max_dim)
+
+
+def eager_targets(name: str) -> Dict[str, int]:
+    """Derivative paths to create alongside a new upload, mapped to their size in pixels."""
+    if not DERIVATIVES_EAGER:
+        return {}
+    targets = {}
+    for size, max_dim in SIZES.items():
+        path = derivative_path(name, size)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        targets[str(path)] = max_dim
+    return targets
+
+
+def discard(image_urls: List[str]) -> None:
+    """Drop the cached derivatives of images that have been deleted."""
+    for url in image_urls:
+        if url.startswith(URL_PREFIX):
+            for size in SIZES:
+                cache.remove(derivative_path(url[len(URL_PREFIX):], size))
+
+
+class DerivativeCache:
+    """Tracks derivative files in least-recently-used order and evicts past the byte budget."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        # Seed from disk, oldest first, so eviction survives restarts
+        files = []
+        for path in self.root.glob("*/*.webp"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, str(path), st.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._total += size
+        self._loaded = True
+
+    def touch(self, path: Path) -> None:
+        """Mark a cached file as just used (mtime doubles as the on-disk recency)."""
+        key = str(path)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def add(self, path: Path) -> None:
+        key = str(path)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._total += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def remove(self, path: Path) -> None:
+        with self._lock:
+            self._total -= self._entries.pop(str(path), 0)
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            victim, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(victim)
+            except FileNotFoundError:
+                pass
+
+
+cache = DerivativeCache(DERIVATIVES_DIR, DERIVATIVE_CACHE_MAX_BYTES)
+
+
+@router.get("/images/{size}/{name}")
+async def get_derivative(size: str, name: str, request: Request):
+    if size not in SIZES:
+        raise HTTPException(status_code=404, detail=f"Unknown size. Use one of: {', '.join(SIZES)}")
+    if not _NAME_RE.match(name):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Checked before the ETag, so a swept upload is a 404 even for clients that cached it
+    src = UPLOADS_DIR / name
+    if not src.is_file():
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Derivatives of a content-addressed upload never change
+    etag = f'"{size}-{Path(name).stem}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={**CACHE_HEADERS, "ETag": etag})
+
+    path = derivative_path(name, size)
+    if path.exists():
+        cache.touch(path)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        await image_pool.run(_render_from_file, str(src), str(path), SIZES[size])
+        cache.add(path)
+
+    return FileResponse(path, media_type="image/webp", headers={**CACHE_HEADERS, "ETag": etag})
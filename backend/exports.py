@@ -0,0 +1,169 @@
+"""
+Streaming bulk export of sightings as NDJSON, CSV or GeoJSON.
+
+Rows are read through a server-side cursor in fixed-size batches and encoded
+straight into the response, so memory use stays flat regardless of how many
+rows are exported.
+"""
+
+from datetime import datetime
+from io import StringIO
+from typing import Iterator, Optional
+import csv
+import json
+import zlib
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import database, searches
+
+EXPORT_BATCH = 2000          # rows fetched per round trip
+FLUSH_BYTES = 64 * 1024      # encoded bytes buffered before each write to the client
+
+FIELDS = [
+    "id", "type_of_sighting", "time", "latitude", "longitude", "location_name",
+    "description", "symbol_code", "ascc", "unit", "created_at", "updated_at", "image_urls",
+    "mgrs_gzd", "mgrs_100km", "mgrs_1km",
+]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "geojson": "application/geo+json",
+}
+
+router = APIRouter()
+
+
+def _row(s, distance_km: Optional[float]) -> dict:
+    row = {}
+    for f in FIELDS:
+        value = getattr(s, f)
+        row[f] = value.isoformat() if isinstance(value, datetime) else value
+    if distance_km is not None:
+        row["distance_km"] = distance_km
+    return row
+
+
+def _encode_ndjson(rows: Iterator[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+def _encode_csv(rows: Iterator[dict], with_distance: bool) -> Iterator[str]:
+    columns = FIELDS + (["distance_km"] if with_distance else [])
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for row in rows:
+        row["image_urls"] = json.dumps(row["image_urls"])
+        writer.writerow(row.get(f) for f in columns)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def _encode_geojson(rows: Iterator[dict]) -> Iterator[str]:
+    yield '{"type":"FeatureCollection","features":['
+    sep = ""
+    for row in rows:
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [row["longitude"], row["latitude"]]},
+            "properties": row,
+        }
+        yield sep + json.dumps(feature)
+        sep = ","
+    yield "]}\n"
+
+
+def _buffered(chunks: Iterator[str]) -> Iterator[bytes]:
+    # Coalesce many small row strings into fewer, larger writes
+    parts, size = [], 0
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= FLUSH_BYTES:
+            yield "".join(parts).encode()
+            parts, size = [], 0
+    if parts:
+        yield "".join(parts).encode()
+
+
+def _gzipped(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+@router.get("/sightings/export")
+def export_sightings(
+    format: str = Query("ndjson", regex="^(ndjson|csv|geojson)$"),
+    compress: Optional[str] = Query(None, regex="^gzip$", description="Set to 'gzip' for a .gz download"),
+    start_time: Optional[str] = Query(None, description="ISO format e.g. 2025-09-11T14:30"),
+    end_time:   Optional[str] = Query(None, description="ISO format e.g. 2025-09-11T16:00"),
+    latitude:   Optional[float] = Query(None),
+    longitude:  Optional[float] = Query(None),
+    radius_km:  Optional[float] = Query(None),
+    unit: Optional[str] = Query(None, description="Unit name to search for"),
+    ascc: Optional[str] = Query(None, description="ASCC name to search for"),
+    order_by: Optional[str] = Query(None, regex="^(distance|time)$"),
+    limit: Optional[int] = Query(None, gt=0),
+):
+    start_dt = end_dt = None
+    if start_time and end_time:
+        try:
+            start_dt = datetime.fromisoformat(start_time)
+            end_dt = datetime.fromisoformat(end_time)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM or YYYY-MM-DDTHH:MM:SS)")
+        if end_dt < start_dt:
+            raise HTTPException(status_code=400, detail="end_time must be >= start_time")
+    with_distance = latitude is not None and longitude is not None and radius_km is not None
+
+    def rows() -> Iterator[dict]:
+        # The session lives for the whole stream, so it is opened here rather than via get_db
+        db = database.SessionLocal()
+        try:
+            q = searches.build_sighting_query(
+                db,
+                start_time=start_dt,
+                end_time=end_dt,
+                unit=unit.strip() if unit else None,
+                ascc=ascc.strip() if ascc else None,
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                order_by=order_by,
+                limit=limit,
+            )
+            q = q.execution_options(stream_results=True).yield_per(EXPORT_BATCH)
+            for s, distance_km in q:
+                yield _row(s, distance_km)
+        finally:
+            db.close()
+
+    if format == "csv":
+        body = _buffered(_encode_csv(rows(), with_distance))
+    elif format == "geojson":
+        body = _buffered(_encode_geojson(rows()))
+    else:
+        body = _buffered(_encode_ndjson(rows()))
+
+    filename = f"sightings.{format}"
+    media_type = MEDIA_TYPES[format]
+    if compress == "gzip":
+        body = _gzipped(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
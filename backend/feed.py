@@ -0,0 +1,353 @@
+"""
+Live sighting feed over Server-Sent Events.
+
+GET /sightings/feed streams a "created" or "deleted" event for every sighting
+written, so dashboards can apply changes instead of re-downloading the list.
+Subscribers can ask for only the events they care about (unit, ASCC, type,
+or a radius around a point). Filters are applied before an event is queued.
+With alerts=true a subscriber also gets an "alert" event whenever a new
+sighting falls inside a geofence (see geofences.py).
+
+Every event carries a sequence number as its SSE id. The broker keeps the last
+FEED_BUFFER_SIZE events, so a client that reconnects with Last-Event-ID (which
+EventSource sends automatically) gets what it missed. If it has been away
+longer than the buffer reaches back, it gets a "reset" event and should reload.
+A subscriber that falls FEED_QUEUE_SIZE events behind is disconnected the same
+way, rather than the broker buffering without bound.
+
+The memory broker is per process: with several uvicorn workers, each only sees
+its own writes. The postgres broker publishes through NOTIFY and every worker
+LISTENs, so all subscribers see all writes with one global sequence.
+Publishing happens after the write has committed and is best effort: if it
+fails, the error is logged and this worker's subscribers get a reset.
+"""
+
+from collections import deque
+from math import cos, radians
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import asyncpg
+from fastapi import APIRouter, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+import database, schemas, spatial_index
+
+FEED_BROKER = os.getenv("FEED_BROKER", "memory")  # memory | postgres
+FEED_BUFFER_SIZE = int(os.getenv("FEED_BUFFER_SIZE", "1000"))  # events kept for resuming
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", "256"))  # events a subscriber may fall behind
+FEED_KEEPALIVE = float(os.getenv("FEED_KEEPALIVE", "15"))  # seconds between keep-alive comments
+FEED_CHANNEL = os.getenv("FEED_CHANNEL", "uas_sightings_feed")
+# NOTIFY payloads are capped at 8000 bytes
+NOTIFY_MAX_BYTES = 7900
+# Sent instead of the whole sighting when even a trimmed one exceeds the cap
+PARTIAL_FIELDS = ("id", "time", "latitude", "longitude", "unit", "ascc", "type_of_sighting")
+
+_PUBLISH_LOCK_ID = 0x46454544
+
+router = APIRouter()
+
+
+class Event:
+    __slots__ = ("seq", "type", "body", "data")
+
+    def __init__(self, seq: int, type: str, body: Dict):
+        # body is {"sighting": {...}} plus anything else the event type carries
+        self.seq = seq
+        self.type = type
+        self.body = body
+        # Encoded once, however many subscribers receive it
+        self.data = json.dumps({"seq": seq, "type": type, **body})
+
+    @property
+    def sighting(self) -> Dict:
+        return self.body["sighting"]
+
+    def encode(self) -> str:
+        return f"id: {self.seq}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Filters:
+    def __init__(self, unit=None, ascc=None, type_of_sighting=None, latitude=None, longitude=None, radius_km=None,
+                 alerts=False, geofence_id=None):
+        self.unit = unit.lower() if unit else None
+        self.ascc = ascc.lower() if ascc else None
+        self.type_of_sighting = type_of_sighting.lower() if type_of_sighting else None
+        self.point = None
+        if latitude is not None and longitude is not None and radius_km is not None:
+            lat_r = radians(latitude)
+            self.point = (lat_r, radians(longitude), cos(lat_r), radius_km)
+        # A subscriber following one geofence gets only that fence's alerts
+        self.geofence_id = geofence_id
+        self.alerts = alerts or geofence_id is not None
+
+    def matches(self, event: Event) -> bool:
+        if event.type == "alert":
+            if not self.alerts:
+                return False
+            if self.geofence_id is not None and self.geofence_id not in event.body["geofence_ids"]:
+                return False
+        elif self.geofence_id is not None:
+            return False
+        s = event.sighting
+        if self.unit and (s.get("unit") or "").lower() != self.unit:
+            return False
+        if self.ascc and (s.get("ascc") or "").lower() != self.ascc:
+            return False
+        if self.type_of_sighting and (s.get("type_of_sighting") or "").lower() != self.type_of_sighting:
+            return False
+        if self.point is not None:
+            lat0, lon0, cos0, radius_km = self.point
+            lat_r = radians(s["latitude"])
+            d = spatial_index._distance(lat0, lon0, cos0, lat_r, radians(s["longitude"]), cos(lat_r))
+            if d > radius_km:
+                return False
+        return True
+
+
+class Subscription:
+    def __init__(self, filters: Filters, loop: asyncio.AbstractEventLoop):
+        self.filters = filters
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+        self.lagged = False
+
+    def deliver(self, event: Event) -> None:
+        # Runs on the subscriber's event loop
+        if self.lagged or not self.filters.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Nothing more is queued; the stream sends what it has, then a reset
+            self.lagged = True
+
+    def mark_lagged(self) -> None:
+        # Runs on the subscriber's event loop; None wakes a stream that is waiting on an empty queue
+        self.lagged = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class MemoryBroker:
+    """Numbers events, keeps a replay buffer and fans out to this process's subscribers."""
+
+    def __init__(self, buffer_size: int = FEED_BUFFER_SIZE):
+        self._buffer: Deque[Event] = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, type: str, bodies: Iterable[Dict]) -> None:
+        """Called after the write commits, from any thread."""
+        with self._lock:
+            for body in bodies:
+                self._seq += 1
+                self._accept(Event(self._seq, type, body))
+
+    def _accept(self, event: Event) -> None:
+        # Caller holds the lock, so buffer order, subscriber order and seq order agree
+        self._buffer.append(event)
+        for sub in self._subscribers:
+            sub.loop.call_soon_threadsafe(sub.deliver, event)
+
+    def subscribe(self, filters: Filters, after: Optional[int]) -> Tuple[Subscription, List[Event], bool]:
+        """
+        Register a subscriber. Returns it, the buffered events after `after` that
+        match its filters, and whether events between `after` and the buffer were lost.
+        """
+        sub = Subscription(filters, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(sub)
+            if after is None:
+                return sub, [], False
+            oldest = self._buffer[0].seq if self._buffer else self._seq + 1
+            missed = [e for e in self._buffer if e.seq > after and filters.matches(e)]
+            # Reset if the client is ahead of us (e.g. the server restarted) or fell out of the buffer
+            return sub, missed, after > self._seq or after < oldest - 1
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def reset_subscribers(self) -> None:
+        """Events were lost: drop the replay buffer and make every subscriber reload."""
+        with self._lock:
+            self._buffer.clear()
+            for sub in self._subscribers:
+                sub.loop.call_soon_threadsafe(sub.mark_lagged)
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Publishes with NOTIFY and delivers whatever arrives on LISTEN, so every
+    worker's subscribers see every worker's writes. Sequence numbers come from
+    a database sequence, taken under an advisory lock so they reach listeners
+    in order.
+    """
+
+    def __init__(self, buffer_size: int = FEED_BUFFER_SIZE):
+        super().__init__(buffer_size)
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        with database.engine.begin() as conn:
+            conn.execute(text("CREATE SEQUENCE IF NOT EXISTS uas_feed_seq"))
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._conn is not None:
+            await self._conn.close()
+
+    async def _listen(self) -> None:
+        _, connect_args = database.async_engine.dialect.create_connect_args(make_url(database.ASYNC_DATABASE_URL))
+        while True:
+            try:
+                self._conn = await asyncpg.connect(**connect_args)
+                await self._conn.add_listener(FEED_CHANNEL, self._on_notify)
+                closed = asyncio.Event()
+                self._conn.add_termination_listener(lambda _: closed.set())
+                await closed.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Feed listener failed: {str(e)}")
+            # Whatever was published while we weren't listening is gone; make subscribers reload
+            self.reset_subscribers()
+            await asyncio.sleep(1)
+
+    def _on_notify(self, conn, pid, channel, payload: str) -> None:
+        body = json.loads(payload)
+        seq, type = body.pop("seq"), body.pop("type")
+        with self._lock:
+            self._seq = max(self._seq, seq)
+            self._accept(Event(seq, type, body))
+
+    def publish(self, type: str, bodies: Iterable[Dict]) -> None:
+        bodies = list(bodies)
+        if not bodies:
+            return
+        with database.engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _PUBLISH_LOCK_ID})
+            seqs = conn.execute(text("SELECT nextval('uas_feed_seq') FROM generate_series(1, :n)"),
+                                {"n": len(bodies)}).scalars().all()
+            notifications = []
+            for seq, body in zip(sorted(seqs), bodies):
+                payload = json.dumps({"seq": seq, "type": type, **body})
+                if len(payload.encode()) > NOTIFY_MAX_BYTES:
+                    # Long descriptions don't fit a NOTIFY; subscribers can fetch the full row by id
+                    trimmed = {**body["sighting"], "description": None, "partial": True}
+                    payload = json.dumps({"seq": seq, "type": type, **body, "sighting": trimmed})
+                if len(payload.encode()) > NOTIFY_MAX_BYTES:
+                    # Still too long: keep only what subscriber filters look at
+                    trimmed = {k: body["sighting"].get(k) for k in PARTIAL_FIELDS}
+                    payload = json.dumps({"seq": seq, "type": type, **body, "sighting": {**trimmed, "partial": True}})
+                notifications.append({"channel": FEED_CHANNEL, "payload": payload})
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"), notifications)
+
+
+def _make_broker():
+    if FEED_BROKER == "postgres":
+        return PostgresBroker()
+    if FEED_BROKER != "memory":
+        logging.warning(f"Unknown FEED_BROKER {FEED_BROKER!r}, using memory")
+    return MemoryBroker()
+
+
+broker = _make_broker()
+
+
+def _encode(sighting) -> Dict:
+    return jsonable_encoder(schemas.UASSighting.from_orm(sighting))
+
+
+def _publish(type: str, bodies: List[Dict]) -> None:
+    # The write has already committed, so a feed failure must not fail the request
+    try:
+        broker.publish(type, bodies)
+    except Exception as e:
+        logging.error(f"Feed publish failed: {str(e)}")
+        broker.reset_subscribers()
+
+
+def publish(type: str, sightings) -> None:
+    """Send "created" or "deleted" events for ORM rows (or row-like objects) that were just committed."""
+    _publish(type, [{"sighting": _encode(s)} for s in sightings])
+
+
+def publish_alerts(matches) -> None:
+    """Send an "alert" event per (sighting, geofence ids) pair from geofences.apply."""
+    _publish("alert", [{"sighting": _encode(s), "geofence_ids": ids} for s, ids in matches])
+
+
+RESET = "event: reset\ndata: {}\n\n"
+
+
+async def _stream(sub: Subscription, missed: List[Event], reset: bool):
+    # Runs until the client disconnects, which cancels it
+    try:
+        if reset:
+            yield RESET
+        for event in missed:
+            yield event.encode()
+        while True:
+            if sub.lagged and sub.queue.empty():
+                yield RESET
+                return
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=FEED_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Comment line; keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if event is not None:
+                yield event.encode()
+    finally:
+        broker.unsubscribe(sub)
+
+
+@router.get("/sightings/feed")
+async def sighting_feed(
+    unit: Optional[str] = Query(None, description="Only sightings reported by this unit"),
+    ascc: Optional[str] = Query(None, description="Only sightings from this ASCC"),
+    type_of_sighting: Optional[str] = Query(None),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0),
+    alerts: bool = Query(False, description="Also send \"alert\" events for geofence matches"),
+    geofence_id: Optional[int] = Query(None, description="Only alerts for this geofence"),
+    after: Optional[int] = Query(None, ge=0, description="Resume after this sequence number"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events stream of "created" and "deleted" events; each event's
+    data is {"seq", "type", "sighting"} and its id is the sequence number.
+    "alert" events also carry "geofence_ids".
+    """
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    filters = Filters(unit, ascc, type_of_sighting, latitude, longitude, radius_km, alerts, geofence_id)
+    sub, missed, reset = broker.subscribe(filters, after)
+    return StreamingResponse(
+        _stream(sub, missed, reset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
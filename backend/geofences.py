@@ -0,0 +1,278 @@
+"""
+Standing geofences: circles, MGRS squares and polygons, optionally limited to
+one unit or sighting type. Every new sighting is matched against all fences as
+it is written, and each match is stored as an alert in the same transaction
+and pushed to the live feed as an "alert" event.
+
+Matching goes through an in-memory fence index instead of a query per fence.
+Circles and polygons are registered in every GEOFENCE_CELL_DEG grid cell their
+bounding box touches, and MGRS fences under their square's key, so a sighting
+only looks at the fences in its own cell and squares. The cost per sighting
+depends on how many fences overlap that spot, not on how many exist. Fences
+wider than GEOFENCE_MAX_CELLS cells are kept on a short list that every
+sighting checks.
+
+Fences only match sightings created after them; use the search endpoints for
+what is already stored. Each worker reloads its index when the set of fences
+changes, which it notices from the fence count and highest id.
+"""
+
+from math import cos, floor, radians
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import database, models, mgrs_grid, schemas, spatial_index
+
+GEOFENCE_CELL_DEG = float(os.getenv("GEOFENCE_CELL_DEG", "0.25"))
+GEOFENCE_MAX_CELLS = int(os.getenv("GEOFENCE_MAX_CELLS", "4096"))  # wider fences are checked for every sighting
+MAX_GEOFENCES = int(os.getenv("MAX_GEOFENCES", "10000"))
+
+router = APIRouter()
+
+
+def _inside_polygon(lat: float, lon: float, polygon: List[Tuple[float, float]]) -> bool:
+    # Ray casting in plain lat/lon, which is accurate enough for fences a few hundred km across
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat) and lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _mgrs_key(mgrs_str: str) -> Tuple[str, str]:
+    """(level, key) for an MGRS fence, comparable with _sighting_mgrs_keys. Raises ValueError."""
+    gzd, square, digits = mgrs_grid.parse(mgrs_str)
+    if square is None:
+        return "gzd", gzd
+    prefix = gzd + square
+    if not digits:
+        return "100km", prefix
+    half = len(digits) // 2
+    easting, northing = digits[:half], digits[half:]
+    if half == 1:
+        return "10km", prefix + easting + northing
+    # Finer references are truncated to 1 km, as in mgrs_grid.area_filter
+    return "1km", prefix + easting[:2] + northing[:2]
+
+
+def _sighting_mgrs_keys(s) -> List[Tuple[str, str]]:
+    keys = []
+    if s.mgrs_gzd:
+        keys.append(("gzd", s.mgrs_gzd))
+    if s.mgrs_100km:
+        keys.append(("100km", s.mgrs_100km))
+        if s.mgrs_1km:
+            digits = s.mgrs_1km[len(s.mgrs_100km):]
+            keys.append(("1km", s.mgrs_1km))
+            keys.append(("10km", s.mgrs_100km + digits[0] + digits[2]))
+    return keys
+
+
+class _Fence:
+    __slots__ = ("id", "unit", "type_of_sighting", "kind", "shape")
+
+    def __init__(self, fence: models.Geofence):
+        self.id = fence.id
+        self.unit = fence.unit.lower() if fence.unit else None
+        self.type_of_sighting = fence.type_of_sighting.lower() if fence.type_of_sighting else None
+        self.kind = fence.kind
+        if fence.kind == "circle":
+            lat_r = radians(fence.latitude)
+            self.shape = (lat_r, radians(fence.longitude), cos(lat_r), fence.radius_km, fence.latitude, fence.longitude)
+        elif fence.kind == "polygon":
+            self.shape = [tuple(v) for v in fence.polygon]
+        else:
+            self.shape = None  # the MGRS key lookup is the whole test
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """(south, west, north, east) in degrees; west > east when a circle crosses the antimeridian."""
+        if self.kind == "circle":
+            _, _, cos_lat, radius_km, lat, lon = self.shape
+            lat_delta = radius_km / spatial_index.KM_PER_DEG
+            lon_delta = radius_km / (spatial_index.KM_PER_DEG * max(cos_lat, 1e-6))
+            if lon_delta >= 180:
+                return max(lat - lat_delta, -90.0), -180.0, min(lat + lat_delta, 90.0), 180.0
+            west = (lon - lon_delta + 180.0) % 360.0 - 180.0
+            east = (lon + lon_delta + 180.0) % 360.0 - 180.0
+            return max(lat - lat_delta, -90.0), west, min(lat + lat_delta, 90.0), east
+        lats = [v[0] for v in self.shape]
+        lons = [v[1] for v in self.shape]
+        return min(lats), min(lons), max(lats), max(lons)
+
+    def contains(self, s, lat_r: float, lon_r: float, cos_lat: float) -> bool:
+        if self.unit and (s.unit or "").lower() != self.unit:
+            return False
+        if self.type_of_sighting and (s.type_of_sighting or "").lower() != self.type_of_sighting:
+            return False
+        if self.kind == "circle":
+            lat0, lon0, cos0, radius_km, _, _ = self.shape
+            return spatial_index._distance(lat0, lon0, cos0, lat_r, lon_r, cos_lat) <= radius_km
+        if self.kind == "polygon":
+            return _inside_polygon(s.latitude, s.longitude, self.shape)
+        return True
+
+
+class FenceIndex:
+    def __init__(self, cell_deg: float = GEOFENCE_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._lon_cells = int(round(360.0 / cell_deg))
+        self._lat_cells = int(round(180.0 / cell_deg))
+        # (cells, MGRS keys, wide fences), replaced as a whole on reload so match() needs no lock
+        self._state: Tuple[Dict[Tuple[int, int], List[_Fence]], Dict[Tuple[str, str], List[_Fence]], List[_Fence]] = ({}, {}, [])
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+
+    def _cell_ranges(self, south: float, west: float, north: float, east: float):
+        y0 = int(floor((south + 90.0) / self.cell_deg))
+        y1 = min(int(floor((north + 90.0) / self.cell_deg)), self._lat_cells - 1)
+        x0 = int(floor((west + 180.0) / self.cell_deg))
+        x1 = int(floor((east + 180.0) / self.cell_deg))
+        if x1 < x0:
+            x1 += self._lon_cells
+        return range(y0, y1 + 1), range(x0, x1 + 1)
+
+    def load(self, fences: List[models.Geofence]) -> None:
+        cells: Dict[Tuple[int, int], List[_Fence]] = {}
+        keys: Dict[Tuple[str, str], List[_Fence]] = {}
+        wide: List[_Fence] = []
+        for row in fences:
+            fence = _Fence(row)
+            if fence.kind == "mgrs":
+                keys.setdefault(_mgrs_key(row.mgrs), []).append(fence)
+                continue
+            ys, xs = self._cell_ranges(*fence.bounds())
+            if len(ys) * len(xs) > GEOFENCE_MAX_CELLS:
+                wide.append(fence)
+                continue
+            for y in ys:
+                for x in xs:
+                    cells.setdefault((y, x % self._lon_cells), []).append(fence)
+        self._state = (cells, keys, wide)
+
+    def sync(self, db: Session) -> None:
+        """Reload when fences were added or deleted since the last load, by this worker or another."""
+        signature = tuple(db.query(func.count(models.Geofence.id), func.coalesce(func.max(models.Geofence.id), 0)).one())
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature != self._signature:
+                self.load(db.query(models.Geofence).all())
+                self._signature = signature
+
+    def invalidate(self) -> None:
+        self._signature = None
+
+    def match(self, s) -> List[int]:
+        """Ids of the fences a sighting (ORM row or row-like object) falls inside."""
+        cells, keys, wide = self._state
+        candidates = list(wide)
+        candidates += cells.get((
+            int(floor((s.latitude + 90.0) / self.cell_deg)),
+            int(floor((s.longitude + 180.0) / self.cell_deg)) % self._lon_cells,
+        ), ())
+        for key in _sighting_mgrs_keys(s):
+            candidates += keys.get(key, ())
+        if not candidates:
+            return []
+        lat_r = radians(s.latitude)
+        lon_r, cos_lat = radians(s.longitude), cos(lat_r)
+        return sorted({f.id for f in candidates if f.contains(s, lat_r, lon_r, cos_lat)})
+
+
+# Shared per-process fence index, reloaded by apply() when the fences change
+index = FenceIndex()
+
+
+def apply(db: Session, sightings) -> List[Tuple[object, List[int]]]:
+    """
+    Match new sightings against every fence and store the alerts in the
+    caller's transaction. Returns (sighting, fence ids) for each sighting
+    that matched, for publishing once the commit succeeds.
+    """
+    index.sync(db)
+    matches = [(s, ids) for s in sightings for ids in [index.match(s)] if ids]
+    if not matches:
+        return []
+    if any(s.id is None for s, _ in matches):
+        db.flush()  # ORM rows get their id here
+    db.execute(
+        insert(models.GeofenceAlert.__table__).on_conflict_do_nothing(),
+        [{"geofence_id": fence_id, "sighting_id": s.id} for s, ids in matches for fence_id in ids],
+    )
+    return matches
+
+
+@router.post("/geofences", response_model=schemas.Geofence)
+def create_geofence(geofence: schemas.GeofenceCreate, db: Session = Depends(database.get_db)):
+    values = geofence.dict()
+    if geofence.kind == "mgrs":
+        try:
+            _mgrs_key(geofence.mgrs)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        values["mgrs"] = mgrs_grid.normalize(geofence.mgrs)
+    if db.query(func.count(models.Geofence.id)).scalar() >= MAX_GEOFENCES:
+        raise HTTPException(status_code=409, detail=f"At most {MAX_GEOFENCES} geofences")
+    db_geofence = models.Geofence(**values)
+    db.add(db_geofence)
+    db.commit()
+    db.refresh(db_geofence)
+    index.invalidate()
+    return db_geofence
+
+
+@router.get("/geofences", response_model=List[schemas.Geofence])
+def list_geofences(db: Session = Depends(database.get_db)):
+    return db.query(models.Geofence).order_by(models.Geofence.id).all()
+
+
+@router.get("/geofences/alerts", response_model=List[schemas.GeofenceAlert])
+def list_alerts(
+    geofence_id: Optional[int] = Query(None),
+    after: int = Query(0, ge=0, description="Only alerts with a larger id; pass the last id you saw"),
+    limit: int = Query(100, gt=0, le=1000),
+    db: Session = Depends(database.get_db),
+):
+    """Alerts oldest first, with the sighting that raised them."""
+    alert = models.GeofenceAlert
+    q = (
+        db.query(alert, models.UASSighting)
+          .join(models.UASSighting, models.UASSighting.id == alert.sighting_id)
+          .filter(alert.id > after)
+    )
+    if geofence_id is not None:
+        q = q.filter(alert.geofence_id == geofence_id)
+    rows = q.order_by(alert.id).limit(limit).all()
+    return [
+        {"id": a.id, "geofence_id": a.geofence_id, "created_at": a.created_at, "sighting": s}
+        for a, s in rows
+    ]
+
+
+@router.get("/geofences/{geofence_id}", response_model=schemas.Geofence)
+def get_geofence(geofence_id: int, db: Session = Depends(database.get_db)):
+    geofence = db.query(models.Geofence).filter(models.Geofence.id == geofence_id).first()
+    if geofence is None:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    return geofence
+
+
+@router.delete("/geofences/{geofence_id}")
+def delete_geofence(geofence_id: int, db: Session = Depends(database.get_db)):
+    geofence = db.query(models.Geofence).filter(models.Geofence.id == geofence_id).first()
+    if geofence is None:
+        raise HTTPException(status_code=404, detail="Geofence not found")
+    db.delete(geofence)
+    db.commit()
+    index.invalidate()
+    return {"message": "Geofence deleted successfully"}
@@ -0,0 +1,68 @@
+"""
+Bounded process pool for CPU-heavy image work (upload processing, derivatives).
+
+Work runs outside the API process so decoding and resizing never block the
+event loop. A semaphore caps how many images may be queued or running at once
+across all requests; callers that can't get a slot in time get a 503.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException
+
+import metrics
+
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Images waiting for or running in the pool, across all requests
+UPLOAD_QUEUE_LIMIT = int(os.getenv("UPLOAD_QUEUE_LIMIT", str(UPLOAD_WORKERS * 4)))
+UPLOAD_QUEUE_TIMEOUT = float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "30"))  # seconds
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_slots = asyncio.Semaphore(UPLOAD_QUEUE_LIMIT)
+
+
+class ImageProcessingError(Exception):
+    """Raised inside a pool worker for images Pillow cannot decode; becomes a 400."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=UPLOAD_WORKERS)
+    return _pool
+
+
+def _reset_pool() -> None:
+    # A worker that dies (e.g. killed on a decompression bomb) breaks the whole executor
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+
+
+async def run(fn: Callable, *args):
+    """Run fn(*args) in the pool, mapping failures to HTTP errors."""
+    queued = time.perf_counter()
+    try:
+        await asyncio.wait_for(_pool_slots.acquire(), timeout=UPLOAD_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Image processing is busy. Please retry shortly.")
+    started = time.perf_counter()
+    metrics.image_queue_wait.observe(started - queued)
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_get_pool(), fn, *args)
+        metrics.image_processing.observe(time.perf_counter() - started, task=fn.__name__.lstrip("_"))
+        return result
+    except ImageProcessingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BrokenProcessPool:
+        _reset_pool()
+        raise HTTPException(status_code=500, detail="Image processing worker crashed")
+    finally:
+        _pool_slots.release()
@@ -0,0 +1,147 @@
+"""
+Content-addressed storage for uploaded images.
+
+Processed images are stored as <sha256 of the uploaded bytes><ext>, so the same
+photo attached by several units is decoded and written once. uas_image_refs
+counts how many sighting image_urls entries point at each file; when the count
+drops to zero the file is removed. A periodic sweep catches anything the counts
+miss, such as uploads that were never attached to a sighting.
+"""
+
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional
+import logging
+import os
+import time
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import models
+from upload_urls import URL_PREFIX
+
+STATIC_DIR = Path("static")
+UPLOADS_DIR = STATIC_DIR / "uploads"
+
+# Files touched more recently than this are never reclaimed, so an upload has
+# time to be attached to its sighting and a dedup hit can't race a delete
+ORPHAN_GRACE_SECONDS = int(os.getenv("IMAGE_ORPHAN_GRACE_SECONDS", "3600"))
+
+_BACKFILL_LOCK_ID = 0x1A6E5
+_SWEEP_LOCK_ID = 0x1A6E6
+
+
+def content_path(digest: str, ext: str) -> Path:
+    return UPLOADS_DIR / f"{digest}{ext}"
+
+
+def url_for(path: Path) -> str:
+    return f"{URL_PREFIX}{path.name}"
+
+
+def lookup(digest: str, ext: str) -> Optional[str]:
+    """Return the URL of an already-processed upload with these bytes, if any."""
+    path = content_path(digest, ext)
+    try:
+        # Refresh mtime so the grace period protects the file while it gets attached
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return url_for(path)
+
+
+def _local_urls(sightings: Iterable) -> Counter:
+    urls: Counter = Counter()
+    for s in sightings:
+        for url in s.image_urls or []:
+            if isinstance(url, str) and url.startswith(URL_PREFIX):
+                urls[url] += 1
+    return urls
+
+
+def retain(db: Session, sightings: Iterable) -> None:
+    """Count the image references of newly inserted sightings. Does not commit."""
+    urls = _local_urls(sightings)
+    if not urls:
+        return
+    table = models.ImageRef.__table__
+    stmt = insert(table).values([{"url": url, "refcount": n} for url, n in sorted(urls.items())])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.url],
+        set_={"refcount": table.c.refcount + stmt.excluded.refcount},
+    )
+    db.execute(stmt)
+
+
+def release(db: Session, sightings: Iterable) -> List[str]:
+    """Drop the image references of deleted sightings. Returns URLs that are no longer referenced."""
+    orphaned = []
+    for url, n in sorted(_local_urls(sightings).items()):
+        remaining = db.execute(
+            text("UPDATE uas_image_refs SET refcount = refcount - :n WHERE url = :url RETURNING refcount"),
+            {"n": n, "url": url},
+        ).scalar()
+        if remaining is not None and remaining <= 0:
+            db.execute(text("DELETE FROM uas_image_refs WHERE url = :url"), {"url": url})
+            orphaned.append(url)
+    return orphaned
+
+
+def remove_files(urls: Iterable[str]) -> List[str]:
+    """Delete files for released URLs, skipping any touched within the grace period. Returns the URLs removed."""
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    removed = []
+    for url in urls:
+        path = UPLOADS_DIR / url[len(URL_PREFIX):]
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed.append(url)
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def backfill(db: Session) -> None:
+    """Build reference counts from uas_sightings the first time the table is found empty."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _BACKFILL_LOCK_ID})
+    if db.query(models.ImageRef.url).first() is None:
+        db.execute(text("""
+            INSERT INTO uas_image_refs (url, refcount)
+            SELECT url, count(*)
+              FROM uas_sightings, jsonb_array_elements_text(image_urls) AS url
+             WHERE url LIKE :prefix
+             GROUP BY url
+        """), {"prefix": URL_PREFIX + "%"})
+    db.commit()
+
+
+def sweep(db: Session) -> int:
+    """Delete upload files no sighting references. Returns the number of files removed."""
+    if not db.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": _SWEEP_LOCK_ID}).scalar():
+        return 0  # another worker is already sweeping
+    try:
+        referenced = {
+            url for (url,) in db.execute(text(
+                "SELECT DISTINCT jsonb_array_elements_text(image_urls) FROM uas_sightings"
+            ))
+        }
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        removed = 0
+        for path in UPLOADS_DIR.iterdir():
+            if not path.is_file() or url_for(path) in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logging.info(f"Image sweep removed {removed} unreferenced files")
+        return removed
+    finally:
+        db.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _SWEEP_LOCK_ID})
+        db.commit()
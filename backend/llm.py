@@ -0,0 +1,144 @@
+"""
+Streaming chat completions from Cerebras for /llm/chat.
+
+One AsyncCerebras client is shared by every request so upstream connections are
+reused, and the stream is consumed with async iteration, so a long completion
+never blocks the event loop. A semaphore caps how many upstream streams are
+open at once; requests beyond that wait briefly for a slot and then get a 503.
+
+Chunks are pulled from upstream only as fast as the SSE client reads them, and
+a client that disconnects cancels the upstream request. Point CEREBRAS_BASE_URL
+at a local server speaking the same API to test without the real service.
+"""
+
+from typing import AsyncIterator, Dict, Optional
+import asyncio
+import json
+import logging
+import os
+import time
+
+from anyio import CancelScope
+from fastapi import HTTPException
+
+import metrics
+
+try:
+    from cerebras.cloud.sdk import AsyncCerebras
+    CEREBRAS_AVAILABLE = True
+except ImportError:
+    CEREBRAS_AVAILABLE = False
+
+LLM_MAX_CONCURRENT_STREAMS = int(os.getenv("LLM_MAX_CONCURRENT_STREAMS", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))  # seconds to wait for a stream slot
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # seconds, per upstream request
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+_client: Optional["AsyncCerebras"] = None
+_stream_slots = asyncio.Semaphore(LLM_MAX_CONCURRENT_STREAMS)
+
+
+def get_client() -> "AsyncCerebras":
+    global _client
+    if _client is None:
+        api_key = os.environ.get("CEREBRAS_API_KEY")
+        if not api_key:
+            error_msg = "CEREBRAS_API_KEY environment variable not set"
+            logging.error(error_msg)
+            raise HTTPException(status_code=500, detail=error_msg)
+        # base_url comes from CEREBRAS_BASE_URL when set. The TCP warm-up is a
+        # blocking request, and the shared client keeps its connections warm anyway.
+        _client = AsyncCerebras(
+            api_key=api_key,
+            timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES,
+            warm_tcp_connection=False,
+        )
+    return _client
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+class StreamSlot:
+    """One of the LLM_MAX_CONCURRENT_STREAMS upstream slots; release() is idempotent."""
+
+    def __init__(self):
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            _stream_slots.release()
+
+
+async def acquire_slot() -> StreamSlot:
+    try:
+        await asyncio.wait_for(_stream_slots.acquire(), timeout=LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="The AI service is currently experiencing high traffic. Please try again in a few moments.",
+            headers={"Retry-After": "5"},
+        )
+    return StreamSlot()
+
+
+def _describe_error(error_msg: str) -> str:
+    # Check if it's a rate limit error
+    if "429" in error_msg or "too_many_requests" in error_msg.lower() or "queue" in error_msg.lower():
+        return "The AI service is currently experiencing high traffic. Please try again in a few moments."
+    elif "401" in error_msg or "Unauthorized" in error_msg:
+        return "Authentication failed. Please check the API key configuration."
+    elif "503" in error_msg or "Service Unavailable" in error_msg:
+        return "The AI service is temporarily unavailable. Please try again later."
+    return f"Sorry, an error occurred: {error_msg}"
+
+
+def _event(payload: Dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def stream_chat(slot: StreamSlot, params: Dict) -> AsyncIterator[str]:
+    """
+    Yield SSE events for one completion. Holds the slot until the upstream
+    stream is closed, whether it finished, failed or the client went away.
+    """
+    stream = None
+    started = time.perf_counter()
+    first_token = False
+    outcome = "cancelled"
+    try:
+        logging.info("Starting Cerebras chat completion...")
+        stream = await get_client().chat.completions.create(stream=True, **params)
+        async for chunk in stream:
+            if chunk.choices and len(chunk.choices) > 0:
+                content = chunk.choices[0].delta.content or ""
+                if content:
+                    if not first_token:
+                        first_token = True
+                        metrics.llm_time_to_first_token.observe(time.perf_counter() - started)
+                    yield _event({"content": content})
+
+        outcome = "ok"
+        yield _event({"done": True})
+        logging.info("Chat completion finished successfully")
+    except asyncio.CancelledError:
+        logging.info("Client disconnected, cancelling chat completion")
+        raise
+    except Exception as e:
+        outcome = "error"
+        error_msg = str(e)
+        logging.error(f"Error in chat stream: {error_msg}")
+        yield _event({"error": _describe_error(error_msg)})
+    finally:
+        metrics.llm_stream_duration.observe(time.perf_counter() - started, outcome=outcome)
+        if stream is not None:
+            # Shielded so closing the upstream response still runs when this task is being cancelled
+            with CancelScope(shield=True):
+                await stream.close()
+        slot.release()
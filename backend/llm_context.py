@@ -0,0 +1,304 @@
+"""
+Sighting-grounded context for /llm/chat.
+
+uas_sighting_digests keeps one row per (UTC day, 1-degree cell, unit, type)
+with a count, coordinate sums and first/last times. Rows are adjusted in the
+same transaction that inserts or deletes a sighting, so summarizing months of
+reports is a scan over a few hundred digest rows rather than the sightings.
+Filters the digests can't answer exactly (a radius, an ASCC) are aggregated
+into the same shape straight from uas_sightings.
+
+The rendered text is trimmed to a token budget and cached per filter set until
+the next write, so follow-up questions about the same data reuse the same
+prompt prefix.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import os
+
+from sqlalchemy import Integer, String, case, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import database, models, response_cache, schemas, searches
+
+LLM_CONTEXT_MAX_TOKENS = int(os.getenv("LLM_CONTEXT_MAX_TOKENS", "2000"))
+LLM_CONTEXT_RECENT = int(os.getenv("LLM_CONTEXT_RECENT", "10"))  # individual sightings listed after the digests
+LLM_CONTEXT_CACHE_TTL = float(os.getenv("LLM_CONTEXT_CACHE_TTL", "300"))  # seconds
+# Rough size of a token for budgeting; no tokenizer is needed for a limit this coarse
+CHARS_PER_TOKEN = 4
+UNKNOWN = "unknown"
+
+_BACKFILL_LOCK_ID = 0x11C0DE
+
+# Rendered context by filter set, invalidated on every write like the search cache
+renderings = response_cache.ResponseCache(LLM_CONTEXT_CACHE_TTL, 256, 16 * 1024 * 1024)
+
+
+def cell_label(lat: float, lon: float) -> str:
+    """1-degree cell named by its south-west corner, e.g. 49N007E."""
+    la, lo = math.floor(lat), math.floor(lon)
+    return f"{abs(la):02d}{'N' if la >= 0 else 'S'}{abs(lo):03d}{'E' if lo >= 0 else 'W'}"
+
+
+def _cell_sql(lat, lon):
+    # Same label as cell_label(), computed in SQL for backfills and live aggregation
+    la = func.floor(lat).cast(Integer)
+    lo = func.floor(lon).cast(Integer)
+    return func.concat(
+        func.lpad(func.abs(la).cast(String), 2, "0"), case((la >= 0, "N"), else_="S"),
+        func.lpad(func.abs(lo).cast(String), 3, "0"), case((lo >= 0, "E"), else_="W"),
+    )
+
+
+def _day(t: datetime) -> date:
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc)
+    return t.date()
+
+
+def apply(db: Session, sightings: Iterable, delta: int) -> None:
+    """Add (delta=+1) or remove (delta=-1) sightings from their digests. Does not commit."""
+    rows: Dict[Tuple, Dict] = {}
+    for s in sightings:
+        key = (_day(s.time), cell_label(s.latitude, s.longitude), s.unit or UNKNOWN, s.type_of_sighting)
+        row = rows.setdefault(key, {"count": 0, "lat_sum": 0.0, "lon_sum": 0.0,
+                                    "first_seen": s.time, "last_seen": s.time})
+        row["count"] += delta
+        row["lat_sum"] += delta * s.latitude
+        row["lon_sum"] += delta * s.longitude
+        row["first_seen"] = min(row["first_seen"], s.time)
+        row["last_seen"] = max(row["last_seen"], s.time)
+    if not rows:
+        return
+    table = models.SightingDigest.__table__
+    stmt = insert(table).values([
+        {"day": day, "cell": cell, "unit": unit, "type_of_sighting": type_, **row}
+        for (day, cell, unit, type_), row in sorted(rows.items())
+    ])
+    # first/last only ever widen; after a delete they remain valid bounds
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.cell, table.c.unit, table.c.type_of_sighting],
+        set_={
+            "count": table.c.count + stmt.excluded.count,
+            "lat_sum": table.c.lat_sum + stmt.excluded.lat_sum,
+            "lon_sum": table.c.lon_sum + stmt.excluded.lon_sum,
+            "first_seen": func.least(table.c.first_seen, stmt.excluded.first_seen),
+            "last_seen": func.greatest(table.c.last_seen, stmt.excluded.last_seen),
+        },
+    )
+    db.execute(stmt)
+
+
+def _aggregate_columns():
+    sighting = models.UASSighting
+    return [
+        func.date(func.timezone("UTC", sighting.time)).label("day"),
+        _cell_sql(sighting.latitude, sighting.longitude).label("cell"),
+        func.coalesce(func.nullif(sighting.unit, ""), UNKNOWN).label("unit"),
+        sighting.type_of_sighting.label("type_of_sighting"),
+        func.count(sighting.id).label("count"),
+        func.sum(sighting.latitude).label("lat_sum"),
+        func.sum(sighting.longitude).label("lon_sum"),
+        func.min(sighting.time).label("first_seen"),
+        func.max(sighting.time).label("last_seen"),
+    ]
+
+
+# Positional, because the computed key expressions carry bind parameters that
+# Postgres won't match between the select list and GROUP BY
+_GROUP_KEYS = [text(str(i)) for i in range(1, 5)]
+
+
+def backfill(db: Session) -> None:
+    """Build the digests from uas_sightings the first time the table is found empty."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _BACKFILL_LOCK_ID})
+    if db.query(models.SightingDigest.day).first() is None:
+        columns = _aggregate_columns()
+        table = models.SightingDigest.__table__
+        db.execute(insert(table).from_select(
+            [c.name for c in columns],
+            select(*columns).group_by(*_GROUP_KEYS),
+        ))
+    db.commit()
+
+
+@dataclass
+class _Group:
+    """Digest rows merged across sighting types."""
+    day: date
+    cell: str
+    unit: str
+    count: int = 0
+    lat_sum: float = 0.0
+    lon_sum: float = 0.0
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    by_type: Counter = field(default_factory=Counter)
+
+
+def _digest_rows(db: Session, f: schemas.LLMContextFilters) -> List:
+    has_point = f.latitude is not None and f.longitude is not None and f.radius_km is not None
+    if has_point or f.ascc:
+        # Not expressible over digests; aggregate the matching sightings into the same shape
+        q = searches.build_sighting_query(
+            db, unit=f.unit, ascc=f.ascc, latitude=f.latitude, longitude=f.longitude, radius_km=f.radius_km,
+        )
+        if f.start_time is not None:
+            q = q.filter(models.UASSighting.time >= f.start_time)
+        if f.end_time is not None:
+            q = q.filter(models.UASSighting.time <= f.end_time)
+        return q.with_entities(*_aggregate_columns()).group_by(*_GROUP_KEYS).all()
+
+    digest = models.SightingDigest
+    q = db.query(digest).filter(digest.count > 0)
+    # Digests are per UTC day, so time bounds select whole days
+    if f.start_time is not None:
+        q = q.filter(digest.day >= _day(f.start_time))
+    if f.end_time is not None:
+        q = q.filter(digest.day <= _day(f.end_time))
+    if f.unit:
+        q = q.filter(searches.contains(digest.unit, f.unit))
+    return q.all()
+
+
+def _recent(db: Session, f: schemas.LLMContextFilters, limit: int) -> List[models.UASSighting]:
+    q = searches.build_sighting_query(
+        db, unit=f.unit, ascc=f.ascc, latitude=f.latitude, longitude=f.longitude, radius_km=f.radius_km,
+    )
+    if f.start_time is not None:
+        q = q.filter(models.UASSighting.time >= f.start_time)
+    if f.end_time is not None:
+        q = q.filter(models.UASSighting.time <= f.end_time)
+    q = q.order_by(models.UASSighting.time.desc(), models.UASSighting.id.desc()).limit(limit)
+    return [s for s, _ in q]
+
+
+def _fmt_time(t: datetime) -> str:
+    return t.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%MZ")
+
+
+def _fmt_counts(counts: Counter, top: int = 10) -> str:
+    items = counts.most_common()
+    parts = [f"{k} {n}" for k, n in items[:top]]
+    if len(items) > top:
+        parts.append(f"+{len(items) - top} more")
+    return ", ".join(parts)
+
+
+def _describe_filters(f: schemas.LLMContextFilters) -> str:
+    parts = []
+    if f.start_time or f.end_time:
+        start = f.start_time.date().isoformat() if f.start_time else "start"
+        end = f.end_time.date().isoformat() if f.end_time else "now"
+        parts.append(f"time {start}..{end}")
+    if f.unit:
+        parts.append(f"unit ~ {f.unit!r}")
+    if f.ascc:
+        parts.append(f"ASCC ~ {f.ascc!r}")
+    if f.latitude is not None and f.longitude is not None and f.radius_km is not None:
+        parts.append(f"within {f.radius_km:g} km of {f.latitude:.4f},{f.longitude:.4f}")
+    return "; ".join(parts) or "none (all sightings)"
+
+
+def render(db: Session, f: schemas.LLMContextFilters, max_tokens: int) -> str:
+    """Summarize the matching sightings in at most roughly max_tokens tokens."""
+    groups: Dict[Tuple, _Group] = {}
+    by_type: Counter = Counter()
+    by_unit: Counter = Counter()
+    first = last = None
+    for row in _digest_rows(db, f):
+        g = groups.get((row.day, row.cell, row.unit))
+        if g is None:
+            g = groups[(row.day, row.cell, row.unit)] = _Group(row.day, row.cell, row.unit)
+        g.count += row.count
+        g.lat_sum += row.lat_sum
+        g.lon_sum += row.lon_sum
+        g.first_seen = row.first_seen if g.first_seen is None else min(g.first_seen, row.first_seen)
+        g.last_seen = row.last_seen if g.last_seen is None else max(g.last_seen, row.last_seen)
+        g.by_type[row.type_of_sighting] += row.count
+        by_type[row.type_of_sighting] += row.count
+        by_unit[row.unit] += row.count
+        first = row.first_seen if first is None else min(first, row.first_seen)
+        last = row.last_seen if last is None else max(last, row.last_seen)
+
+    total = sum(by_type.values())
+    lines = [
+        "UAS sighting data from the reporting database. Base answers about sightings on it.",
+        f"Filters: {_describe_filters(f)}",
+    ]
+    if total == 0:
+        lines.append("No sightings match these filters.")
+        return "\n".join(lines)
+    lines += [
+        f"Total: {total} sightings, {_fmt_time(first)} to {_fmt_time(last)}",
+        f"By type: {_fmt_counts(by_type)}",
+        f"By unit: {_fmt_counts(by_unit)}",
+    ]
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    used = sum(len(line) + 1 for line in lines)
+    # Digests get most of what is left; the tail goes to individual recent reports
+    digest_budget = used + (budget - used) * 3 // 4
+
+    ordered = sorted(groups.values(), key=lambda g: (g.day, g.count), reverse=True)
+    header = "Daily digests (UTC day | 1-degree cell | mean position | unit | count by type | first-last):"
+    if used + len(header) < digest_budget:
+        lines.append(header)
+        used += len(header) + 1
+        shown = 0
+        for g in ordered:
+            line = (f"{g.day.isoformat()} | {g.cell} | {g.lat_sum / g.count:.3f},{g.lon_sum / g.count:.3f} | "
+                    f"{g.unit} | {g.count}: {_fmt_counts(g.by_type, 3)} | "
+                    f"{g.first_seen.astimezone(timezone.utc):%H:%M}-{g.last_seen.astimezone(timezone.utc):%H:%M}")
+            if used + len(line) + 1 > digest_budget:
+                break
+            lines.append(line)
+            used += len(line) + 1
+            shown += 1
+        if shown < len(ordered):
+            lines.append(f"({len(ordered) - shown} older or smaller digests omitted)")
+
+    recent_lines = []
+    for s in _recent(db, f, LLM_CONTEXT_RECENT):
+        description = " ".join(s.description.split())
+        if len(description) > 160:
+            description = description[:157] + "..."
+        recent_lines.append(
+            f"{_fmt_time(s.time)} | {s.type_of_sighting} | {s.unit or UNKNOWN} | "
+            f"{s.location_name} ({s.latitude:.4f},{s.longitude:.4f}) | {description}"
+        )
+    header = "Most recent sightings (time | type | unit | location | description):"
+    if recent_lines and used + len(header) + len(recent_lines[0]) + 2 <= budget:
+        lines.append(header)
+        used += len(header) + 1
+        for line in recent_lines:
+            if used + len(line) + 1 > budget:
+                break
+            lines.append(line)
+            used += len(line) + 1
+    return "\n".join(lines)
+
+
+def build(f: schemas.LLMContextFilters) -> str:
+    """Rendered context for a filter set, from the cache when the data hasn't changed."""
+    max_tokens = min(f.max_tokens or LLM_CONTEXT_MAX_TOKENS, LLM_CONTEXT_MAX_TOKENS)
+    key = json.dumps({**f.dict(), "max_tokens": max_tokens}, default=str, sort_keys=True)
+    entry = renderings.get(key)
+    if entry is not None:
+        return entry[3].decode()
+    version = renderings.version
+    # Opened here rather than via get_db because callers run this in a worker thread
+    with database.SessionLocal() as db:
+        rendered = render(db, f, max_tokens)
+    renderings.put(key, version, rendered.encode())
+    return rendered
+
+
+def estimate_tokens(s: str) -> int:
+    return math.ceil(len(s) / CHARS_PER_TOKEN)
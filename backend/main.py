@@ -1,51 +1,44 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, APIRouter, Request
+from fastapi import FastAPI, HTTPException, Depends, Query, APIRouter, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from typing import List, Optional
+from sqlalchemy import and_, select, text
+from sqlalchemy.dialects.postgresql import insert
+from typing import List, Optional, Tuple
+from types import SimpleNamespace
 from pathlib import Path
 from datetime import datetime, timezone
 import math
+import asyncio
+from anyio import to_thread
 import logging
 import os
 import json
 from fastapi.responses import StreamingResponse
-
-try:
-    from cerebras.cloud.sdk import Cerebras
-    CEREBRAS_AVAILABLE = True
-except ImportError:
-    CEREBRAS_AVAILABLE = False
+from starlette.background import BackgroundTask
 
 import models, schemas, searches, database
+import pagination, serialization, response_cache, compression, metrics, ratelimit
+import stats, rollups, llm_context, mgrs_grid
+import spatial_index, tiles, correlation, geofences, feed
+import image_store, derivatives, uploads, llm
 from database import Base, engine, ensure_schema, get_db
 from uploads import router as uploads_router
-from time import time
-from collections import defaultdict
+from exports import router as exports_router
+from derivatives import router as derivatives_router
+from mgrs_grid import router as mgrs_router
+from tiles import router as tiles_router
+from metrics import router as metrics_router
+from feed import router as feed_router
+from geofences import router as geofences_router
+from correlation import router as correlation_router
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Simple rate limiter - track requests per IP
-rate_limit_cache = defaultdict(list)
-RATE_LIMIT_WINDOW = 60  # seconds
-MAX_REQUESTS_PER_WINDOW = 10
-
-def check_rate_limit(ip: str) -> bool:
-    """Check if IP has exceeded rate limit"""
-    now = time()
-    # Remove old entries outside the window
-    rate_limit_cache[ip] = [req_time for req_time in rate_limit_cache[ip] if now - req_time < RATE_LIMIT_WINDOW]
-    
-    # Check if limit exceeded
-    if len(rate_limit_cache[ip]) >= MAX_REQUESTS_PER_WINDOW:
-        return False
-    
-    # Add current request
-    rate_limit_cache[ip].append(now)
-    return True
-
 # Create database tables
 app = FastAPI(title="UAS Reporting Tool", version="1.0.0")
 
@@ -56,7 +49,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Estimated", "ETag", "Retry-After"],
 )
+# gzip/brotli for complete JSON bodies; streaming responses pass through
+app.add_middleware(compression.CompressionMiddleware)
+# Per-route latency and per-request SQL counts, served at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument(engine, "sync")
+metrics.instrument(database.async_engine.sync_engine, "async")
 
 STATIC_DIR = Path("static")
 UPLOADS_DIR = STATIC_DIR / "uploads"
@@ -64,48 +64,308 @@ UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 app.include_router(uploads_router)
+app.include_router(exports_router)
+app.include_router(derivatives_router)
+app.include_router(mgrs_router)
+app.include_router(tiles_router)
+app.include_router(metrics_router)
+app.include_router(feed_router)
+app.include_router(geofences_router)
+app.include_router(correlation_router)
 
 Base.metadata.create_all(bind=engine)
 ensure_schema()
 
+with database.SessionLocal() as _db:
+    stats.backfill(_db)
+    image_store.backfill(_db)
+    llm_context.backfill(_db)
+    mgrs_grid.backfill(_db)
+    rollups.backfill(_db)
+
+# Worker threads for sync (def) routes; 0 keeps the anyio default of 40
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "0"))
+IMAGE_SWEEP_INTERVAL = int(os.getenv("IMAGE_SWEEP_INTERVAL", "21600"))  # seconds
+
+def _sweep_images() -> None:
+    with database.SessionLocal() as db:
+        image_store.sweep(db)
+    uploads.sweep_sessions()
+
+async def _image_sweep_loop() -> None:
+    # Reclaim upload files that no sighting references, and abandoned chunked uploads
+    while True:
+        await asyncio.sleep(IMAGE_SWEEP_INTERVAL)
+        try:
+            await run_in_threadpool(_sweep_images)
+        except Exception as e:
+            logging.error(f"Image sweep failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if THREADPOOL_SIZE > 0:
+        to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    asyncio.create_task(_image_sweep_loop())
+    await feed.broker.start()
+
+@app.on_event("shutdown")
+async def close_clients():
+    await feed.broker.stop()
+    await database.async_engine.dispose()
+    await llm.close()
+
 @app.get("/")
 async def root():
     return {"message": "UAS Reporting Tool API"}
 
+@app.get("/db/pool")
+async def get_pool_status():
+    """Connection pool usage and how long requests have waited for a connection."""
+    return database.pool_status()
+
+# Hot read endpoints use the async engine so they don't hold a threadpool worker while waiting on Postgres
 @app.get("/sightings", response_model=List[schemas.UASSighting])
-def get_sightings(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    sightings = db.query(models.UASSighting).offset(skip).limit(limit).all()
-    return sightings
+async def get_sightings(
+    response: Response,
+    skip: int = Query(0, ge=0, description="Deprecated offset paging; use cursor instead"),
+    limit: int = Query(100, gt=0, le=10000),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,time,latitude,longitude"),
+    count: Optional[str] = Query(None, regex="^(exact|estimated)$", description="Return the total in X-Total-Count"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    # Newest first, paged on (time, id) so every page costs the same
+    columns = pagination.parse_fields(fields)
+    if columns is None:
+        q = select(models.UASSighting)
+    else:
+        # time and id are always selected because the cursor is built from them
+        selected = list(dict.fromkeys(columns + ["time", "id"]))
+        q = select(*[getattr(models.UASSighting, f) for f in selected])
+    q = pagination.keyset_page(q, cursor, limit)
+    if skip and not cursor:
+        q = q.offset(skip)
+    result = await db.execute(q)
+    rows = result.scalars().all() if columns is None else result.all()
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = pagination.encode_cursor(rows[-1].time, rows[-1].id)
+    if count is not None:
+        total, estimated = await pagination.total_count(db, count)
+        headers["X-Total-Count"] = str(total)
+        headers["X-Total-Count-Estimated"] = "true" if estimated else "false"
+
+    if columns is not None:
+        return serialization.FastJSONResponse(serialization.rows(rows, columns), headers=headers)
+    response.headers.update(headers)
+    return rows
+
+@app.get("/sightings/stats", response_model=schemas.SightingStats)
+async def get_sighting_stats(
+    bucket: str = Query("day", regex="^(day|month)$", description="Time bucket for by_time"),
+    days: Optional[int] = Query(30, gt=0, le=3660, description="How far back by_time goes"),
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    # Read from the summary table; cost does not grow with the number of sightings
+    return await stats.read(db, bucket=bucket, days=days)
+
+@app.get("/sightings/histogram", response_model=schemas.TimeHistogram)
+def get_sighting_histogram(
+    request: Request,
+    start_time: datetime = Query(..., description="ISO e.g. 2025-09-11T00:00"),
+    end_time: datetime = Query(..., description="ISO e.g. 2025-09-18T00:00"),
+    bucket: str = Query("day", regex="^(hour|day|week)$"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=1000),
+    db: Session = Depends(database.get_db),
+):
+    # Summed from the hourly rollups; never reads uas_sightings
+    if end_time < start_time:
+        raise HTTPException(status_code=400, detail="end_time must be >= start_time")
+    if len({latitude is None, longitude is None, radius_km is None}) > 1:
+        raise HTTPException(status_code=400, detail="Provide latitude, longitude and radius_km together or not at all.")
+    return response_cache.cached_response(
+        request,
+        lambda: rollups.histogram(db, start_time, end_time, bucket, latitude, longitude, radius_km),
+    )
+
+# Derived structures that follow every insert and delete. The _record_* half runs
+# inside the write transaction; the _publish_* half updates per-process state and
+# files once the commit has succeeded. Both take ORM rows or any objects with the
+# same attributes.
+def _record_created(db: Session, sightings) -> List[Tuple[object, List[int]]]:
+    """Returns the geofence matches, as (sighting, geofence ids)."""
+    stats.apply(db, sightings, +1)
+    llm_context.apply(db, sightings, +1)
+    rollups.apply(db, sightings, +1)
+    image_store.retain(db, sightings)
+    return geofences.apply(db, sightings)
+
+def _publish_created(sightings, alerts) -> None:
+    for s in sightings:
+        spatial_index.index.add(s.id, s.latitude, s.longitude)
+        tiles.pyramid.add(s.id, s.latitude, s.longitude, s.symbol_code)
+        correlation.correlator.add(s.id, s.time, s.latitude, s.longitude, s.unit)
+    response_cache.cache.bump()
+    llm_context.renderings.bump()
+    feed.publish("created", sightings)
+    feed.publish_alerts(alerts)
+
+def _record_deleted(db: Session, sightings) -> List[str]:
+    """Returns image URLs that are no longer referenced by any sighting."""
+    stats.apply(db, sightings, -1)
+    llm_context.apply(db, sightings, -1)
+    rollups.apply(db, sightings, -1)
+    return image_store.release(db, sightings)
+
+def _publish_deleted(sightings, orphaned_images: List[str]) -> None:
+    for s in sightings:
+        spatial_index.index.remove(s.id)
+        tiles.pyramid.remove(s.id)
+        correlation.correlator.remove(s.id)
+    response_cache.cache.bump()
+    llm_context.renderings.bump()
+    feed.publish("deleted", sightings)
+    derivatives.discard(image_store.remove_files(orphaned_images))
 
 @app.post("/sightings", response_model=schemas.UASSighting)
 def create_sighting(sighting: schemas.UASSightingCreate, db: Session = Depends(database.get_db)):
-    db_sighting = models.UASSighting(**sighting.dict())
+    db_sighting = models.UASSighting(**sighting.dict(), **mgrs_grid.grid_keys(sighting.latitude, sighting.longitude))
     db.add(db_sighting)
+    alerts = _record_created(db, [db_sighting])
     db.commit()
     db.refresh(db_sighting)
+    _publish_created([db_sighting], alerts)
     return db_sighting
 
-@app.get("/sightings/{sighting_id}", response_model=schemas.UASSighting)
-def get_sighting(sighting_id: int, db: Session = Depends(database.get_db)):
-    sighting = db.query(models.UASSighting).filter(models.UASSighting.id == sighting_id).first()
-    if sighting is None:
-        raise HTTPException(status_code=404, detail="Sighting not found")
-    return sighting
+BULK_BATCH_SIZE = 500
+MAX_BULK_ROWS = int(os.getenv("MAX_BULK_ROWS", "10000"))
+MAX_BULK_BYTES = int(os.getenv("MAX_BULK_BYTES", str(32 * 1024 * 1024)))
 
-@app.delete("/sightings/{sighting_id}")
-def delete_sighting(sighting_id: int, db: Session = Depends(database.get_db)):
-    sighting = db.query(models.UASSighting).filter(models.UASSighting.id == sighting_id).first()
-    if sighting is None:
-        raise HTTPException(status_code=404, detail="Sighting not found")
-    db.delete(sighting)
-    db.commit()
-    return {"message": "Sighting deleted successfully"}
+def _ingest_batches(db: Session, rows: List[Tuple[int, schemas.UASSightingCreate]]) -> dict:
+    """Insert validated rows with one multi-row INSERT per batch. Returns {index: id or error}."""
+    table = models.UASSighting.__table__
+    outcome = {}
+    for start in range(0, len(rows), BULK_BATCH_SIZE):
+        batch = rows[start:start + BULK_BATCH_SIZE]
+        try:
+            # Ids are taken up front so each result maps to its input row;
+            # INSERT ... RETURNING does not promise VALUES order
+            ids = db.execute(
+                text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :n)"),
+                {"table": table.name, "n": len(batch)},
+            ).scalars().all()
+            values = [{**item.dict(), **mgrs_grid.grid_keys(item.latitude, item.longitude), "id": sighting_id}
+                      for (_, item), sighting_id in zip(batch, ids)]
+            stmt = insert(table).values(values).returning(*table.c)
+            inserted = [SimpleNamespace(**r._mapping) for r in db.execute(stmt)]
+            alerts = _record_created(db, inserted)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logging.error(f"Bulk insert batch failed: {str(e)}")
+            for index, _ in batch:
+                outcome[index] = f"Insert failed: {str(e)}"
+            continue
+        _publish_created(inserted, alerts)
+        for (index, _), sighting_id in zip(batch, ids):
+            outcome[index] = sighting_id
+    return outcome
+
+def _parse_bulk(body: bytes, ndjson: bool) -> Tuple[List[Tuple[int, schemas.UASSightingCreate]], dict]:
+    """Decode and validate a bulk body. Returns the valid rows and {index: error}."""
+    items: List[Tuple[int, object]] = []
+    errors = {}
+    if ndjson:
+        # Indexed by line number, so errors point at the line to fix
+        for index, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append((index, json.loads(line)))
+            except ValueError as e:
+                errors[index] = f"Invalid JSON: {str(e)}"
+    else:
+        try:
+            payload = json.loads(body or b"[]")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of sightings")
+        items = list(enumerate(payload))
+
+    if len(items) + len(errors) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows. Maximum {MAX_BULK_ROWS} per request.")
+
+    valid: List[Tuple[int, schemas.UASSightingCreate]] = []
+    for index, obj in items:
+        try:
+            valid.append((index, schemas.UASSightingCreate.parse_obj(obj)))
+        except ValidationError as e:
+            errors[index] = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+    return valid, errors
+
+def _ingest_body(db: Session, body: bytes, ndjson: bool) -> Tuple[dict, dict]:
+    valid, errors = _parse_bulk(body, ndjson)
+    return _ingest_batches(db, valid), errors
+
+@app.post("/sightings/bulk", response_model=schemas.BulkIngestResult)
+async def create_sightings_bulk(request: Request, db: Session = Depends(database.get_db)):
+    """
+    Ingest many sightings in one call, as a JSON array or as NDJSON
+    (Content-Type: application/x-ndjson, one sighting per line).
+    Each row is validated on its own; bad rows are reported and the rest are inserted.
+    Results are indexed by array position (from 0), or for NDJSON by line number (from 1).
+    """
+    too_large = HTTPException(status_code=413, detail=f"Request body too large. Maximum {MAX_BULK_BYTES // (1024 * 1024)} MB.")
+    try:
+        declared = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared > MAX_BULK_BYTES:
+        raise too_large
+    # Read no more than the cap, whatever the headers claimed
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BULK_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+
+    # Decoding, validation and the inserts are blocking; keep them off the event loop
+    outcome, errors = await run_in_threadpool(_ingest_body, db, b"".join(chunks), ndjson)
+    errors.update({i: v for i, v in outcome.items() if isinstance(v, str)})
+
+    results = []
+    for index in sorted(set(outcome) | set(errors)):
+        if index in errors:
+            results.append({"index": index, "status": "error", "error": errors[index]})
+        else:
+            results.append({"index": index, "status": "created", "id": outcome[index]})
+    created = sum(1 for r in results if r["status"] == "created")
+    logging.info(f"Bulk ingest: {created} created, {len(results) - created} failed")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+FIELDS_HELP = "Comma-separated fields to return, e.g. id,time,latitude,longitude; skips ORM objects and validation"
+
+def _search_response(request: Request, columns: Optional[List[str]], search) -> Response:
+    """Cached search results; with ?fields= only those columns are selected and encoded as plain dicts."""
+    if columns is None:
+        return response_cache.cached_response(request, lambda: search(None), schemas.UASSighting)
+    return response_cache.cached_response(request, lambda: serialization.rows(search(columns), columns))
 
 # Search UAS sightings by time range
 @app.get("/sightings/search/time", response_model=List[schemas.UASSighting])
 def search_sightings_by_time(
+    request: Request,
     start_time: str,
     end_time: str,
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
     db: Session = Depends(database.get_db)
 ):
     try:
@@ -115,16 +375,22 @@ def search_sightings_by_time(
         raise HTTPException(status_code=400, detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM or YYYY-MM-DDTHH:MM:SS)")
     if end_dt < start_dt:
         raise HTTPException(status_code=400, detail="end_time must be >= start_time")
-    return searches.search_by_time_range(db, start_dt, end_dt)
+    return _search_response(
+        request, pagination.parse_fields(fields),
+        lambda columns: searches.search_by_time_range(db, start_dt, end_dt, columns))
 
 @app.get("/sightings/search/proximity", response_model=List[schemas.UASSighting])
 def search_sightings_by_proximity(
+    request: Request,
     latitude: float,
     longitude: float,
-    radius_km: float,
+    radius_km: float = Query(..., gt=0, le=1000, description="Search radius in kilometers"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
     db: Session = Depends(database.get_db),
 ):
-    return searches.search_by_proximity(db, latitude, longitude, radius_km)
+    return _search_response(
+        request, pagination.parse_fields(fields),
+        lambda columns: searches.search_by_proximity(db, latitude, longitude, radius_km, columns=columns))
 
 # ---------------------------
 # NEW: Combined search API
@@ -134,31 +400,37 @@ def search_sightings_by_proximity(
 #   /sightings/search?start_time=2025-09-10T09:00&end_time=2025-09-10T17:00
 #   /sightings/search?latitude=49.45&longitude=7.56&radius_km=5
 #   /sightings/search?start_time=2025-09-10T09:00&end_time=2025-09-10T17:00&latitude=49.45&longitude=7.56&radius_km=5
-@app.get("/sightings/search", response_model=List[schemas.UASSighting])
+@app.get("/sightings/search", response_model=List[schemas.UASSightingSearchResult])
 def search_sightings_combined(
+    request: Request,
     start_time: Optional[str] = Query(None, description="ISO format e.g. 2025-09-11T14:30"),
     end_time:   Optional[str] = Query(None, description="ISO format e.g. 2025-09-11T16:00"),
     latitude:   Optional[float] = Query(None),
     longitude:  Optional[float] = Query(None),
     radius_km:  Optional[float] = Query(None),
     unit: Optional[str] = Query(None, description="Unit name to search for"),
+    ascc: Optional[str] = Query(None, description="ASCC name to search for"),
+    order_by: Optional[str] = Query(None, regex="^(distance|time)$", description="Sort by 'distance' (needs lat/lon/radius) or 'time'"),
+    limit: Optional[int] = Query(None, gt=0, le=10000, description="Maximum number of results"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
     db: Session = Depends(database.get_db),
 ):
+    columns = pagination.parse_fields(fields)
     try:
         # Normalize empty strings to None
         if unit == "":
             unit = None
+        if ascc == "":
+            ascc = None
         if start_time == "":
             start_time = None
         if end_time == "":
             end_time = None
         
-        logging.info(f"Search called with: start_time={start_time}, end_time={end_time}, unit={unit}, latitude={latitude}, longitude={longitude}, radius_km={radius_km}")
-        
-        # Start with a base query
-        q = db.query(models.UASSighting)
+        logging.info(f"Search called with: start_time={start_time}, end_time={end_time}, unit={unit}, ascc={ascc}, latitude={latitude}, longitude={longitude}, radius_km={radius_km}")
 
         # Time filtering (only if both provided)
+        start_dt = end_dt = None
         if start_time is not None and end_time is not None:
             try:
                 start_dt = datetime.fromisoformat(start_time)
@@ -167,28 +439,35 @@ def search_sightings_combined(
                 raise HTTPException(status_code=400, detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM or YYYY-MM-DDTHH:MM:SS)")
             if end_dt < start_dt:
                 raise HTTPException(status_code=400, detail="end_time must be >= start_time")
-            q = q.filter(and_(models.UASSighting.time >= start_dt,
-                              models.UASSighting.time <= end_dt))
-
-        # Unit filtering
-        if unit is not None and unit.strip():
-            q = q.filter(models.UASSighting.unit.ilike(f"%{unit}%"))
-
-        # Execute DB query (time-filtered or all)
-        results = q.all()
-        logging.info(f"Query returned {len(results)} results")
-
-        # Proximity filtering (only if all three provided)
-        if latitude is not None and longitude is not None and radius_km is not None:
-            # Reuse haversine from searches.py
-            filtered = []
-            for s in results:
-                dist = searches.haversine(latitude, longitude, s.latitude, s.longitude)
-                if dist <= radius_km:
-                    filtered.append(s)
-            return filtered
-
-        return results
+
+        # Time, unit, ASCC and radius filters all run in one SQL statement
+        q = searches.build_sighting_query(
+            db,
+            start_time=start_dt,
+            end_time=end_dt,
+            unit=unit.strip() if unit else None,
+            ascc=ascc.strip() if ascc else None,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            order_by=order_by,
+            limit=limit,
+            columns=columns,
+        )
+
+        if columns is not None:
+            return response_cache.cached_response(
+                request, lambda: serialization.rows(q.all(), columns + ["distance_km"]))
+
+        def run():
+            results = []
+            for s, distance_km in q.all():
+                s.distance_km = distance_km
+                results.append(s)
+            logging.info(f"Query returned {len(results)} results")
+            return results
+
+        return response_cache.cached_response(request, run, schemas.UASSightingSearchResult)
     except HTTPException:
         raise
     except Exception as e:
@@ -197,10 +476,12 @@ def search_sightings_combined(
 
 @app.get("/sightings/search/mgrs", response_model=List[schemas.UASSighting])
 def search_sightings_by_mgrs(
+    request: Request,
     mgrs: str = Query(..., description="MGRS string, e.g. 18SUJ234678 or '18S UJ 234 678'"),
     radius_km: float = Query(..., gt=0, le=1000, description="Search radius in kilometers"),
     start_time: Optional[str] = Query(None, description="ISO e.g. 2025-09-11T14:30"),
     end_time:   Optional[str] = Query(None, description="ISO e.g. 2025-09-11T16:00"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
     db: Session = Depends(database.get_db),
 ):
     # Normalize empty strings to None
@@ -210,10 +491,10 @@ def search_sightings_by_mgrs(
         end_time = None
     
     # Validate time args (both or neither)
-    q = db.query(models.UASSighting)
     if (start_time is None) ^ (end_time is None):
         raise HTTPException(status_code=400, detail="Provide both start_time and end_time or neither.")
 
+    start_dt = end_dt = None
     if start_time is not None and end_time is not None:
         try:
             start_dt = datetime.fromisoformat(start_time)
@@ -222,8 +503,6 @@ def search_sightings_by_mgrs(
             raise HTTPException(status_code=400, detail="Invalid date format. Use ISO format (YYYY-MM-DDTHH:MM or YYYY-MM-DDTHH:MM:SS)")
         if end_dt < start_dt:
             raise HTTPException(status_code=400, detail="end_time must be >= start_time")
-        q = q.filter(and_(models.UASSighting.time >= start_dt,
-                          models.UASSighting.time <= end_dt))
 
     # Convert MGRS -> center point
     try:
@@ -231,107 +510,137 @@ def search_sightings_by_mgrs(
     except Exception:
         raise HTTPException(status_code=422, detail="Invalid MGRS coordinate")
 
-    # Bounding box prefilter for performance
-    lat_pad = radius_km / 111.0
-    lon_pad = radius_km / (111.0 * max(0.1, math.cos(math.radians(center_lat))))
-    lat_min, lat_max = center_lat - lat_pad, center_lat + lat_pad
-    lon_min, lon_max = center_lon - lon_pad, center_lon + lon_pad
+    # Spatial index lookup, already sorted by distance ascending for nicer UX
+    return _search_response(
+        request, pagination.parse_fields(fields),
+        lambda columns: searches.search_by_proximity(db, center_lat, center_lon, radius_km, start_dt, end_dt, columns),
+    )
 
-    candidates = (
-        q.filter(models.UASSighting.latitude.between(lat_min, lat_max))
-         .filter(models.UASSighting.longitude.between(lon_min, lon_max))
-         .all()
+@app.get("/sightings/search/mgrs/area", response_model=List[schemas.UASSighting])
+def search_sightings_by_mgrs_area(
+    request: Request,
+    mgrs: str = Query(..., description="Grid zone, 100 km, 10 km or 1 km square, e.g. 32U, 32ULV, 32ULV97, 32ULV9173"),
+    start_time: Optional[datetime] = Query(None, description="ISO e.g. 2025-09-11T14:30"),
+    end_time: Optional[datetime] = Query(None, description="ISO e.g. 2025-09-11T16:00"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
+    db: Session = Depends(database.get_db),
+):
+    # Matches the precomputed mgrs_* columns; no coordinate conversion or distance math
+    if (start_time is None) ^ (end_time is None):
+        raise HTTPException(status_code=400, detail="Provide both start_time and end_time or neither.")
+    try:
+        mgrs_grid.parse(mgrs)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid MGRS coordinate")
+    return _search_response(
+        request, pagination.parse_fields(fields),
+        lambda columns: searches.search_by_mgrs_area(db, mgrs, start_time, end_time, columns),
+    )
+
+@app.get("/sightings/search/text", response_model=schemas.TextSearchResult)
+def search_sightings_text(
+    q: Optional[str] = Query(None, description="Substring to find in unit, ASCC, location name or description"),
+    unit: Optional[str] = Query(None, description="Exact unit facet"),
+    ascc: Optional[str] = Query(None, description="Exact ASCC facet"),
+    type_of_sighting: Optional[str] = Query(None, description="Exact sighting type facet"),
+    limit: int = Query(100, gt=0, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(database.get_db),
+):
+    # Trigram indexes serve the substring match; facets are GROUP BY counts in the database
+    filters = searches.text_search_filters(
+        q=q.strip() if q else None,
+        unit=unit or None,
+        ascc=ascc or None,
+        type_of_sighting=type_of_sighting or None,
     )
+    return {
+        "total": db.query(models.UASSighting.id).filter(*filters).count(),
+        "results": searches.search_text(db, filters, limit, offset),
+        "facets": searches.facet_counts(db, filters),
+    }
+
+@app.get("/sightings/search/nearest", response_model=List[schemas.UASSighting])
+def search_sightings_nearest(
+    latitude: float,
+    longitude: float,
+    k: int = Query(10, gt=0, le=1000, description="Number of sightings to return"),
+    max_distance_km: Optional[float] = Query(None, gt=0, description="Optional search radius cap"),
+    fields: Optional[str] = Query(None, description=FIELDS_HELP),
+    db: Session = Depends(database.get_db),
+):
+    columns = pagination.parse_fields(fields)
+    if columns is not None:
+        rows = searches.search_nearest(db, latitude, longitude, k, max_distance_km, columns)
+        return serialization.FastJSONResponse(serialization.rows(rows, columns))
+    return searches.search_nearest(db, latitude, longitude, k, max_distance_km)
+
+# Routes with a {sighting_id} path parameter go after the fixed /sightings/... paths so they don't shadow them
+@app.get("/sightings/{sighting_id}", response_model=schemas.UASSighting)
+async def get_sighting(sighting_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    sighting = await db.get(models.UASSighting, sighting_id)
+    if sighting is None:
+        raise HTTPException(status_code=404, detail="Sighting not found")
+    return sighting
 
-    inside: List[models.UASSighting] = []
-    for s in candidates:
-        dist = searches.haversine(center_lat, center_lon, s.latitude, s.longitude)
-        if dist <= radius_km:
-            inside.append(s)
+@app.delete("/sightings/{sighting_id}")
+def delete_sighting(sighting_id: int, db: Session = Depends(database.get_db)):
+    sighting = db.query(models.UASSighting).filter(models.UASSighting.id == sighting_id).first()
+    if sighting is None:
+        raise HTTPException(status_code=404, detail="Sighting not found")
+    db.delete(sighting)
+    orphaned_images = _record_deleted(db, [sighting])
+    db.commit()
+    _publish_deleted([sighting], orphaned_images)
+    return {"message": "Sighting deleted successfully"}
 
-    # Sort by distance ascending for nicer UX
-    inside.sort(key=lambda s: searches.haversine(center_lat, center_lon, s.latitude, s.longitude))
-    return inside
+@app.get("/llm/context", response_model=schemas.LLMContext)
+def get_llm_context(filters: schemas.LLMContextFilters = Depends()):
+    """The sighting context /llm/chat would send for these filters."""
+    context = llm_context.build(filters)
+    return {"context": context, "estimated_tokens": llm_context.estimate_tokens(context)}
 
 # LLM Chat endpoint
-@app.post("/llm/chat")
+# 10 requests per minute per client unless RATE_LIMIT_LLM_CHAT says otherwise
+@app.post("/llm/chat", dependencies=[Depends(ratelimit.limit("llm_chat", "10/60"))])
 async def llm_chat(request: Request, request_data: dict):
     logging.info("LLM chat endpoint called")
-    logging.info(f"CEREBRAS_AVAILABLE: {CEREBRAS_AVAILABLE}")
+    logging.info(f"CEREBRAS_AVAILABLE: {llm.CEREBRAS_AVAILABLE}")
     
-    # Get client IP for rate limiting
-    client_ip = request.client.host if request.client else "unknown"
-    
-    # Check rate limit
-    if not check_rate_limit(client_ip):
-        logging.warning(f"Rate limit exceeded for IP: {client_ip}")
-        raise HTTPException(status_code=429, detail="Too many requests. Please wait before trying again.")
-    
-    if not CEREBRAS_AVAILABLE:
+    if not llm.CEREBRAS_AVAILABLE:
         error_msg = "Cerebras SDK not available. Please install: pip install cerebras-cloud-sdk"
         logging.error(error_msg)
         raise HTTPException(status_code=503, detail=error_msg)
     
-    try:
-        messages = request_data.get("messages", [])
-        model = request_data.get("model", "qwen-3-235b-a22b-instruct-2507")
-        temperature = request_data.get("temperature", 0.7)
-        top_p = request_data.get("top_p", 0.8)
-        max_completion_tokens = request_data.get("max_completion_tokens", 20000)
-        
-        logging.info(f"Model: {model}, Messages count: {len(messages)}")
-        
-        # Initialize Cerebras client
-        api_key = os.environ.get("CEREBRAS_API_KEY")
-        if not api_key:
-            error_msg = "CEREBRAS_API_KEY environment variable not set"
-            logging.error(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-        
-        logging.info("Initializing Cerebras client...")
-        client = Cerebras(api_key=api_key)
-        
-        async def generate_response():
-            try:
-                logging.info("Starting Cerebras chat completion...")
-                stream = client.chat.completions.create(
-                    messages=messages,
-                    model=model,
-                    stream=True,
-                    max_completion_tokens=max_completion_tokens,
-                    temperature=temperature,
-                    top_p=top_p
-                )
-                
-                for chunk in stream:
-                    if chunk.choices and len(chunk.choices) > 0:
-                        content = chunk.choices[0].delta.content or ""
-                        if content:
-                            yield f"data: {json.dumps({'content': content})}\n\n"
-                
-                yield f"data: {json.dumps({'done': True})}\n\n"
-                logging.info("Chat completion finished successfully")
-            except Exception as e:
-                error_msg = str(e)
-                logging.error(f"Error in generate_response: {error_msg}")
-                
-                # Check if it's a rate limit error
-                if "429" in error_msg or "too_many_requests" in error_msg.lower() or "queue" in error_msg.lower():
-                    detailed_error = "The AI service is currently experiencing high traffic. Please try again in a few moments."
-                elif "401" in error_msg or "Unauthorized" in error_msg:
-                    detailed_error = "Authentication failed. Please check the API key configuration."
-                elif "503" in error_msg or "Service Unavailable" in error_msg:
-                    detailed_error = "The AI service is temporarily unavailable. Please try again later."
-                else:
-                    detailed_error = f"Sorry, an error occurred: {error_msg}"
-                
-                yield f"data: {json.dumps({'error': detailed_error})}\n\n"
-        
-        return StreamingResponse(generate_response(), media_type="text/event-stream")
-        
-    except Exception as e:
-        logging.error(f"LLM chat error: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"LLM chat error: {str(e)}")
+    params = {
+        "messages": request_data.get("messages", []),
+        "model": request_data.get("model", "qwen-3-235b-a22b-instruct-2507"),
+        "temperature": request_data.get("temperature", 0.7),
+        "top_p": request_data.get("top_p", 0.8),
+        "max_completion_tokens": request_data.get("max_completion_tokens", 20000),
+    }
+    logging.info(f"Model: {params['model']}, Messages count: {len(params['messages'])}")
+    
+    # Optional "context": {filters} grounds the answer in matching sightings via a leading system message
+    context = request_data.get("context")
+    if context is not None:
+        try:
+            filters = schemas.LLMContextFilters(**(context if isinstance(context, dict) else {}))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors())
+        grounding = await run_in_threadpool(llm_context.build, filters)
+        params["messages"] = [{"role": "system", "content": grounding}] + list(params["messages"])
+    
+    # Fails fast with a 500 if the API key is missing
+    llm.get_client()
+    # Waits up to LLM_QUEUE_TIMEOUT for an upstream stream slot, then 503s
+    slot = await llm.acquire_slot()
+    # The background task returns the slot if the stream never got started
+    return StreamingResponse(
+        llm.stream_chat(slot, params),
+        media_type="text/event-stream",
+        background=BackgroundTask(slot.release),
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,261 @@
+"""
+Request, SQL, pool, image and LLM instrumentation, served at /metrics in the
+Prometheus text format.
+
+MetricsMiddleware times every request under its route template (never the raw
+path, so label values stay bounded) and collects the SQL statements the request
+ran through the SQLAlchemy cursor hooks installed by instrument(). The request's
+tally lives in a contextvar, which follows the request into threadpool workers
+and streaming bodies.
+
+Recording is a perf_counter() call and a few additions under a lock, so it is
+cheap enough to leave on. Values are per process; with several workers, scrape
+each one or aggregate in Prometheus.
+"""
+
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import threading
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+
+import database
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+router = APIRouter()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # key -> [per-bucket counts (last one is +Inf), count, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for key, (counts, count, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, key)} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, key)} {_number(total)}")
+        return lines
+
+
+_registry: List[_Metric] = []
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time from request start to the end of the response body.",
+    LATENCY_BUCKETS, ("method", "route", "status"))
+http_request_sql_statements = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request.", COUNT_BUCKETS, ("route",))
+http_request_sql_duration = Histogram(
+    "http_request_sql_duration_seconds", "Total SQL execution time per request.", LATENCY_BUCKETS, ("route",))
+sql_statement_duration = Histogram(
+    "sql_statement_duration_seconds", "Duration of individual SQL statements.", SQL_BUCKETS, ("engine",))
+sql_errors = Counter("sql_errors_total", "SQL statements that raised.", ("engine",))
+rows_fetched = Counter(
+    "search_rows_fetched_total", "Candidate rows examined by distance post-filtering.", ("path",))
+rows_returned = Counter(
+    "search_rows_returned_total", "Rows kept after distance post-filtering.", ("path",))
+image_processing = Histogram(
+    "image_processing_seconds", "Time spent processing an image in the worker pool.", LATENCY_BUCKETS, ("task",))
+image_queue_wait = Histogram(
+    "image_queue_wait_seconds", "Time an image waited for an image pool slot.", LATENCY_BUCKETS)
+llm_time_to_first_token = Histogram(
+    "llm_time_to_first_token_seconds", "Time from sending a chat completion to its first content chunk.",
+    LATENCY_BUCKETS)
+llm_stream_duration = Histogram(
+    "llm_stream_duration_seconds", "Duration of a streamed chat completion.", LATENCY_BUCKETS, ("outcome",))
+
+
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def record_filter(path: str, fetched: int, returned: int) -> None:
+    """Count rows a post-filter examined against the rows it kept; their ratio is the filter's waste."""
+    rows_fetched.inc(fetched, path=path)
+    rows_returned.inc(returned, path=path)
+
+
+def instrument(engine, name: str) -> None:
+    """Time every cursor execution on a (sync) engine and attribute it to the current request."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        sql_statement_duration.observe(elapsed, engine=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        sql_errors.inc(engine=name)
+
+
+class MetricsMiddleware:
+    """Pure ASGI, so streaming responses pass through untouched and are timed to their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _request_stats.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started,
+                                          method=scope["method"], route=route, status=status)
+            http_request_sql_statements.observe(stats.statements, route=route)
+            http_request_sql_duration.observe(stats.sql_seconds, route=route)
+
+
+def _pool_lines() -> Iterable[str]:
+    status = database.pool_status()
+    for gauge, field, help in (
+        ("db_pool_size", "size", "Configured pool size."),
+        ("db_pool_checked_out", "checked_out", "Connections currently in use."),
+        ("db_pool_checked_in", "checked_in", "Idle connections in the pool."),
+        ("db_pool_overflow", "overflow", "Connections open beyond the pool size."),
+    ):
+        yield f"# HELP {gauge} {help}"
+        yield f"# TYPE {gauge} gauge"
+        for engine_name, pool in status.items():
+            yield f'{gauge}{{engine="{engine_name}"}} {pool[field]}'
+
+    yield "# HELP db_pool_wait_seconds Time spent waiting to check a connection out of the pool."
+    yield "# TYPE db_pool_wait_seconds histogram"
+    for engine_name, pool in status.items():
+        wait = pool["wait"]
+        cumulative = 0
+        for bound, n in wait["buckets"].items():
+            cumulative += n
+            le = "+Inf" if float(bound) == float("inf") else bound
+            yield f'db_pool_wait_seconds_bucket{{engine="{engine_name}",le="{le}"}} {cumulative}'
+        yield f'db_pool_wait_seconds_count{{engine="{engine_name}"}} {wait["count"]}'
+        yield f'db_pool_wait_seconds_sum{{engine="{engine_name}"}} {_number(wait["sum_seconds"])}'
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.extend(_pool_lines())
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
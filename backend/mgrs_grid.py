@@ -0,0 +1,175 @@
+"""
+MGRS conversion and per-sighting grid keys.
+
+Every sighting stores the grid zone designator, 100 km square and 1 km square
+it falls in (e.g. 32U / 32ULV / 32ULV9173), computed once at insert. An MGRS
+area query then becomes an equality or prefix match on an indexed column
+instead of a conversion plus a bounding-box scan.
+
+Conversions go through one shared converter and are memoized, since the map UI
+and searches ask for the same references over and over.
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import logging
+import os
+import re
+
+import mgrs as mgrs_lib
+from fastapi import APIRouter, HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import models, schemas
+
+MGRS_CACHE_SIZE = int(os.getenv("MGRS_CACHE_SIZE", "65536"))
+MGRS_CONVERT_MAX = int(os.getenv("MGRS_CONVERT_MAX", "10000"))  # coordinates per /mgrs/convert call
+BACKFILL_BATCH = 5000
+
+_BACKFILL_LOCK_ID = 0x3A675
+
+# Zone + band (UTM, "32U") or a single polar letter (UPS, "Z"), then the 100 km
+# square letters, then an even number of digits: half easting, half northing
+_MGRS_RE = re.compile(r"^(\d{1,2}[C-HJ-NP-X]|[ABYZ])([A-HJ-NP-Z]{2})?(\d*)$")
+
+_converter = mgrs_lib.MGRS()
+
+router = APIRouter()
+
+
+def normalize(mgrs_str: str) -> str:
+    value = mgrs_str.replace(" ", "").upper()
+    # Single-digit zones are stored zero-padded, the way the converter writes them
+    if len(value) > 1 and value[0].isdigit() and not value[1].isdigit():
+        value = "0" + value
+    return value
+
+
+@lru_cache(maxsize=MGRS_CACHE_SIZE)
+def _to_latlon(normalized: str) -> Tuple[float, float]:
+    lat, lon = _converter.toLatLon(normalized)
+    return float(lat), float(lon)
+
+
+def to_latlon(mgrs_str: str) -> Tuple[float, float]:
+    """South-west corner of the referenced square, as the mgrs library returns it."""
+    return _to_latlon(normalize(mgrs_str))
+
+
+@lru_cache(maxsize=MGRS_CACHE_SIZE)
+def to_mgrs(latitude: float, longitude: float, precision: int = 5) -> str:
+    return _converter.toMGRS(latitude, longitude, MGRSPrecision=precision)
+
+
+def parse(mgrs_str: str) -> Tuple[str, Optional[str], str]:
+    """Split a reference into (grid zone, 100 km square letters or None, digits). Raises ValueError."""
+    match = _MGRS_RE.match(normalize(mgrs_str))
+    if match is None or len(match.group(3)) % 2 or len(match.group(3)) > 10:
+        raise ValueError(f"Invalid MGRS reference: {mgrs_str!r}")
+    gzd, square, digits = match.groups()
+    if digits and square is None:
+        raise ValueError(f"Invalid MGRS reference: {mgrs_str!r}")
+    return gzd, square, digits
+
+
+def grid_keys(latitude: float, longitude: float) -> Dict[str, Optional[str]]:
+    """The mgrs_* column values for a point; all None if it can't be converted."""
+    try:
+        key_1km = to_mgrs(latitude, longitude, 2)
+        gzd, square, _ = parse(key_1km)
+    except Exception:
+        return {"mgrs_gzd": None, "mgrs_100km": None, "mgrs_1km": None}
+    return {"mgrs_gzd": gzd, "mgrs_100km": gzd + square, "mgrs_1km": key_1km}
+
+
+def area_filter(mgrs_str: str):
+    """
+    SQL filter matching sightings inside the square an MGRS reference names:
+    a grid zone, a 100 km square, a 10 km square or a 1 km square. Finer
+    references are truncated to 1 km. Raises ValueError for invalid input.
+    """
+    gzd, square, digits = parse(mgrs_str)
+    sighting = models.UASSighting
+    if square is None:
+        return sighting.mgrs_gzd == gzd
+    prefix = gzd + square
+    if not digits:
+        return sighting.mgrs_100km == prefix
+    half = len(digits) // 2
+    easting, northing = digits[:half], digits[half:]
+    if half == 1:
+        # 10 km square: the hundred 1 km keys it contains
+        keys = [f"{prefix}{easting}{e}{northing}{n}" for e in range(10) for n in range(10)]
+        return sighting.mgrs_1km.in_(keys)
+    return sighting.mgrs_1km == f"{prefix}{easting[:2]}{northing[:2]}"
+
+
+def backfill(db: Session) -> None:
+    """
+    Compute grid keys for sightings stored before the columns existed.
+
+    Each batch commits on its own, so no transaction holds row locks for the
+    whole table. A worker that finds another one already backfilling skips it.
+    """
+    update = text(
+        "UPDATE uas_sightings SET mgrs_gzd = :mgrs_gzd, mgrs_100km = :mgrs_100km, mgrs_1km = :mgrs_1km "
+        "WHERE id = :b_id"
+    )
+    updated = 0
+    last_id = 0
+    # A connection of its own: the session-level lock has to outlive the batch commits
+    with db.get_bind().connect() as conn:
+        with conn.begin():
+            locked = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": _BACKFILL_LOCK_ID}).scalar()
+        if not locked:
+            return
+        try:
+            while True:
+                with conn.begin():
+                    rows = conn.execute(
+                        text("SELECT id, latitude, longitude FROM uas_sightings "
+                             "WHERE mgrs_1km IS NULL AND id > :last_id ORDER BY id LIMIT :n"),
+                        {"last_id": last_id, "n": BACKFILL_BATCH},
+                    ).fetchall()
+                    if not rows:
+                        break
+                    conn.execute(update, [{"b_id": r.id, **grid_keys(r.latitude, r.longitude)} for r in rows])
+                updated += len(rows)
+                last_id = rows[-1].id
+        finally:
+            with conn.begin():
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _BACKFILL_LOCK_ID})
+    if updated:
+        logging.info(f"Computed MGRS grid keys for {updated} sightings")
+
+
+def _convert_point(latitude: float, longitude: float, precision: int) -> Dict:
+    try:
+        return {"latitude": latitude, "longitude": longitude, "mgrs": to_mgrs(latitude, longitude, precision)}
+    except Exception:
+        return {"latitude": latitude, "longitude": longitude, "error": "Coordinate out of range"}
+
+
+def _convert_reference(mgrs_str: str) -> Dict:
+    try:
+        latitude, longitude = to_latlon(mgrs_str)
+        return {"latitude": latitude, "longitude": longitude, "mgrs": mgrs_str}
+    except Exception:
+        return {"mgrs": mgrs_str, "error": "Invalid MGRS coordinate"}
+
+
+@router.post("/mgrs/convert", response_model=schemas.MGRSConvertResult)
+def convert(request: schemas.MGRSConvertRequest):
+    """
+    Convert many coordinates in one call: "points" ([lat, lon] pairs) to MGRS,
+    and/or "mgrs" references to lat/lon. Results come back in input order,
+    points first; a bad entry gets an error instead of failing the batch.
+    """
+    points = request.points or []
+    references = request.mgrs or []
+    if len(points) + len(references) > MGRS_CONVERT_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {MGRS_CONVERT_MAX} coordinates per request")
+    results = [_convert_point(lat, lon, request.precision) for lat, lon in points]
+    results += [_convert_reference(m) for m in references]
+    return {"results": results}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, text
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, Float, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.sql import func
 import database
 
@@ -26,4 +26,89 @@ class UASSighting(database.Base):
     unit = Column(String(100), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    image_urls = Column(JSONType, nullable=False, server_default=DEFAULT_IMAGE_URLS) 
\ No newline at end of file
+    image_urls = Column(JSONType, nullable=False, server_default=DEFAULT_IMAGE_URLS)
+    # MGRS keys computed at insert (see mgrs_grid.grid_keys)
+    mgrs_gzd = Column(String(3), nullable=True)
+    mgrs_100km = Column(String(5), nullable=True)
+    mgrs_1km = Column(String(9), nullable=True)
+
+    __table_args__ = (
+        Index("ix_uas_sightings_time_id", "time", "id"),
+        Index("ix_uas_sightings_lat_lon", "latitude", "longitude"),
+        Index("ix_uas_sightings_unit", "unit"),
+        Index("ix_uas_sightings_mgrs_gzd", "mgrs_gzd"),
+        Index("ix_uas_sightings_mgrs_100km", "mgrs_100km"),
+        Index("ix_uas_sightings_mgrs_1km", "mgrs_1km", postgresql_ops={"mgrs_1km": "varchar_pattern_ops"}),
+    )
+
+class SightingStat(database.Base):
+    """Running count of sightings per (dimension, key), e.g. ("unit", "V Corps") or ("day", "2025-09-10")."""
+    __tablename__ = "uas_sighting_stats"
+
+    dimension = Column(String(32), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+class ImageRef(database.Base):
+    """How many sighting image_urls entries point at each stored upload."""
+    __tablename__ = "uas_image_refs"
+
+    url = Column(String(255), primary_key=True)
+    refcount = Column(Integer, nullable=False, default=0)
+
+class SightingDigest(database.Base):
+    """Per (UTC day, 1-degree cell, unit, type) summary of sightings, used as LLM context."""
+    __tablename__ = "uas_sighting_digests"
+
+    day = Column(Date, primary_key=True)
+    cell = Column(String(16), primary_key=True)
+    unit = Column(String(100), primary_key=True)
+    type_of_sighting = Column(String(255), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    # Sums rather than means so inserts and deletes can both be applied incrementally
+    lat_sum = Column(Float, nullable=False, default=0)
+    lon_sum = Column(Float, nullable=False, default=0)
+    first_seen = Column(DateTime(timezone=True), nullable=False)
+    last_seen = Column(DateTime(timezone=True), nullable=False)
+
+class SightingRollup(database.Base):
+    """Number of sightings per (UTC hour, 0.1 degree cell); cell_lat/cell_lon are floor(degrees / 0.1)."""
+    __tablename__ = "uas_sighting_rollups"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    cell_lat = Column(Integer, primary_key=True)
+    cell_lon = Column(Integer, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+class Geofence(database.Base):
+    """A standing area of interest; new sightings inside it raise alerts (see geofences.py)."""
+    __tablename__ = "uas_geofences"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), nullable=False)
+    kind = Column(String(16), nullable=False)  # circle | mgrs | polygon
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    radius_km = Column(Float, nullable=True)
+    mgrs = Column(String(20), nullable=True)
+    # [[lat, lon], ...]
+    polygon = Column(JSONType, nullable=True)
+    # Optional filters; only sightings with this unit / type match
+    unit = Column(String(100), nullable=True)
+    type_of_sighting = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class GeofenceAlert(database.Base):
+    """A sighting that fell inside a geofence when it was created."""
+    __tablename__ = "uas_geofence_alerts"
+
+    id = Column(BigInteger, primary_key=True)
+    geofence_id = Column(Integer, ForeignKey("uas_geofences.id", ondelete="CASCADE"), nullable=False)
+    sighting_id = Column(Integer, ForeignKey("uas_sightings.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("geofence_id", "sighting_id"),
+        Index("ix_uas_geofence_alerts_geofence_id_id", "geofence_id", "id"),
+        Index("ix_uas_geofence_alerts_sighting_id", "sighting_id"),
+    )
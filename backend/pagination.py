@@ -0,0 +1,70 @@
+"""
+Keyset (cursor) pagination helpers for sighting lists.
+
+Pages are ordered newest first on (time, id). The cursor is an opaque token
+holding the (time, id) of the last row on the previous page, so fetching any
+page is a single index range scan no matter how deep the client has paged.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from typing import List, Optional, Tuple
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+import models, schemas
+
+# Columns a client may ask for with ?fields= (derived fields like thumbnail_urls are not columns)
+PROJECTABLE_FIELDS = [f for f in schemas.UASSighting.__fields__ if hasattr(models.UASSighting, f)]
+
+
+def encode_cursor(time: datetime, sighting_id: int) -> str:
+    raw = json.dumps([time.isoformat(), sighting_id]).encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        time_str, sighting_id = json.loads(urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(time_str), int(sighting_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Turn ?fields=a,b,c into a validated column list (None means every field)."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PROJECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # Repeats are dropped: queries select each column once, and rows() pairs names with columns by position
+    return list(dict.fromkeys(requested))
+
+
+def keyset_page(q: Select, cursor: Optional[str], limit: int) -> Select:
+    """Apply newest-first ordering, the cursor position and the page size to a select()."""
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        q = q.where(tuple_(models.UASSighting.time, models.UASSighting.id) < tuple_(after_time, after_id))
+    # One extra row tells us whether there is a next page
+    return (q.order_by(models.UASSighting.time.desc(), models.UASSighting.id.desc())
+             .limit(limit + 1))
+
+
+async def total_count(db: AsyncSession, mode: str) -> Tuple[int, bool]:
+    """Return (count, is_estimate). "estimated" reads planner statistics instead of scanning."""
+    if mode == "estimated":
+        estimate = (await db.execute(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = 'public.uas_sightings'::regclass"
+        ))).scalar()
+        # reltuples is -1 (or 0) until the table has been analyzed
+        if estimate is not None and estimate > 0:
+            return int(estimate), True
+    return (await db.execute(select(func.count(models.UASSighting.id)))).scalar(), False
@@ -0,0 +1,166 @@
+"""
+Per-client rate limiting using GCRA (the generic cell rate algorithm).
+
+Each (route, client) key stores a single number, its theoretical arrival time
+(TAT), so checking a request is O(1) no matter how many requests the client has
+made. A key whose TAT is in the past has a full burst allowance again and
+carries no information, which is what makes idle keys safe to evict.
+
+State lives in a pluggable store. The in-memory store is per process; the
+SQLite store keeps TATs in a file shared by every worker on the host, so the
+limit holds no matter how many uvicorn workers are running.
+
+Limits are written "<requests>/<seconds>" with an optional burst, e.g. "10/60"
+or "10/60:3", and can be overridden per route with RATE_LIMIT_<ROUTE>.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from fastapi import HTTPException, Request
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | sqlite
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "ratelimit.sqlite3")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv("RATE_LIMIT_SWEEP_INTERVAL", "60"))  # seconds
+
+
+@dataclass(frozen=True)
+class Limit:
+    rate: int
+    period: float
+    burst: int
+
+    @property
+    def interval(self) -> float:
+        """Seconds of allowance one request uses up."""
+        return self.period / self.rate
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        try:
+            rate_period, _, burst = spec.partition(":")
+            rate, period = rate_period.split("/")
+            limit = cls(int(rate), float(period), int(burst) if burst else int(rate))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {spec!r}; expected <requests>/<seconds>[:<burst>]")
+        if limit.rate <= 0 or limit.period <= 0 or limit.burst <= 0:
+            raise ValueError(f"Invalid rate limit {spec!r}; values must be positive")
+        return limit
+
+
+def _gcra(tat: Optional[float], now: float, limit: Limit) -> Tuple[bool, float, float]:
+    """Return (allowed, new TAT, seconds until a retry would be allowed)."""
+    tat = max(tat or now, now)
+    # A request may arrive up to burst - 1 intervals ahead of schedule
+    retry_after = tat - now - (limit.burst - 1) * limit.interval
+    if retry_after > 0:
+        return False, tat, retry_after
+    return True, tat + limit.interval, 0.0
+
+
+class MemoryStore:
+    """Per-process store. Keys are kept in LRU order and bounded by max_keys."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        now = time.time()
+        with self._lock:
+            allowed, tat, retry_after = _gcra(self._tats.get(key), now, limit)
+            if allowed:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+            self._evict(now)
+        return allowed, retry_after
+
+    def _evict(self, now: float) -> None:
+        if time.monotonic() - self._last_sweep >= RATE_LIMIT_SWEEP_INTERVAL:
+            self._last_sweep = time.monotonic()
+            for key in [k for k, tat in self._tats.items() if tat <= now]:
+                del self._tats[key]
+        # Dropping the least recently used key can only make a limit more lenient
+        while len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+
+
+class SQLiteStore:
+    """Store shared by every worker process on the host through one SQLite file."""
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly below
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, limit: Limit) -> Tuple[bool, float]:
+        conn = self._connect()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so the read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            allowed, tat, retry_after = _gcra(row[0] if row else None, now, limit)
+            if allowed:
+                conn.execute("INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)", (key, tat))
+            if now - self._last_sweep >= RATE_LIMIT_SWEEP_INTERVAL:
+                self._last_sweep = now
+                conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, retry_after
+
+
+def _make_store():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteStore()
+    if RATE_LIMIT_BACKEND != "memory":
+        logging.warning(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}, using memory")
+    return MemoryStore()
+
+
+store = _make_store()
+
+
+def limit(route: str, default: str):
+    """
+    FastAPI dependency enforcing a per-client limit on a route. The default can be
+    overridden with RATE_LIMIT_<ROUTE>, e.g. RATE_LIMIT_LLM_CHAT=20/60:5.
+    """
+    spec = Limit.parse(os.getenv(f"RATE_LIMIT_{route.upper()}", default))
+
+    def check(request: Request) -> None:
+        client_ip = request.client.host if request.client else "unknown"
+        allowed, retry_after = store.hit(f"{route}:{client_ip}", spec)
+        if not allowed:
+            logging.warning(f"Rate limit exceeded on {route} for IP: {client_ip}")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests. Please wait before trying again.",
+                headers={"Retry-After": str(max(1, round(retry_after)))},
+            )
+
+    return check
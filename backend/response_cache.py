@@ -0,0 +1,136 @@
+"""
+In-process cache of encoded search responses.
+
+Entries are keyed on the request path plus normalized query parameters and are
+bounded by a TTL, an entry count and a total byte budget (LRU eviction). Every
+write to uas_sightings bumps a data version, which invalidates all entries at
+once. Each entry carries an ETag, so a client revalidating with If-None-Match
+gets a 304 straight from memory without touching the database.
+
+The version is per process: with several workers, another worker's writes
+become visible here once the TTL expires.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple, Type
+from uuid import uuid4
+import hashlib
+import os
+import threading
+import time
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+import serialization
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# (expires_at, version, etag, body)
+Entry = Tuple[float, int, str, bytes]
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = 0
+        # Distinguishes this process's ETags from another worker's at the same version
+        self._boot = uuid4().hex[:8]
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def bump(self) -> None:
+        """Invalidate everything; called after each committed insert or delete."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic() or entry[1] != self.version:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, version: int, body: bytes) -> str:
+        """Store a body computed at the given data version. Returns its ETag."""
+        etag = f'"{self._boot}-{version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        # Don't let one huge result flush the whole cache
+        if len(body) > self.max_bytes // 4:
+            return etag
+        with self._lock:
+            if version != self.version:
+                return etag  # data changed while this result was being computed
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, version, etag, body)
+            self._bytes += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+        return etag
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[3])
+
+
+cache = ResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES)
+
+
+def _normalize(value: str) -> str:
+    value = value.strip()
+    try:
+        # 49.40 and 49.4 are the same query
+        return repr(float(value))
+    except ValueError:
+        return value
+
+
+def cache_key(request: Request) -> str:
+    params = sorted((k, _normalize(v)) for k, v in request.query_params.multi_items() if v.strip())
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in params)
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    # Weak comparison: the compression middleware serves this ETag as W/"..."
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return etag in (t.strip().removeprefix("W/") for t in header.split(","))
+
+
+def cached_response(request: Request, compute: Callable[[], Any], model: Optional[Type[BaseModel]] = None) -> Response:
+    """
+    Serve a JSON response from the cache, computing and storing it on a miss.
+    compute() returns the handler's usual result; list items are passed through
+    model.from_orm() so the body matches the route's response_model. Without a
+    model the result is encoded as is, e.g. the plain dicts of a lean ?fields= query.
+    """
+    key = cache_key(request)
+    entry = cache.get(key)
+    if entry is not None:
+        _, _, etag, body = entry
+        headers = {"ETag": etag, "X-Cache": "hit"}
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    version = cache.version
+    result = compute()
+    if model is not None:
+        result = [model.from_orm(r).dict() for r in result]
+    body = serialization.dumps(result)
+    etag = cache.put(key, version, body)
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "X-Cache": "miss"})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "X-Cache": "miss"})
@@ -0,0 +1,134 @@
+"""
+Hourly per-area sighting counts for time histograms.
+
+uas_sighting_rollups holds one row per (UTC hour, 0.1 degree cell) with the
+number of sightings in it, adjusted in the transaction that inserts or deletes
+a sighting. A histogram over any window is then a sum over at most
+hours x cells small rows, whatever the size of uas_sightings.
+
+Time bounds are applied at whole-hour resolution and area filters at cell
+resolution: a cell counts as inside a radius when its centre is.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from math import cos, floor, radians
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Float, func, literal_column, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import models, searches
+
+CELL_DEG = 0.1
+BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(weeks=1)}
+MAX_BUCKETS = 5000
+
+_BACKFILL_LOCK_ID = 0x4157
+
+
+def _utc(t: datetime) -> datetime:
+    # Naive times are treated as UTC, as elsewhere in the API
+    return t.replace(tzinfo=timezone.utc) if t.tzinfo is None else t.astimezone(timezone.utc)
+
+
+def _hour(t: datetime) -> datetime:
+    return _utc(t).replace(minute=0, second=0, microsecond=0)
+
+
+def _cell(latitude: float, longitude: float) -> Tuple[int, int]:
+    return floor(latitude / CELL_DEG), floor(longitude / CELL_DEG)
+
+
+def apply(db: Session, sightings: Iterable, delta: int) -> None:
+    """Add delta (+1 on insert, -1 on delete) to each sighting's hour and cell. Does not commit."""
+    changes: Counter = Counter()
+    for s in sightings:
+        changes[(_hour(s.time), *_cell(s.latitude, s.longitude))] += delta
+    if not changes:
+        return
+    table = models.SightingRollup.__table__
+    stmt = insert(table).values([
+        {"hour": hour, "cell_lat": cell_lat, "cell_lon": cell_lon, "count": n}
+        for (hour, cell_lat, cell_lon), n in sorted(changes.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.hour, table.c.cell_lat, table.c.cell_lon],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def backfill(db: Session) -> None:
+    """Build the rollups from uas_sightings the first time the table is found empty."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _BACKFILL_LOCK_ID})
+    if db.query(models.SightingRollup.hour).first() is None:
+        db.execute(text("""
+            INSERT INTO uas_sighting_rollups (hour, cell_lat, cell_lon, count)
+            SELECT date_trunc('hour', time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                   floor(latitude / :cell)::int, floor(longitude / :cell)::int, count(*)
+              FROM uas_sightings
+             GROUP BY 1, 2, 3
+        """), {"cell": CELL_DEG})
+    db.commit()
+
+
+def _bucket_start(t: datetime, bucket: str) -> datetime:
+    t = _hour(t)
+    if bucket == "hour":
+        return t
+    t = t.replace(hour=0)
+    if bucket == "week":
+        # ISO weeks start on Monday, like date_trunc('week')
+        t -= timedelta(days=t.weekday())
+    return t
+
+
+def histogram(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    bucket: str = "day",
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None,
+) -> Dict:
+    """Sighting counts per bucket between start_time and end_time, zero-filled, optionally within a radius."""
+    first = _bucket_start(start_time, bucket)
+    step = BUCKETS[bucket]
+    n_buckets = int((_utc(end_time) - first) / step) + 1
+    if n_buckets > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Window spans more than {MAX_BUCKETS} {bucket} buckets; use a coarser bucket")
+
+    rollup = models.SightingRollup
+    utc_hour = func.timezone("UTC", rollup.hour)
+    bucket_col = func.timezone("UTC", func.date_trunc(bucket, utc_hour)).label("bucket")
+    q = (select(bucket_col, func.sum(rollup.count))
+         .where(rollup.hour >= _hour(start_time), rollup.hour <= _hour(end_time)))
+
+    if latitude is not None and longitude is not None and radius_km is not None:
+        # Cell index bounds first, then the exact distance to each candidate cell's centre
+        lat_delta = radius_km / 111.0
+        lon_delta = radius_km / (111.0 * max(cos(radians(latitude)), 1e-6))
+        min_lat, min_lon = _cell(latitude - lat_delta, longitude - lon_delta)
+        max_lat, max_lon = _cell(latitude + lat_delta, longitude + lon_delta)
+        centre_lat = (rollup.cell_lat.cast(Float) + 0.5) * CELL_DEG
+        centre_lon = (rollup.cell_lon.cast(Float) + 0.5) * CELL_DEG
+        q = q.where(rollup.cell_lat.between(min_lat, max_lat),
+                    rollup.cell_lon.between(min_lon, max_lon),
+                    searches.distance_km_expr(latitude, longitude, centre_lat, centre_lon) <= radius_km)
+
+    counts = {_utc(b): int(n) for b, n in db.execute(q.group_by(literal_column("1")))}
+    buckets: List[Dict] = []
+    for i in range(n_buckets):
+        start = first + i * step
+        buckets.append({"start": start, "count": counts.get(start, 0)})
+    return {
+        "bucket": bucket,
+        "start_time": start_time,
+        "end_time": end_time,
+        "total": sum(b["count"] for b in buckets),
+        "buckets": buckets,
+    }
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, root_validator, validator
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+import upload_urls
+
 class UASSightingBase(BaseModel):
     type_of_sighting: str
     time: datetime
@@ -21,6 +23,169 @@ class UASSighting(UASSightingBase):
     id: int
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+    # MGRS grid zone, 100 km square and 1 km square, e.g. 32U / 32ULV / 32ULV9173
+    mgrs_gzd: Optional[str] = None
+    mgrs_100km: Optional[str] = None
+    mgrs_1km: Optional[str] = None
+    # Derived from image_urls; served by /images/{size}/{name}
+    thumbnail_urls: List[str] = []
+    preview_urls: List[str] = []
+
+    @validator("thumbnail_urls", always=True)
+    def _thumbnail_urls(cls, v, values):
+        return upload_urls.derivative_urls(values.get("image_urls") or [], "thumb")
+
+    @validator("preview_urls", always=True)
+    def _preview_urls(cls, v, values):
+        return upload_urls.derivative_urls(values.get("image_urls") or [], "preview")
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class UASSightingSearchResult(UASSighting):
+    distance_km: Optional[float] = None
+
+class SightingStats(BaseModel):
+    total: int
+    bucket: str
+    by_type: Dict[str, int]
+    by_unit: Dict[str, int]
+    by_ascc: Dict[str, int]
+    by_time: Dict[str, int]
+
+class HistogramBucket(BaseModel):
+    start: datetime
+    count: int
+
+class TimeHistogram(BaseModel):
+    bucket: str
+    start_time: datetime
+    end_time: datetime
+    total: int
+    buckets: List[HistogramBucket]
+
+class TileCluster(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    # Most common symbol_code among the cluster's sightings
+    symbol_code: Optional[str] = None
+
+class SightingTile(BaseModel):
+    z: int
+    x: int
+    y: int
+    count: int
+    clusters: List[TileCluster]
+    sightings: List[UASSighting]
+    # True when a high-zoom tile held more than TILE_MAX_POINTS sightings
+    truncated: bool
+
+class SightingGroup(BaseModel):
+    # Id of the group's earliest-inserted sighting
+    id: int
+    count: int
+    # Centroid
+    latitude: float
+    longitude: float
+    start_time: datetime
+    end_time: datetime
+    # Farthest member from the centroid
+    extent_km: float
+    # "incident" (one place) or "track" (moved more than the link distance)
+    kind: str
+    # Reporting units, most reports first
+    units: List[str]
+    sighting_ids: List[int]
+
+class TextSearchResult(BaseModel):
+    total: int
+    results: List[UASSighting]
+    # facet column -> value -> number of matching sightings
+    facets: Dict[str, Dict[str, int]]
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkIngestResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkRowResult]
+
+class LLMContextFilters(BaseModel):
+    """Which sightings /llm/chat should ground its answer in; the same filters as the combined search."""
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    unit: Optional[str] = None
+    ascc: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(None, gt=0)
+    # Capped at LLM_CONTEXT_MAX_TOKENS
+    max_tokens: Optional[int] = Field(None, gt=0)
+
+class LLMContext(BaseModel):
+    context: str
+    estimated_tokens: int
+
+class MGRSConvertRequest(BaseModel):
+    # [latitude, longitude] pairs to convert to MGRS
+    points: Optional[List[Tuple[float, float]]] = None
+    # MGRS references to convert to latitude/longitude
+    mgrs: Optional[List[str]] = None
+    # Digits per axis for MGRS output: 5 = 1 m, 4 = 10 m, ... 0 = 100 km square
+    precision: int = Field(5, ge=0, le=5)
+
+class MGRSConversion(BaseModel):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    mgrs: Optional[str] = None
+    error: Optional[str] = None
+
+class MGRSConvertResult(BaseModel):
+    results: List[MGRSConversion]
+
+class GeofenceCreate(BaseModel):
+    name: str
+    kind: str = Field(..., regex="^(circle|mgrs|polygon)$")
+    # circle
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(None, gt=0)
+    # mgrs: a grid zone, 100 km, 10 km or 1 km square, e.g. 32U, 32ULV, 32ULV97, 32ULV9173
+    mgrs: Optional[str] = None
+    # polygon: [latitude, longitude] vertices, not crossing the antimeridian
+    polygon: Optional[List[Tuple[float, float]]] = None
+    unit: Optional[str] = None
+    type_of_sighting: Optional[str] = None
+
+    @root_validator(skip_on_failure=True)
+    def _shape(cls, values):
+        kind = values["kind"]
+        if kind == "circle" and None in (values.get("latitude"), values.get("longitude"), values.get("radius_km")):
+            raise ValueError("A circle needs latitude, longitude and radius_km")
+        if kind == "mgrs" and not values.get("mgrs"):
+            raise ValueError("An mgrs geofence needs mgrs")
+        if kind == "polygon":
+            polygon = values.get("polygon") or []
+            if len(polygon) < 3:
+                raise ValueError("A polygon needs at least 3 vertices")
+            if any(not (-90 <= lat <= 90 and -180 <= lon <= 180) for lat, lon in polygon):
+                raise ValueError("Polygon vertices must be valid [latitude, longitude] pairs")
+        return values
+
+class Geofence(GeofenceCreate):
+    id: int
+    created_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+class GeofenceAlert(BaseModel):
+    id: int
+    geofence_id: int
+    created_at: Optional[datetime] = None
+    sighting: UASSighting
@@ -2,14 +2,18 @@
 Utility functions for searching UAS sightings by time range and proximity.
 """
 
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import and_, func, literal, or_
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
+import metrics
 import models
-import mgrs as mgrs_lib
+import spatial_index
+import mgrs_grid
 from math import radians, cos, sin, asin, sqrt
 
+ID_LOOKUP_CHUNK = 5000  # ids bound per IN (...) when loading index hits
+
 def haversine(lat1, lon1, lat2, lon2):
 # Function to search UAS sightings by time range and proximity
     lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
@@ -22,53 +26,232 @@ def haversine(lat1, lon1, lat2, lon2):
     r = 6371  # Radius of earth in kilometers
     return c * r
 
-def search_by_time_range(db: Session, start_time: datetime, end_time: datetime) -> List[models.UASSighting]:
+def _entities(columns: Optional[List[str]]) -> list:
+    # The ORM entity, or only these columns as plain rows for lean responses (see serialization.rows)
+    if columns is None:
+        return [models.UASSighting]
+    return [getattr(models.UASSighting, c) for c in columns]
+
+def search_by_time_range(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    columns: Optional[List[str]] = None,
+) -> List[models.UASSighting]:
 # Function to search UAS sightings by time range and proximity
     return (
-        db.query(models.UASSighting)
+        db.query(*_entities(columns))
             .filter(and_(models.UASSighting.time >= start_time,
                          models.UASSighting.time <= end_time))
             .all()
     )
 
-def search_by_proximity(db: Session, latitude: float, longitude: float, max_distance_km: float) -> List[models.UASSighting]:
-# Function to search UAS sightings by proximity
-    lat_delta = max_distance_km / 111.0
-    lon_delta = max_distance_km / (111.0 * max(cos(radians(latitude)), 1e-6))
+def search_by_proximity(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    max_distance_km: float,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    columns: Optional[List[str]] = None,
+) -> List[models.UASSighting]:
+# Function to search UAS sightings by proximity, nearest first
+    spatial_index.index.sync(db)
+    hits = spatial_index.index.within(latitude, longitude, max_distance_km)
+    return _load_by_distance(db, hits, start_time, end_time, columns)
 
-    candidates = (
-        db.query(models.UASSighting)
-          .filter(models.UASSighting.latitude.between(latitude - lat_delta, latitude + lat_delta))
-          .filter(models.UASSighting.longitude.between(longitude - lon_delta, longitude + lon_delta))
-          .all()
-    )
+def search_nearest(
+    db: Session,
+    latitude: float,
+    longitude: float,
+    k: int,
+    max_distance_km: Optional[float] = None,
+    columns: Optional[List[str]] = None,
+) -> List[models.UASSighting]:
+# Function to find the k UAS sightings closest to a point
+    spatial_index.index.sync(db)
+    hits = spatial_index.index.nearest(latitude, longitude, k, max_distance_km)
+    return _load_by_distance(db, hits, columns=columns)
+
+def _load_by_distance(
+    db: Session,
+    hits: List[Tuple[float, int]],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    columns: Optional[List[str]] = None,
+) -> List[models.UASSighting]:
+    # Fetch the rows for index hits, keeping the index's distance order
+    if not hits:
+        return []
+    ids = [sighting_id for _, sighting_id in hits]
+    if columns is not None:
+        # id is needed to put the rows back in distance order
+        columns = list(dict.fromkeys(columns + ["id"]))
+    rows = {}
+    # Bounded IN lists, so a wide radius doesn't become one statement with every hit bound
+    for i in range(0, len(ids), ID_LOOKUP_CHUNK):
+        q = db.query(*_entities(columns)).filter(models.UASSighting.id.in_(ids[i:i + ID_LOOKUP_CHUNK]))
+        if start_time is not None and end_time is not None:
+            q = q.filter(and_(models.UASSighting.time >= start_time,
+                              models.UASSighting.time <= end_time))
+        rows.update((s.id, s) for s in q.all())
 
-    nearby = []
-    for s in candidates:
-        dist = haversine(latitude, longitude, s.latitude, s.longitude)
-        if dist <= max_distance_km:
-            nearby.append(s)
-    nearby.sort(key=lambda s: haversine(latitude, longitude, s.latitude, s.longitude))
-    return nearby
+    ordered = []
+    for dist, sighting_id in hits:
+        s = rows.get(sighting_id)
+        if s is not None:
+            ordered.append(s)
+        elif start_time is None:
+            # Deleted by another worker; drop the stale index entry
+            spatial_index.index.remove(sighting_id)
+    metrics.record_filter("index_rows", len(ids), len(ordered))
+    return ordered
 
 def mgrs_to_latlon(mgrs_str: str) -> Tuple[float, float]:
-    m = mgrs_lib.MGRS()
-    lat, lon = m.toLatLon(mgrs_str.replace(" ", ""))
-    return float(lat), float(lon)
+    return mgrs_grid.to_latlon(mgrs_str)
 
 def search_by_mgrs_radius(
     db: Session,
     mgrs_str: str,
-    radius_km: float
+    radius_km: float,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
 ) -> List[models.UASSighting]:
 # Function to search UAS sightings by MGRS and radius
     latitude, longitude = mgrs_to_latlon(mgrs_str)
-    return search_by_proximity(db, latitude, longitude, radius_km)
+    return search_by_proximity(db, latitude, longitude, radius_km, start_time, end_time)
+
+def search_by_mgrs_area(
+    db: Session,
+    mgrs_str: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    columns: Optional[List[str]] = None,
+) -> List[models.UASSighting]:
+    """Sightings inside the grid zone / 100 km / 10 km / 1 km square an MGRS reference names, newest first."""
+    q = db.query(*_entities(columns)).filter(mgrs_grid.area_filter(mgrs_str))
+    if start_time is not None and end_time is not None:
+        q = q.filter(and_(models.UASSighting.time >= start_time,
+                          models.UASSighting.time <= end_time))
+    return q.order_by(models.UASSighting.time.desc(), models.UASSighting.id.desc()).all()
+
+def distance_km_expr(latitude: float, longitude: float, lat_col=None, lon_col=None):
+    """Haversine distance from a fixed point, evaluated by the database. Defaults to a sighting's position."""
+    lat0, lon0 = radians(latitude), radians(longitude)
+    lat = func.radians(models.UASSighting.latitude if lat_col is None else lat_col)
+    lon = func.radians(models.UASSighting.longitude if lon_col is None else lon_col)
+    a = (func.power(func.sin((lat - lat0) / 2), 2)
+         + cos(lat0) * func.cos(lat) * func.power(func.sin((lon - lon0) / 2), 2))
+    return 2 * 6371 * func.asin(func.sqrt(func.least(1.0, a)))
+
+def build_sighting_query(
+    db: Session,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    unit: Optional[str] = None,
+    ascc: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    radius_km: Optional[float] = None,
+    order_by: Optional[str] = None,
+    limit: Optional[int] = None,
+    columns: Optional[List[str]] = None,
+) -> Query:
+    """
+    Compile any mix of time, unit, ASCC and radius filters into one SQL statement.
+
+    Rows come back as (UASSighting, distance_km) tuples, or (*columns,
+    distance_km) when columns are given; distance_km is None unless a full
+    lat/lon/radius was given. order_by is "distance" or "time".
+    """
+    has_point = latitude is not None and longitude is not None and radius_km is not None
+    distance = distance_km_expr(latitude, longitude) if has_point else literal(None)
+    q = db.query(*_entities(columns), distance.label("distance_km"))
+
+    if start_time is not None and end_time is not None:
+        q = q.filter(and_(models.UASSighting.time >= start_time,
+                          models.UASSighting.time <= end_time))
+    if unit:
+        q = q.filter(contains(models.UASSighting.unit, unit))
+    if ascc:
+        q = q.filter(contains(models.UASSighting.ascc, ascc))
+
+    if has_point:
+        # Bounding box prefilter hits the (latitude, longitude) index, exact distance runs on the survivors
+        lat_delta = radius_km / 111.0
+        lon_delta = radius_km / (111.0 * max(cos(radians(latitude)), 1e-6))
+        q = (q.filter(models.UASSighting.latitude.between(latitude - lat_delta, latitude + lat_delta))
+              .filter(models.UASSighting.longitude.between(longitude - lon_delta, longitude + lon_delta))
+              .filter(distance <= radius_km))
+
+    if order_by == "distance" and has_point:
+        q = q.order_by(distance, models.UASSighting.id)
+    elif order_by == "time":
+        q = q.order_by(models.UASSighting.time.desc(), models.UASSighting.id.desc())
+
+    if limit is not None:
+        q = q.limit(limit)
+    return q
 
 def search_by_unit(db: Session, unit: str) -> List[models.UASSighting]:
 # Function to search UAS sightings by unit
     return (
         db.query(models.UASSighting)
-            .filter(models.UASSighting.unit.ilike(f"%{unit}%"))
+            .filter(contains(models.UASSighting.unit, unit))
+            .all()
+    )
+
+# Columns covered by trigram indexes for substring search
+TEXT_SEARCH_COLUMNS = ("unit", "ascc", "location_name", "description")
+FACET_COLUMNS = ("unit", "ascc", "type_of_sighting")
+
+def contains(column, value: str):
+    # Case-insensitive substring match with LIKE wildcards in the input escaped
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+def text_search_filters(
+    q: Optional[str] = None,
+    unit: Optional[str] = None,
+    ascc: Optional[str] = None,
+    type_of_sighting: Optional[str] = None,
+) -> list:
+    """Substring match across the text columns plus exact facet selections."""
+    filters = []
+    if q:
+        filters.append(or_(*[contains(getattr(models.UASSighting, c), q) for c in TEXT_SEARCH_COLUMNS]))
+    if unit:
+        filters.append(models.UASSighting.unit == unit)
+    if ascc:
+        filters.append(models.UASSighting.ascc == ascc)
+    if type_of_sighting:
+        filters.append(models.UASSighting.type_of_sighting == type_of_sighting)
+    return filters
+
+def search_text(db: Session, filters: list, limit: int, offset: int = 0) -> List[models.UASSighting]:
+# Function to search UAS sightings by text, newest first
+    return (
+        db.query(models.UASSighting)
+            .filter(*filters)
+            .order_by(models.UASSighting.time.desc(), models.UASSighting.id.desc())
+            .offset(offset)
+            .limit(limit)
             .all()
-    )
\ No newline at end of file
+    )
+
+def facet_counts(db: Session, filters: list, limit: int = 50) -> Dict[str, Dict[str, int]]:
+    """Per-value counts for each facet column, aggregated by the database."""
+    facets = {}
+    for name in FACET_COLUMNS:
+        col = getattr(models.UASSighting, name)
+        n = func.count(models.UASSighting.id)
+        rows = (
+            db.query(col, n)
+              .filter(*filters)
+              .filter(col.isnot(None))
+              .group_by(col)
+              .order_by(n.desc(), col)
+              .limit(limit)
+        )
+        facets[name] = {value: count for value, count in rows}
+    return facets
@@ -0,0 +1,196 @@
+"""
+Keeps the per-process structures built from uas_sightings (the spatial index,
+the tile pyramid and the correlation engine) in step with the table.
+
+Each structure is a Mirror. This process's writes reach them directly through
+add() and remove(); the follower picks up everything else:
+
+- Inserts by other workers are read by id. Ids are taken from a sequence before
+  commit, so a lower id can commit after a higher one has been read. Ids skipped
+  between reads are remembered as gaps and looked up again on later syncs, until
+  they show up or SIGHTING_SYNC_GAP_MAX_AGE seconds pass (a rolled-back insert
+  leaves a gap that never fills).
+- Deletes by other workers, and anything older than the gap window, are caught
+  by a full rebuild every SIGHTING_SYNC_MAX_AGE seconds. One table scan feeds
+  fresh copies of every mirror. It runs without holding their locks, so writes
+  never wait for it; writes made meanwhile are recorded and replayed onto the
+  copies before they are swapped in.
+
+Queries run outside the mirror locks; rows are merged under them afterwards.
+"""
+
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import models
+
+SIGHTING_SYNC_MAX_AGE = float(os.getenv("SIGHTING_SYNC_MAX_AGE", "300"))  # seconds between full rebuilds
+SIGHTING_SYNC_GAP_MAX_AGE = float(os.getenv("SIGHTING_SYNC_GAP_MAX_AGE", "60"))  # seconds
+SIGHTING_SYNC_MAX_GAPS = int(os.getenv("SIGHTING_SYNC_MAX_GAPS", "1000"))
+# Ids below the highest one read in a full scan that are still worth watching as gaps
+REBUILD_GAP_WINDOW = 1000
+
+_COLUMNS = (
+    models.UASSighting.id,
+    models.UASSighting.time,
+    models.UASSighting.latitude,
+    models.UASSighting.longitude,
+    models.UASSighting.symbol_code,
+    models.UASSighting.unit,
+)
+
+
+class Mirror:
+    """
+    Base for a structure derived from sighting rows. Subclasses implement
+    add_row(), _empty() and _adopt(), and call _record() from add() and remove()
+    while holding self._lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Writes made while a rebuild scans the table, replayed onto the fresh copy
+        self._pending: Optional[List[Tuple[str, tuple]]] = None
+        # Set by SightingFollower.register; the fresh copies a rebuild makes have none
+        self._follower: Optional["SightingFollower"] = None
+
+    def add_row(self, row) -> None:
+        """Apply one row from the follower's query (id, time, latitude, longitude, symbol_code, unit)."""
+        raise NotImplementedError
+
+    def _empty(self) -> "Mirror":
+        """A new, empty instance with the same settings."""
+        raise NotImplementedError
+
+    def _adopt(self, fresh: "Mirror") -> None:
+        """Take over fresh's contents. Called with self._lock held."""
+        raise NotImplementedError
+
+    def _record(self, op: str, *args) -> None:
+        if self._pending is not None:
+            self._pending.append((op, args))
+        if op == "remove" and self._follower is not None:
+            self._follower.forget(args[0])
+
+    def sync(self, db: Session) -> None:
+        """Bring this and every other mirror up to date with the table."""
+        (self._follower or follower).sync(db)
+
+
+class SightingFollower:
+    def __init__(self):
+        self._mirrors: List[Mirror] = []
+        self._max_id = 0
+        # id -> when it was first seen missing, for ids that may still commit
+        self._gaps: Dict[int, float] = {}
+        # id -> when this process removed it, so a row read just before its delete isn't re-added
+        self._removed: Dict[int, float] = {}
+        self._built_at: Optional[float] = None
+        self._rebuilding = False
+        self._lock = threading.Lock()
+
+    def register(self, mirror: Mirror) -> None:
+        with self._lock:
+            self._mirrors.append(mirror)
+            mirror._follower = self
+
+    def forget(self, sighting_id: int) -> None:
+        with self._lock:
+            self._removed[sighting_id] = time.monotonic()
+
+    def sync(self, db: Session) -> None:
+        if self._built_at is None or time.monotonic() - self._built_at > SIGHTING_SYNC_MAX_AGE:
+            self._rebuild(db)
+        self._catch_up(db)
+
+    def _expire(self, now: float) -> None:
+        # Caller holds self._lock
+        cutoff = now - SIGHTING_SYNC_GAP_MAX_AGE
+        self._gaps = {i: t for i, t in self._gaps.items() if t > cutoff}
+        self._removed = {i: t for i, t in self._removed.items() if t > cutoff}
+        if len(self._gaps) > SIGHTING_SYNC_MAX_GAPS:
+            # Keep the most recent; older gaps are left to the next rebuild
+            self._gaps = dict(sorted(self._gaps.items(), key=lambda g: g[1])[-SIGHTING_SYNC_MAX_GAPS:])
+
+    def _note_gaps(self, after: int, ids: List[int], now: float) -> None:
+        # Caller holds self._lock. ids are sorted, all above `after`, and not empty.
+        seen = set(ids)
+        for sighting_id in range(after + 1, ids[-1]):
+            if sighting_id not in seen:
+                self._gaps.setdefault(sighting_id, now)
+
+    def _catch_up(self, db: Session) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self._expire(started)
+            after = self._max_id
+            gaps = sorted(self._gaps)
+            mirrors = list(self._mirrors)
+        sighting = models.UASSighting
+        condition = sighting.id > after
+        if gaps:
+            condition = or_(condition, sighting.id.in_(gaps))
+        rows = db.query(*_COLUMNS).filter(condition).order_by(sighting.id).all()
+        if not rows:
+            return
+        with self._lock:
+            # Rows this process deleted while the query ran are already gone from the mirrors
+            removed = {i for i, t in self._removed.items() if t >= started}
+            new_ids = [r.id for r in rows if r.id > after]
+            if new_ids:
+                self._note_gaps(after, new_ids, started)
+                self._max_id = max(self._max_id, new_ids[-1])
+            for row in rows:
+                self._gaps.pop(row.id, None)
+        rows = [r for r in rows if r.id not in removed]
+        for mirror in mirrors:
+            with mirror._lock:
+                for row in rows:
+                    mirror.add_row(row)
+
+    def _rebuild(self, db: Session) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return  # another request is already rebuilding; serve what we have
+            self._rebuilding = True
+            mirrors = list(self._mirrors)
+        try:
+            for mirror in mirrors:
+                with mirror._lock:
+                    mirror._pending = []
+            fresh = [mirror._empty() for mirror in mirrors]
+            ids: Deque[int] = deque(maxlen=REBUILD_GAP_WINDOW)
+            rows = db.query(*_COLUMNS).order_by(models.UASSighting.id).yield_per(5000)
+            for row in rows:
+                for copy in fresh:
+                    copy.add_row(row)
+                ids.append(row.id)
+            for mirror, copy in zip(mirrors, fresh):
+                with mirror._lock:
+                    for op, args in mirror._pending:
+                        getattr(copy, op)(*args)
+                    mirror._adopt(copy)
+                    mirror._pending = None
+            now = time.monotonic()
+            with self._lock:
+                if ids:
+                    # Ids missing just below the top of the scan may belong to inserts still committing
+                    self._note_gaps(ids[0] - 1, list(ids), now)
+                    self._max_id = max(self._max_id, ids[-1])
+                self._built_at = now
+        finally:
+            for mirror in mirrors:
+                with mirror._lock:
+                    mirror._pending = None
+            with self._lock:
+                self._rebuilding = False
+
+
+# Shared by every mirror in this process
+follower = SightingFollower()
@@ -0,0 +1,185 @@
+"""
+In-memory grid index over sighting coordinates for radius and k-nearest searches.
+
+Points are bucketed into fixed lat/lon cells so a query only visits the cells
+that overlap its search area. Distances are computed once per candidate and
+results come back already sorted by distance.
+
+The index follows this process's writes exactly; sighting_sync picks up the
+other workers' writes.
+"""
+
+from math import radians, cos, sin, asin, sqrt, floor
+from typing import Dict, List, Optional, Tuple
+import heapq
+import os
+
+import metrics
+import sighting_sync
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = 111.0
+CELL_DEG = float(os.getenv("SPATIAL_INDEX_CELL_DEG", "0.1"))  # ~11 km at the equator
+
+Cell = Tuple[int, int]
+# (lat, lon, lat in radians, lon in radians, cos(lat))
+Point = Tuple[float, float, float, float, float]
+
+
+class SpatialIndex(sighting_sync.Mirror):
+    def __init__(self, cell_deg: float = CELL_DEG):
+        super().__init__()
+        self.cell_deg = cell_deg
+        self._lon_cells = int(round(360.0 / cell_deg))
+        self._cells: Dict[Cell, Dict[int, Point]] = {}
+        self._points: Dict[int, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return (
+            int(floor((lat + 90.0) / self.cell_deg)),
+            int(floor((lon + 180.0) / self.cell_deg)) % self._lon_cells,
+        )
+
+    def add(self, sighting_id: int, lat: float, lon: float) -> None:
+        """Insert or move a point. Safe to call more than once for the same id."""
+        lat_r, lon_r = radians(lat), radians(lon)
+        point = (lat, lon, lat_r, lon_r, cos(lat_r))
+        cell = self._cell(lat, lon)
+        with self._lock:
+            self._record("add", sighting_id, lat, lon)
+            old = self._points.get(sighting_id)
+            if old is not None and old != cell:
+                self._discard(sighting_id, old)
+            self._cells.setdefault(cell, {})[sighting_id] = point
+            self._points[sighting_id] = cell
+
+    def remove(self, sighting_id: int) -> None:
+        with self._lock:
+            self._record("remove", sighting_id)
+            cell = self._points.pop(sighting_id, None)
+            if cell is not None:
+                self._discard(sighting_id, cell)
+
+    def _discard(self, sighting_id: int, cell: Cell) -> None:
+        bucket = self._cells.get(cell)
+        if bucket is None:
+            return
+        bucket.pop(sighting_id, None)
+        if not bucket:
+            del self._cells[cell]
+
+    def add_row(self, row) -> None:
+        self.add(row.id, row.latitude, row.longitude)
+
+    def _empty(self) -> "SpatialIndex":
+        return SpatialIndex(self.cell_deg)
+
+    def _adopt(self, fresh: "SpatialIndex") -> None:
+        self._cells, self._points = fresh._cells, fresh._points
+
+    def _cells_in_box(self, lat: float, lon: float, radius_km: float) -> List[Cell]:
+        lat_delta = radius_km / KM_PER_DEG
+        lon_delta = radius_km / (KM_PER_DEG * max(cos(radians(lat)), 1e-6))
+        y0 = max(int(floor((lat - lat_delta + 90.0) / self.cell_deg)), 0)
+        y1 = int(floor((min(lat + lat_delta, 90.0) + 90.0) / self.cell_deg))
+        x0 = int(floor((lon - lon_delta + 180.0) / self.cell_deg))
+        x1 = int(floor((lon + lon_delta + 180.0) / self.cell_deg))
+        if x1 - x0 + 1 >= self._lon_cells:
+            xs = range(self._lon_cells)
+        else:
+            xs = [x % self._lon_cells for x in range(x0, x1 + 1)]
+        return [(y, x) for y in range(y0, y1 + 1) for x in xs]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[float, int]]:
+        """Return (distance_km, id) pairs within radius_km, nearest first."""
+        lat0, lon0 = radians(lat), radians(lon)
+        cos0 = cos(lat0)
+        found: List[Tuple[float, int]] = []
+        examined = 0
+        with self._lock:
+            box = self._cells_in_box(lat, lon, radius_km)
+            if len(box) > len(self._cells):
+                buckets = list(self._cells.values())
+            else:
+                buckets = [self._cells[c] for c in box if c in self._cells]
+            for bucket in buckets:
+                examined += len(bucket)
+                for sighting_id, (_, _, lat_r, lon_r, cos_r) in bucket.items():
+                    d = _distance(lat0, lon0, cos0, lat_r, lon_r, cos_r)
+                    if d <= radius_km:
+                        found.append((d, sighting_id))
+        metrics.record_filter("index_within", examined, len(found))
+        found.sort()
+        return found
+
+    def nearest(self, lat: float, lon: float, k: int,
+                max_distance_km: Optional[float] = None) -> List[Tuple[float, int]]:
+        """Return up to k (distance_km, id) pairs, nearest first, by searching outward ring by ring."""
+        if k <= 0:
+            return []
+        lat0, lon0 = radians(lat), radians(lon)
+        cos0 = cos(lat0)
+        cy, cx = self._cell(lat, lon)
+        heap: List[Tuple[float, int]] = []  # max-heap of the best k, stored as (-d, id)
+        examined = 0
+
+        def consider(bucket: Dict[int, Point]) -> None:
+            nonlocal examined
+            examined += len(bucket)
+            for sighting_id, (_, _, lat_r, lon_r, cos_r) in bucket.items():
+                d = _distance(lat0, lon0, cos0, lat_r, lon_r, cos_r)
+                if max_distance_km is not None and d > max_distance_km:
+                    continue
+                if len(heap) < k:
+                    heapq.heappush(heap, (-d, sighting_id))
+                elif d < -heap[0][0]:
+                    heapq.heapreplace(heap, (-d, sighting_id))
+
+        with self._lock:
+            ring = 0
+            while True:
+                # Once the search square outgrows the occupied cells, scanning them all is cheaper
+                if (2 * ring + 1) ** 2 > len(self._cells):
+                    heap.clear()
+                    for bucket in self._cells.values():
+                        consider(bucket)
+                    break
+                for cell in self._ring(cy, cx, ring):
+                    bucket = self._cells.get(cell)
+                    if bucket:
+                        consider(bucket)
+                # Every point outside this ring is at least `ring` cells away from the query
+                edge_lat = min(89.999, abs(lat) + (ring + 1) * self.cell_deg)
+                reach_km = ring * self.cell_deg * KM_PER_DEG * cos(radians(edge_lat))
+                if len(heap) >= k and reach_km >= -heap[0][0]:
+                    break
+                if max_distance_km is not None and reach_km > max_distance_km:
+                    break
+                ring += 1
+        metrics.record_filter("index_nearest", examined, len(heap))
+        return sorted((-nd, sighting_id) for nd, sighting_id in heap)
+
+    def _ring(self, cy: int, cx: int, ring: int) -> List[Cell]:
+        if ring == 0:
+            return [(cy, cx)]
+        cells = []
+        for dy in range(-ring, ring + 1):
+            step = 1 if abs(dy) == ring else 2 * ring
+            for dx in range(-ring, ring + 1, step):
+                cells.append((cy + dy, (cx + dx) % self._lon_cells))
+        return cells
+
+
+def _distance(lat0: float, lon0: float, cos0: float,
+              lat_r: float, lon_r: float, cos_r: float) -> float:
+    # Haversine with the per-point trig precomputed
+    a = sin((lat_r - lat0) / 2) ** 2 + cos0 * cos_r * sin((lon_r - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a)))
+
+
+# Shared per-process index, kept in sync by the sighting create/delete routes
+index = SpatialIndex()
+sighting_sync.follower.register(index)
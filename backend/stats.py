@@ -0,0 +1,111 @@
+"""
+Dashboard statistics backed by the uas_sighting_stats summary table.
+
+Counts are kept per (dimension, key) and adjusted inside the same transaction
+that inserts or deletes a sighting, so reading them never touches uas_sightings.
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+
+TOTAL = "total"
+DIMENSIONS = ("type_of_sighting", "unit", "ascc")
+DAY = "day"
+UNKNOWN = "unknown"
+
+# Arbitrary constant shared by every worker so only one of them backfills
+_BACKFILL_LOCK_ID = 0x5157A75
+
+
+def _day_key(t: datetime) -> str:
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc)
+    return t.date().isoformat()
+
+
+def _keys(sighting) -> List[Tuple[str, str]]:
+    keys = [(TOTAL, "")]
+    for dim in DIMENSIONS:
+        keys.append((dim, getattr(sighting, dim) or UNKNOWN))
+    keys.append((DAY, _day_key(sighting.time)))
+    return keys
+
+
+def apply(db: Session, sightings: Iterable, delta: int) -> None:
+    """Add delta (+1 on insert, -1 on delete) to every counter the sightings fall under. Does not commit."""
+    changes: Counter = Counter()
+    for s in sightings:
+        for k in _keys(s):
+            changes[k] += delta
+    if not changes:
+        return
+    table = models.SightingStat.__table__
+    stmt = insert(table).values([
+        {"dimension": dim, "key": key, "count": n} for (dim, key), n in sorted(changes.items())
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.dimension, table.c.key],
+        set_={"count": table.c.count + stmt.excluded.count},
+    )
+    db.execute(stmt)
+
+
+def backfill(db: Session) -> None:
+    """Populate the summary table from uas_sightings the first time it is found empty."""
+    db.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _BACKFILL_LOCK_ID})
+    if db.query(models.SightingStat.key).first() is not None:
+        db.commit()
+        return
+
+    sighting = models.UASSighting
+    rows = [{"dimension": TOTAL, "key": "", "count": db.query(func.count(sighting.id)).scalar()}]
+    for dim in DIMENSIONS:
+        col = getattr(sighting, dim)
+        for key, n in db.query(col, func.count(sighting.id)).group_by(col):
+            rows.append({"dimension": dim, "key": key or UNKNOWN, "count": n})
+    day = func.date(func.timezone("UTC", sighting.time))
+    for key, n in db.query(day, func.count(sighting.id)).group_by(day):
+        rows.append({"dimension": DAY, "key": key.isoformat(), "count": n})
+
+    # Merge keys that collapse together (e.g. NULL and "" both become "unknown")
+    merged: Counter = Counter()
+    for r in rows:
+        merged[(r["dimension"], r["key"])] += r["count"]
+    db.execute(insert(models.SightingStat.__table__).values([
+        {"dimension": dim, "key": key, "count": n} for (dim, key), n in merged.items()
+    ]))
+    db.commit()
+
+
+async def read(db: AsyncSession, bucket: str = "day", days: Optional[int] = 30) -> Dict:
+    """Totals, per-dimension breakdowns and a time series bucketed by day or month."""
+    stat = models.SightingStat
+    q = select(stat.dimension, stat.key, stat.count).where(stat.count > 0)
+    if days is not None:
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).date().isoformat()
+        q = q.where((stat.dimension != DAY) | (stat.key >= since))
+
+    result: Dict = {"total": 0, "bucket": bucket}
+    breakdowns: Dict[str, Dict[str, int]] = defaultdict(dict)
+    series: Counter = Counter()
+    for dimension, key, count in await db.execute(q):
+        if dimension == TOTAL:
+            result["total"] = count
+        elif dimension == DAY:
+            series[key[:7] if bucket == "month" else key] += count
+        else:
+            breakdowns[dimension][key] = count
+
+    result["by_type"] = breakdowns["type_of_sighting"]
+    result["by_unit"] = breakdowns["unit"]
+    result["by_ascc"] = breakdowns["ascc"]
+    result["by_time"] = dict(sorted(series.items()))
+    return result
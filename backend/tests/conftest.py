@@ -0,0 +1,77 @@
+"""
+The backend imports its modules flat (``import models``), as uvicorn runs it
+from backend/. Tests put that directory on sys.path and run from a scratch
+directory, since importing uploads creates static/ and cache/ under the cwd.
+
+Run with ``python -m pytest backend/tests``. Tests that need Postgres use the
+``db`` fixture and are skipped unless TEST_DATABASE_URL points at a database
+they may empty. The LLM tests stream from a local stub server through
+CEREBRAS_BASE_URL.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="aerie-tests-"))
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    # Read by database.py at import
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope="session")
+def schema():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL not set")
+    import database
+    database.Base.metadata.create_all(bind=database.engine)
+    database.ensure_schema()
+    return database
+
+
+@pytest.fixture
+def db(schema):
+    """A session on an emptied database."""
+    from sqlalchemy import text
+    tables = ", ".join(t.name for t in schema.Base.metadata.sorted_tables)
+    with schema.engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    session = schema.SessionLocal()
+    yield session
+    session.close()
+
+
+def make_sighting(**overrides):
+    """Keyword arguments for a valid models.UASSighting."""
+    from datetime import datetime, timezone
+    fields = {
+        "type_of_sighting": "Rotary Wing",
+        "time": datetime(2025, 9, 10, 12, 0, tzinfo=timezone.utc),
+        "latitude": 49.44,
+        "longitude": 7.6,
+        "location_name": "Ramstein",
+        "description": "quad rotor over the flight line",
+        "unit": "V Corps",
+    }
+    fields.update(overrides)
+    return fields
+
+
+@pytest.fixture
+def api(db):
+    """The app on an emptied database. Imported late: main creates tables at import."""
+    from fastapi.testclient import TestClient
+    import main
+    import sighting_sync
+    # The in-memory mirrors still hold the previous test's rows; rebuild them on first use
+    sighting_sync.follower._built_at = None
+    sighting_sync.follower._max_id = 0
+    main.response_cache.cache.bump()
+    with TestClient(main.app) as c:
+        yield c
@@ -0,0 +1,43 @@
+import json
+
+import models
+from conftest import make_sighting
+
+
+def _row(**overrides):
+    row = make_sighting(**overrides)
+    row["time"] = row["time"].isoformat()
+    return row
+
+
+def test_json_array_reports_each_row(api, db):
+    body = [_row(), {"latitude": 49.4}, _row(unit="2CR")]
+    r = api.post("/sightings/bulk", json=body)
+    assert r.status_code == 200
+    result = r.json()
+    assert (result["created"], result["failed"]) == (2, 1)
+    assert [row["index"] for row in result["results"]] == [0, 1, 2]
+    assert result["results"][1]["status"] == "error"
+    ids = [row["id"] for row in result["results"] if row["status"] == "created"]
+    assert sorted(u for (u,) in db.query(models.UASSighting.unit).filter(models.UASSighting.id.in_(ids))) == ["2CR", "V Corps"]
+
+
+def test_ndjson_errors_are_indexed_by_line_number(api, db):
+    missing_time = _row()
+    del missing_time["time"]
+    lines = [json.dumps(_row()), "", "{not json", json.dumps(missing_time), json.dumps(_row())]
+    r = api.post("/sightings/bulk", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    results = {row["index"]: row for row in r.json()["results"]}
+    assert sorted(results) == [1, 3, 4, 5]
+    assert results[3]["error"].startswith("Invalid JSON")
+    assert results[4]["error"].startswith("time:")
+    assert results[1]["status"] == results[5]["status"] == "created"
+    assert db.query(models.UASSighting).count() == 2
+
+
+def test_oversized_body_is_rejected(api, monkeypatch):
+    import main
+    monkeypatch.setattr(main, "MAX_BULK_BYTES", 100)
+    r = api.post("/sightings/bulk", json=[_row(), _row()])
+    assert r.status_code == 413
@@ -0,0 +1,94 @@
+import asyncio
+import gzip
+import json
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import compression
+
+ROWS = [{"id": i, "unit": "V Corps", "description": "quad rotor over the flight line"} for i in range(200)]
+
+
+def _app():
+    async def big(request):
+        return JSONResponse(ROWS, headers={"ETag": '"v1"'})
+
+    async def small(request):
+        return JSONResponse({"ok": True})
+
+    async def export(request):
+        return StreamingResponse((json.dumps(r) + "\n" for r in ROWS), media_type="application/x-ndjson")
+
+    app = Starlette(routes=[Route("/big", big), Route("/small", small), Route("/export", export)])
+    return compression.CompressionMiddleware(app)
+
+
+def test_negotiate():
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0, identity") is None
+    assert compression.negotiate("*") == ("br" if compression.BROTLI_AVAILABLE else "gzip")
+    assert compression.negotiate("") is None
+
+
+def test_complete_body_is_compressed_with_a_weak_etag():
+    client = TestClient(_app())
+    r = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["etag"] == 'W/"v1"'
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert r.json() == ROWS
+
+    raw = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.headers["etag"] == '"v1"'
+
+
+def test_small_and_streamed_bodies_pass_through():
+    client = TestClient(_app())
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    r = client.get("/export", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert [json.loads(line) for line in r.text.splitlines()] == ROWS
+
+
+def test_stream_headers_are_sent_before_the_first_event():
+    sent = []
+    first_event = asyncio.Event()
+
+    async def sse(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        await first_event.wait()
+        await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+
+    async def outer(message):
+        sent.append(message)
+
+    async def run():
+        scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+        task = asyncio.create_task(compression.CompressionMiddleware(sse)(scope, None, outer))
+        await asyncio.sleep(0)
+        assert [m["type"] for m in sent] == ["http.response.start"]
+        first_event.set()
+        await task
+
+    asyncio.run(run())
+    assert sent[1]["body"] == b"data: {}\n\n"
+
+
+def test_precompressed_body_is_left_alone():
+    body = gzip.compress(json.dumps(ROWS).encode())
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"application/json"), (b"content-encoding", b"gzip"),
+            (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    r = TestClient(compression.CompressionMiddleware(app)).get("/", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.json() == ROWS
@@ -0,0 +1,89 @@
+import random
+from datetime import datetime, timedelta, timezone
+from math import cos, radians
+
+import correlation
+import spatial_index
+
+START = datetime(2025, 9, 10, tzinfo=timezone.utc)
+
+
+def _linked(a, b, engine):
+    (ta, lata, lona), (tb, latb, lonb) = a, b
+    la, lb = radians(lata), radians(latb)
+    d = spatial_index._distance(la, radians(lona), cos(la), lb, radians(lonb), cos(lb))
+    return abs((ta - tb).total_seconds()) <= engine.window_s and d <= engine.distance_km
+
+
+def _components(points, engine):
+    """Connected components of the link relation, by checking every pair."""
+    remaining = set(points)
+    groups = set()
+    while remaining:
+        frontier = [remaining.pop()]
+        component = set(frontier)
+        while frontier:
+            current = frontier.pop()
+            linked = {o for o in remaining if _linked(points[current], points[o], engine)}
+            remaining -= linked
+            component |= linked
+            frontier.extend(linked)
+        groups.add(frozenset(component))
+    return groups
+
+
+def _engine_groups(engine, points):
+    return {frozenset(engine.group_of(sighting_id)["sighting_ids"]) for sighting_id in points}
+
+
+def _random_points(rng, n):
+    points = {}
+    for sighting_id in range(1, n + 1):
+        when = START + timedelta(minutes=rng.uniform(0, 240))
+        if sighting_id % 4 == 0:
+            # A drone moving east past several observers chains into a track
+            lat, lon = 49.0 + rng.gauss(0, 0.005), 7.0 + (when - START).total_seconds() / 3600 * 0.2
+        else:
+            lat, lon = rng.gauss(49.4, 0.2), rng.gauss(7.5, 0.3)
+        points[sighting_id] = (when, lat, lon)
+    return points
+
+
+def test_groups_match_brute_force_components():
+    rng = random.Random(3)
+    engine = correlation.CorrelationEngine(distance_km=5, window_minutes=15)
+    points = _random_points(rng, 600)
+    for sighting_id, (when, lat, lon) in points.items():
+        engine.add(sighting_id, when, lat, lon, "unit")
+    assert _engine_groups(engine, points) == _components(points, engine)
+    listed = {frozenset(g["sighting_ids"]) for g in engine.groups(limit=10 ** 6)}
+    assert listed == {g for g in _components(points, engine) if len(g) > 1}
+
+
+def test_removes_split_groups_like_brute_force():
+    rng = random.Random(5)
+    engine = correlation.CorrelationEngine(distance_km=5, window_minutes=15)
+    points = _random_points(rng, 600)
+    for sighting_id, (when, lat, lon) in points.items():
+        engine.add(sighting_id, when, lat, lon, None)
+    for sighting_id in rng.sample(sorted(points), 200):
+        engine.remove(sighting_id)
+        del points[sighting_id]
+    # Moving a sighting is a remove plus an add
+    for sighting_id in rng.sample(sorted(points), 50):
+        when, lat, lon = points[sighting_id]
+        points[sighting_id] = (when, lat + 0.05, lon)
+        engine.add(sighting_id, *points[sighting_id], None)
+    assert _engine_groups(engine, points) == _components(points, engine)
+
+
+def test_incident_and_track_kinds():
+    engine = correlation.CorrelationEngine(distance_km=5, window_minutes=15)
+    for i in range(3):
+        engine.add(i + 1, START + timedelta(minutes=i), 49.4, 7.5 + i * 0.001, "A")
+    for i in range(6):
+        # 4 km hops every 10 minutes: each links to the next, the ends are 20 km apart
+        engine.add(100 + i, START + timedelta(minutes=10 * i), 50.0, 8.0 + i * 4 / 71.5, "B")
+    assert engine.group_of(1)["kind"] == "incident"
+    assert engine.group_of(100)["kind"] == "track"
+    assert engine.group_of(100)["count"] == 6
@@ -0,0 +1,73 @@
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import derivatives
+import upload_urls
+
+NAME = "0123abcd.png"
+
+
+def test_derivative_urls():
+    assert upload_urls.derivative_urls(
+        ["/static/uploads/0123abcd.png", "https://example.com/a.jpg"], "thumb",
+    ) == ["/images/thumb/0123abcd.png", "https://example.com/a.jpg"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    uploads_dir = tmp_path / "uploads"
+    uploads_dir.mkdir()
+    Image.new("RGB", (800, 400), (200, 30, 30)).save(uploads_dir / NAME)
+    monkeypatch.setattr(derivatives, "UPLOADS_DIR", uploads_dir)
+    monkeypatch.setattr(derivatives, "DERIVATIVES_DIR", tmp_path / "derivatives")
+    monkeypatch.setattr(derivatives, "cache", derivatives.DerivativeCache(tmp_path / "derivatives", 1 << 20))
+    app = FastAPI()
+    app.include_router(derivatives.router)
+    return TestClient(app)
+
+
+def test_derivative_is_rendered_once_and_revalidated(client):
+    r = client.get(f"/images/thumb/{NAME}")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert "immutable" in r.headers["cache-control"]
+    assert Image.open(io.BytesIO(r.content)).size == (256, 128)
+    path = derivatives.derivative_path(NAME, "thumb")
+    assert path.exists()
+
+    etag = r.headers["etag"]
+    r = client.get(f"/images/thumb/{NAME}", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert client.get(f"/images/preview/{NAME}").status_code == 200
+
+
+def test_unknown_size_missing_source_and_bad_names_are_404(client):
+    assert client.get(f"/images/huge/{NAME}").status_code == 404
+    assert client.get("/images/thumb/missing.png").status_code == 404
+    assert client.get("/images/thumb/..%2Fsecret.png").status_code == 404
+    etag = client.get(f"/images/thumb/{NAME}").headers["etag"]
+    (derivatives.UPLOADS_DIR / NAME).unlink()
+    assert client.get(f"/images/thumb/{NAME}", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = derivatives.DerivativeCache(tmp_path, max_bytes=250)
+    (tmp_path / "thumb").mkdir()
+    paths = []
+    for i in range(3):
+        path = tmp_path / "thumb" / f"{i}.webp"
+        path.write_bytes(b"x" * 100)
+        paths.append(path)
+    cache.add(paths[0])
+    cache.add(paths[1])
+    cache.touch(paths[0])
+    cache.add(paths[2])
+    assert [p.exists() for p in paths] == [True, False, True]
+
+    cache.remove(paths[0])
+    assert not paths[0].exists()
+    assert cache._total == 100
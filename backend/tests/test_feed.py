@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import feed
+
+
+def _sighting(i, **overrides):
+    return {"id": i, "unit": "V Corps", "ascc": "USAREUR-AF", "type_of_sighting": "Rotary Wing",
+            "latitude": 49.44, "longitude": 7.6, **overrides}
+
+
+def _event(i, type="created", **overrides):
+    return feed.Event(i, type, {"sighting": _sighting(i, **overrides)})
+
+
+def test_filters():
+    near = feed.Filters(unit="v corps", latitude=49.4, longitude=7.6, radius_km=10)
+    assert near.matches(_event(1))
+    assert not near.matches(_event(2, unit="2CR"))
+    assert not near.matches(_event(3, latitude=50.5))
+
+    alert = feed.Event(4, "alert", {"sighting": _sighting(4), "geofence_ids": [7]})
+    assert not feed.Filters().matches(alert)
+    assert feed.Filters(alerts=True).matches(alert)
+    assert feed.Filters(geofence_id=7).matches(alert)
+    assert not feed.Filters(geofence_id=8).matches(alert)
+    # Following one geofence means alerts only
+    assert not feed.Filters(geofence_id=7).matches(_event(5))
+
+
+async def _drain(sub):
+    await asyncio.sleep(0)
+    events = []
+    while not sub.queue.empty():
+        events.append(sub.queue.get_nowait())
+    return events
+
+
+def test_subscribers_get_matching_events_in_order():
+    async def run():
+        broker = feed.MemoryBroker()
+        everything, _, _ = broker.subscribe(feed.Filters(), None)
+        corps, _, _ = broker.subscribe(feed.Filters(unit="V Corps"), None)
+        broker.publish("created", [{"sighting": _sighting(1)}, {"sighting": _sighting(2, unit="2CR")}])
+        broker.publish("deleted", [{"sighting": _sighting(1)}])
+        return [(e.seq, e.type) for e in await _drain(everything)], [e.seq for e in await _drain(corps)]
+
+    everything, corps = asyncio.run(run())
+    assert everything == [(1, "created"), (2, "created"), (3, "deleted")]
+    assert corps == [1, 3]
+
+
+def test_resume_replays_from_the_buffer_or_resets():
+    async def run():
+        broker = feed.MemoryBroker(buffer_size=3)
+        broker.publish("created", [{"sighting": _sighting(i, unit="2CR" if i == 4 else "V Corps")}
+                                   for i in range(1, 6)])
+        results = {}
+        for after in (2, 3, 0, 9):
+            sub, missed, reset = broker.subscribe(feed.Filters(unit="V Corps"), after)
+            results[after] = ([e.seq for e in missed], reset)
+        return results
+
+    results = asyncio.run(run())
+    assert results[3] == ([5], False)
+    assert results[2] == ([3, 5], False)
+    assert results[0][1] is True  # events 1 and 2 fell out of the buffer
+    assert results[9] == ([], True)  # ahead of the server, e.g. after a restart
+
+
+def test_lagging_subscriber_is_reset(monkeypatch):
+    monkeypatch.setattr(feed, "FEED_QUEUE_SIZE", 2)
+
+    async def run():
+        broker = feed.MemoryBroker()
+        monkeypatch.setattr(feed, "broker", broker)
+        sub, _, _ = broker.subscribe(feed.Filters(), None)
+        broker.publish("created", [{"sighting": _sighting(i)} for i in range(1, 5)])
+        await asyncio.sleep(0)
+        return [chunk async for chunk in feed._stream(sub, [], False)], broker._subscribers
+
+    chunks, subscribers = asyncio.run(run())
+    assert [c.split("\n")[0] for c in chunks[:2]] == ["id: 1", "id: 2"]
+    assert chunks[2] == feed.RESET
+    assert not subscribers
+
+
+def test_failed_publish_resets_subscribers(monkeypatch):
+    async def run():
+        broker = feed.MemoryBroker()
+        monkeypatch.setattr(feed, "broker", broker)
+        sub, _, _ = broker.subscribe(feed.Filters(), None)
+
+        def fail(type, bodies):
+            raise ConnectionError("NOTIFY failed")
+
+        monkeypatch.setattr(broker, "publish", fail)
+        feed._publish("created", [{"sighting": _sighting(1)}])
+        await asyncio.sleep(0)
+        return sub.lagged
+
+    assert asyncio.run(run())
+
+
+@pytest.mark.parametrize("header,after", [("5", 5), ("junk", None)])
+def test_last_event_id_resumes(monkeypatch, header, after):
+    seen = []
+
+    class Recording(feed.MemoryBroker):
+        def subscribe(self, filters, after):
+            seen.append(after)
+            return super().subscribe(filters, after)
+
+    async def run():
+        monkeypatch.setattr(feed, "broker", Recording())
+        response = await feed.sighting_feed(None, None, None, None, None, None, False, None, None, header)
+        assert response.media_type == "text/event-stream"
+
+    asyncio.run(run())
+    assert seen == [after]
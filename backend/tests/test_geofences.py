@@ -0,0 +1,117 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import geofences
+import mgrs_grid
+from conftest import make_sighting
+
+
+def _fence(id, kind, **fields):
+    values = {"latitude": None, "longitude": None, "radius_km": None, "mgrs": None, "polygon": None,
+              "unit": None, "type_of_sighting": None, **fields}
+    return SimpleNamespace(id=id, kind=kind, **values)
+
+
+FENCES = [
+    _fence(1, "circle", latitude=49.44, longitude=7.6, radius_km=15),
+    _fence(2, "circle", latitude=10.0, longitude=179.9, radius_km=60),  # crosses the antimeridian
+    _fence(3, "circle", latitude=0.0, longitude=0.0, radius_km=3000),  # too wide to grid
+    _fence(4, "circle", latitude=49.44, longitude=7.6, radius_km=40, unit="V Corps"),
+    _fence(5, "polygon", polygon=[[49.0, 7.0], [49.0, 8.0], [50.0, 7.5]]),
+    _fence(6, "mgrs", mgrs=mgrs_grid.to_mgrs(49.44, 7.6, 0)[:5]),  # 100 km square
+    _fence(7, "mgrs", mgrs=mgrs_grid.to_mgrs(49.44, 7.6, 2)),  # 1 km square
+    _fence(8, "polygon", polygon=[[49.2, 7.2], [49.2, 7.9], [49.7, 7.9], [49.7, 7.2]], type_of_sighting="fixed wing"),
+]
+
+
+def _sighting(rng):
+    if rng.random() < 0.6:
+        lat, lon = rng.gauss(49.44, 0.3), rng.gauss(7.6, 0.4)
+    elif rng.random() < 0.5:
+        lat, lon = rng.gauss(10.0, 0.5), rng.choice([-1, 1]) * rng.uniform(179.0, 180.0)
+    else:
+        lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+    return SimpleNamespace(
+        latitude=lat, longitude=lon,
+        unit=rng.choice(["V Corps", "2CR"]), type_of_sighting=rng.choice(["Fixed Wing", "Rotary Wing"]),
+        **mgrs_grid.grid_keys(lat, lon),
+    )
+
+
+def _brute(s):
+    matched = []
+    for row in FENCES:
+        fence = geofences._Fence(row)
+        if fence.kind == "mgrs":
+            level, key = geofences._mgrs_key(row.mgrs)
+            if (level, key) not in geofences._sighting_mgrs_keys(s):
+                continue
+        lat_r = geofences.radians(s.latitude)
+        if fence.contains(s, lat_r, geofences.radians(s.longitude), geofences.cos(lat_r)):
+            matched.append(row.id)
+    return matched
+
+
+def test_index_matches_every_fence_checked_directly():
+    index = geofences.FenceIndex()
+    index.load(FENCES)
+    rng = random.Random(4)
+    hits = 0
+    for _ in range(3000):
+        s = _sighting(rng)
+        assert index.match(s) == _brute(s)
+        hits += bool(index.match(s))
+    assert hits > 500
+
+
+def test_filters_on_unit_and_type():
+    index = geofences.FenceIndex()
+    index.load(FENCES)
+    base = {"latitude": 49.44, "longitude": 7.6, **mgrs_grid.grid_keys(49.44, 7.6)}
+    assert 4 in index.match(SimpleNamespace(unit="v corps", type_of_sighting="Rotary Wing", **base))
+    assert 4 not in index.match(SimpleNamespace(unit="2CR", type_of_sighting="Rotary Wing", **base))
+    assert 8 in index.match(SimpleNamespace(unit=None, type_of_sighting="Fixed Wing", **base))
+    assert 8 not in index.match(SimpleNamespace(unit=None, type_of_sighting=None, **base))
+
+
+def _post_sighting(api, **overrides):
+    body = make_sighting(**overrides)
+    body["time"] = body["time"].isoformat()
+    r = api.post("/sightings", json=body)
+    assert r.status_code == 200
+    return r.json()["id"]
+
+
+def test_new_sightings_raise_alerts(api):
+    fence = api.post("/geofences", json={"name": "Ramstein", "kind": "circle",
+                                         "latitude": 49.44, "longitude": 7.6, "radius_km": 5})
+    assert fence.status_code == 200
+    fence_id = fence.json()["id"]
+    inside = _post_sighting(api)
+    _post_sighting(api, latitude=50.5)
+    bulk = api.post("/sightings/bulk", json=[{**make_sighting(), "time": "2025-09-10T13:00:00+00:00"}])
+    assert bulk.json()["created"] == 1
+
+    alerts = api.get("/geofences/alerts", params={"geofence_id": fence_id}).json()
+    assert [a["sighting"]["id"] for a in alerts] == [inside, bulk.json()["results"][0]["id"]]
+    assert api.get("/geofences/alerts", params={"after": alerts[0]["id"]}).json()[0]["id"] == alerts[1]["id"]
+
+    # Deleting the fence stops matching; this worker reloads its index
+    assert api.delete(f"/geofences/{fence_id}").status_code == 200
+    _post_sighting(api)
+    assert api.get("/geofences/alerts").json() == []
+
+
+@pytest.mark.parametrize("body", [
+    {"name": "x", "kind": "circle", "latitude": 49.4},
+    {"name": "x", "kind": "polygon", "polygon": [[49, 7], [50, 7]]},
+    {"name": "x", "kind": "mgrs"},
+])
+def test_incomplete_shapes_are_rejected(api, body):
+    assert api.post("/geofences", json=body).status_code == 422
+
+
+def test_bad_mgrs_is_rejected(api):
+    assert api.post("/geofences", json={"name": "x", "kind": "mgrs", "mgrs": "99ZZZ"}).status_code == 400
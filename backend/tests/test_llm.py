@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import llm
+
+pytestmark = pytest.mark.skipif(not llm.CEREBRAS_AVAILABLE, reason="cerebras-cloud-sdk not installed")
+
+
+class _Stub(BaseHTTPRequestHandler):
+    """Speaks just enough of the chat completions API to stream a fixed reply."""
+
+    tokens = ["Three ", "quadcopters ", "reported."]
+    status = 200
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append((self.path, body))
+        if self.status != 200:
+            self.send_response(self.status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps({"error": {"message": "Service Unavailable"}}).encode())
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for token in self.tokens:
+            chunk = {
+                "id": "c1", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "system_fingerprint": "fp",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("CEREBRAS_API_KEY", "test-key")
+    monkeypatch.setenv("CEREBRAS_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+    monkeypatch.setattr(llm, "_client", None)
+    _Stub.status = 200
+    _Stub.requests = []
+    yield _Stub
+    server.shutdown()
+    server.server_close()
+
+
+async def _collect(params):
+    slot = await llm.acquire_slot()
+    try:
+        return [json.loads(event[len("data: "):]) async for event in llm.stream_chat(slot, params)]
+    finally:
+        await llm.close()
+
+
+PARAMS = {"model": "test-model", "messages": [{"role": "user", "content": "Summarise today"}]}
+
+
+def test_stream_chat_relays_tokens_then_done(stub):
+    events = asyncio.run(_collect(PARAMS))
+    assert events == [{"content": t} for t in stub.tokens] + [{"done": True}]
+    path, body = stub.requests[0]
+    assert path.endswith("/chat/completions")
+    assert body["stream"] is True and body["model"] == "test-model"
+
+
+def test_upstream_failure_becomes_an_error_event(stub):
+    stub.status = 503
+    events = asyncio.run(_collect(PARAMS))
+    assert events == [{"error": "The AI service is temporarily unavailable. Please try again later."}]
+
+
+def test_slots_are_released(stub):
+    for _ in range(llm.LLM_MAX_CONCURRENT_STREAMS + 2):
+        asyncio.run(_collect(PARAMS))
+    assert llm._stream_slots._value == llm.LLM_MAX_CONCURRENT_STREAMS
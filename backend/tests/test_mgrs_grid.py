@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+import models
+import mgrs_grid
+from conftest import make_sighting
+
+
+def test_backfill_fills_only_missing_keys(db, monkeypatch):
+    monkeypatch.setattr(mgrs_grid, "BACKFILL_BATCH", 2)
+    for i in range(5):
+        db.add(models.UASSighting(**make_sighting(latitude=49.4 + i / 10)))
+    keyed = models.UASSighting(**make_sighting(**mgrs_grid.grid_keys(49.4, 7.6)))
+    db.add(keyed)
+    db.commit()
+    before = db.query(models.UASSighting.mgrs_1km).filter(models.UASSighting.id == keyed.id).scalar()
+
+    mgrs_grid.backfill(db)
+    db.expire_all()
+    rows = db.query(models.UASSighting).order_by(models.UASSighting.id).all()
+    for s in rows[:5]:
+        assert (s.mgrs_gzd, s.mgrs_100km, s.mgrs_1km) == tuple(mgrs_grid.grid_keys(s.latitude, s.longitude).values())
+    assert rows[5].mgrs_1km == before
+
+
+def test_backfill_skips_while_another_worker_holds_the_lock(db):
+    db.add(models.UASSighting(**make_sighting()))
+    db.commit()
+    with db.get_bind().connect() as other:
+        other.execute(text("SELECT pg_advisory_lock(:id)"), {"id": mgrs_grid._BACKFILL_LOCK_ID})
+        mgrs_grid.backfill(db)
+        other.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": mgrs_grid._BACKFILL_LOCK_ID})
+    assert db.query(models.UASSighting.mgrs_1km).scalar() is None
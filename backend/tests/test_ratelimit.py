@@ -0,0 +1,83 @@
+import pytest
+
+import ratelimit
+from ratelimit import Limit, _gcra
+
+
+def _run(limit, arrivals):
+    """Feed request times through GCRA; returns (allowed flags, retry_after of each)."""
+    tat = None
+    allowed, waits = [], []
+    for now in arrivals:
+        ok, tat, retry_after = _gcra(tat, now, limit)
+        allowed.append(ok)
+        waits.append(retry_after)
+    return allowed, waits
+
+
+def test_parse():
+    assert Limit.parse("10/60") == Limit(10, 60.0, 10)
+    assert Limit.parse("10/60:3") == Limit(10, 60.0, 3)
+    assert Limit.parse("10/60").interval == 6.0
+    for bad in ("10", "ten/60", "0/60", "10/0", "10/60:0"):
+        with pytest.raises(ValueError):
+            Limit.parse(bad)
+
+
+def test_burst_then_blocked_until_one_interval_frees_up():
+    limit = Limit.parse("10/60:3")
+    allowed, waits = _run(limit, [100.0] * 4)
+    assert allowed == [True, True, True, False]
+    # The fourth request may go once the first one's interval has passed
+    assert waits[3] == pytest.approx(6.0)
+    allowed, _ = _run(limit, [100.0, 100.0, 100.0, 105.9, 106.0])
+    assert allowed == [True, True, True, False, True]
+
+
+def test_steady_rate_is_never_limited():
+    limit = Limit.parse("10/60:1")
+    allowed, _ = _run(limit, [6.0 * i for i in range(100)])
+    assert all(allowed)
+    allowed, _ = _run(limit, [5.9 * i for i in range(3)])
+    assert allowed == [True, False, True]
+
+
+def test_allowance_over_any_window_is_bounded():
+    # However requests are spread, a window of length T admits at most burst + T / interval
+    limit = Limit.parse("5/10:4")
+    arrivals = sorted(i * 0.37 % 50 for i in range(400))
+    allowed, _ = _run(limit, arrivals)
+    admitted = [t for t, ok in zip(arrivals, allowed) if ok]
+    for start in admitted:
+        in_window = [t for t in admitted if start <= t < start + 10]
+        assert len(in_window) <= limit.burst + 10 / limit.interval
+
+
+def test_rejected_requests_do_not_use_allowance():
+    limit = Limit.parse("1/10:1")
+    allowed, _ = _run(limit, [0.0] + [0.5 * i for i in range(1, 20)] + [10.0])
+    assert allowed[0] and allowed[-1] and not any(allowed[1:-1])
+
+
+def test_memory_store_evicts_least_recently_used(monkeypatch):
+    store = ratelimit.MemoryStore(max_keys=2)
+    limit = Limit.parse("1/60:1")
+    monkeypatch.setattr(ratelimit.time, "time", lambda: 1000.0)
+    assert store.hit("a", limit)[0]
+    assert store.hit("b", limit)[0]
+    assert not store.hit("a", limit)[0]
+    assert store.hit("c", limit)[0]
+    # "a" was the least recently used key, so dropping it reset its allowance
+    assert store.hit("a", limit)[0]
+    assert len(store._tats) == 2
+
+
+def test_sqlite_store_shares_state(tmp_path, monkeypatch):
+    path = str(tmp_path / "limits.sqlite3")
+    first, second = ratelimit.SQLiteStore(path), ratelimit.SQLiteStore(path)
+    limit = Limit.parse("2/60:2")
+    monkeypatch.setattr(ratelimit.time, "time", lambda: 1000.0)
+    assert first.hit("k", limit)[0]
+    assert second.hit("k", limit)[0]
+    allowed, retry_after = first.hit("k", limit)
+    assert not allowed and retry_after == pytest.approx(30.0)
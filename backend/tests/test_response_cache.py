@@ -0,0 +1,64 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import response_cache
+
+
+def _app(monkeypatch, **limits):
+    cache = response_cache.ResponseCache(**{"ttl": 60, "max_entries": 10, "max_bytes": 1 << 20, **limits})
+    monkeypatch.setattr(response_cache, "cache", cache)
+    calls = []
+    app = FastAPI()
+
+    @app.get("/search")
+    def search(request: Request):
+        def compute():
+            calls.append(dict(request.query_params))
+            return [{"n": len(calls)}]
+        return response_cache.cached_response(request, compute)
+
+    return TestClient(app), cache, calls
+
+
+def test_equivalent_queries_share_an_entry(monkeypatch):
+    client, cache, calls = _app(monkeypatch)
+    first = client.get("/search", params={"latitude": "49.40", "unit": "V Corps", "ascc": ""})
+    assert first.headers["x-cache"] == "miss"
+    second = client.get("/search", params={"unit": "V Corps", "latitude": "49.4"})
+    assert second.headers["x-cache"] == "hit"
+    assert second.json() == first.json()
+    assert len(calls) == 1
+
+
+def test_etag_revalidation_and_invalidation(monkeypatch):
+    client, cache, calls = _app(monkeypatch)
+    etag = client.get("/search").headers["etag"]
+    r = client.get("/search", headers={"If-None-Match": f"W/{etag}"})
+    assert r.status_code == 304
+    assert len(calls) == 1
+
+    cache.bump()
+    r = client.get("/search", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert r.json() == [{"n": 2}]
+
+
+def test_result_computed_across_a_write_is_not_stored(monkeypatch):
+    _, cache, _ = _app(monkeypatch)
+    version = cache.version
+    cache.bump()
+    cache.put("/search?", version, b"[]")
+    assert cache.get("/search?") is None
+
+
+def test_entries_are_bounded(monkeypatch):
+    _, cache, _ = _app(monkeypatch, max_entries=2, max_bytes=400)
+    for i in range(3):
+        cache.put(f"k{i}", cache.version, b"x" * 50)
+    assert cache.get("k0") is None
+    assert cache.get("k2") is not None
+    # Bodies over a quarter of the budget are never cached
+    cache.put("big", cache.version, b"x" * 101)
+    assert cache.get("big") is None
+    assert cache._bytes == 100
@@ -0,0 +1,74 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import models
+import rollups
+import searches
+from conftest import make_sighting
+
+T0 = datetime(2025, 9, 8, tzinfo=timezone.utc)  # a Monday
+
+
+@pytest.fixture
+def sightings(db):
+    rng = random.Random(5)
+    rows = [models.UASSighting(**make_sighting(
+        time=T0 + timedelta(minutes=rng.uniform(0, 60 * 24 * 10)),
+        latitude=rng.uniform(49.0, 50.0),
+        longitude=rng.uniform(7.0, 8.0),
+    )) for _ in range(300)]
+    db.add_all(rows)
+    db.commit()
+    rollups.backfill(db)
+    return rows
+
+
+def _daily(rows):
+    return Counter(s.time.astimezone(timezone.utc).date() for s in rows)
+
+
+def test_histogram_matches_the_rows(db, sightings):
+    result = rollups.histogram(db, T0 + timedelta(hours=5), T0 + timedelta(days=9, hours=3), "day")
+    assert [b["start"] for b in result["buckets"]] == [T0 + timedelta(days=i) for i in range(10)]
+    expected = _daily(s for s in sightings
+                      if T0 + timedelta(hours=5) <= rollups._hour(s.time) <= T0 + timedelta(days=9, hours=3))
+    assert {b["start"].date(): b["count"] for b in result["buckets"] if b["count"]} == expected
+    assert result["total"] == sum(expected.values())
+
+    weekly = rollups.histogram(db, T0, T0 + timedelta(days=13), "week")
+    assert [b["count"] for b in weekly["buckets"]] == [
+        sum(1 for s in sightings if s.time < T0 + timedelta(days=7)),
+        sum(1 for s in sightings if s.time >= T0 + timedelta(days=7)),
+    ]
+
+
+def test_radius_counts_whole_cells_by_centre(db, sightings):
+    lat, lon, radius = 49.5, 7.5, 20
+    result = rollups.histogram(db, T0, T0 + timedelta(days=10), "day", lat, lon, radius)
+
+    def inside(s):
+        cell_lat, cell_lon = rollups._cell(s.latitude, s.longitude)
+        centre = ((cell_lat + 0.5) * rollups.CELL_DEG, (cell_lon + 0.5) * rollups.CELL_DEG)
+        return searches.haversine(lat, lon, *centre) <= radius
+
+    assert result["total"] == sum(1 for s in sightings if inside(s))
+
+
+def test_apply_tracks_inserts_and_deletes(db, sightings):
+    window = (T0, T0 + timedelta(days=10), "day")
+    before = rollups.histogram(db, *window)["total"]
+    extra = models.UASSighting(**make_sighting(time=T0 + timedelta(days=2)))
+    rollups.apply(db, [extra], +1)
+    rollups.apply(db, sightings[:10], -1)
+    db.commit()
+    assert rollups.histogram(db, *window)["total"] == before - 9
+
+
+def test_window_too_fine_for_its_length(db):
+    with pytest.raises(HTTPException) as e:
+        rollups.histogram(db, T0, T0 + timedelta(days=365), "hour")
+    assert e.value.status_code == 400
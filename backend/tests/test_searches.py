@@ -0,0 +1,76 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import models
+import searches
+from conftest import make_sighting
+
+T0 = datetime(2025, 9, 10, tzinfo=timezone.utc)
+UNITS = ["V Corps", "2CR", "173rd Airborne", "10% Readiness_Cell"]
+ASCCS = ["USAREUR-AF", "USARPAC"]
+
+
+@pytest.fixture
+def rows(db):
+    rng = random.Random(3)
+    for _ in range(400):
+        db.add(models.UASSighting(**make_sighting(
+            time=T0 + timedelta(hours=rng.uniform(0, 24 * 14)),
+            latitude=rng.gauss(49.4, 0.5),
+            longitude=rng.gauss(7.5, 0.7),
+            unit=rng.choice(UNITS),
+            ascc=rng.choice(ASCCS),
+        )))
+    db.commit()
+    return db.query(models.UASSighting).all()
+
+
+def _brute(rows, start_time=None, end_time=None, unit=None, ascc=None, latitude=None, longitude=None, radius_km=None):
+    found = {}
+    for s in rows:
+        if start_time is not None and not start_time <= s.time <= end_time:
+            continue
+        if unit and unit.lower() not in s.unit.lower():
+            continue
+        if ascc and ascc.lower() not in s.ascc.lower():
+            continue
+        distance = None
+        if radius_km is not None:
+            distance = searches.haversine(latitude, longitude, s.latitude, s.longitude)
+            if distance > radius_km:
+                continue
+        found[s.id] = distance
+    return found
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"start_time": T0 + timedelta(days=3), "end_time": T0 + timedelta(days=5)},
+    {"unit": "corps", "ascc": "usareur"},
+    {"unit": "10%"},
+    {"unit": "s_c"},
+    {"latitude": 49.4, "longitude": 7.5, "radius_km": 25},
+    {"latitude": 49.2, "longitude": 7.9, "radius_km": 40, "unit": "2CR",
+     "start_time": T0 + timedelta(days=1), "end_time": T0 + timedelta(days=9)},
+])
+def test_combined_filters_match_brute_force(db, rows, filters):
+    q = searches.build_sighting_query(db, **filters)
+    found = {s.id: distance for s, distance in q.all()}
+    expected = _brute(rows, **filters)
+    assert set(found) == set(expected)
+    for sighting_id, distance in expected.items():
+        if distance is None:
+            assert found[sighting_id] is None
+        else:
+            assert found[sighting_id] == pytest.approx(distance, abs=1e-6)
+
+
+def test_orderings_and_columns(db, rows):
+    point = {"latitude": 49.4, "longitude": 7.5, "radius_km": 30}
+    by_distance = [d for *_, d in searches.build_sighting_query(db, order_by="distance", columns=["id"], **point)]
+    assert by_distance == sorted(by_distance)
+    by_time = [t for t, _ in searches.build_sighting_query(db, order_by="time", limit=20, columns=["time"])]
+    assert len(by_time) == 20
+    assert by_time == sorted(by_time, reverse=True)
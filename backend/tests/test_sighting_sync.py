@@ -0,0 +1,87 @@
+import models
+import sighting_sync
+import spatial_index
+from conftest import make_sighting
+
+
+def _insert(db, *ids, lat=49.44, lon=7.6):
+    # Rows written by "another worker": they reach the table but not this process's mirrors
+    for sighting_id in ids:
+        db.add(models.UASSighting(id=sighting_id, **make_sighting(latitude=lat, longitude=lon)))
+    db.commit()
+
+
+def _follow():
+    follower = sighting_sync.SightingFollower()
+    index = spatial_index.SpatialIndex()
+    follower.register(index)
+    return follower, index
+
+
+def _ids(index):
+    return sorted(index._points)
+
+
+def test_catch_up_reads_new_rows_and_revisits_gaps(db):
+    follower, index = _follow()
+    _insert(db, 1, 2, 4)
+    index.sync(db)
+    assert _ids(index) == [1, 2, 4]
+    assert set(follower._gaps) == {3}
+
+    # 3 commits after 4 was read, as happens when two inserts race
+    _insert(db, 3, 5)
+    index.sync(db)
+    assert _ids(index) == [1, 2, 3, 4, 5]
+    assert not follower._gaps
+
+
+def test_rebuild_drops_rows_deleted_elsewhere(db):
+    follower, index = _follow()
+    _insert(db, 1, 2, 3)
+    index.sync(db)
+    db.query(models.UASSighting).filter(models.UASSighting.id == 2).delete()
+    db.commit()
+
+    index.sync(db)
+    assert _ids(index) == [1, 2, 3]  # not stale yet
+    follower._built_at = None
+    index.sync(db)
+    assert _ids(index) == [1, 3]
+
+
+def test_local_writes_during_rebuild_are_replayed(db):
+    follower, index = _follow()
+    _insert(db, 1, 2, 3)
+
+    class Scanning(spatial_index.SpatialIndex):
+        def add_row(self, row):
+            if row.id == 1:
+                # This process creates 10 and deletes 2 while the scan is running
+                index.add(10, 0.0, 0.0)
+                index.remove(2)
+            super().add_row(row)
+
+    index._empty = lambda: Scanning(index.cell_deg)
+    index.sync(db)
+    assert _ids(index) == [1, 3, 10]
+    assert index._pending is None
+
+
+def test_row_deleted_locally_while_catching_up_is_not_readded(db, monkeypatch):
+    follower, index = _follow()
+    _insert(db, 1)
+    index.sync(db)
+    _insert(db, 2)
+
+    query = db.query
+
+    def racing_query(*args, **kwargs):
+        # The local delete lands after the catch-up query has read row 2
+        result = query(*args, **kwargs)
+        index.remove(2)
+        return result
+
+    monkeypatch.setattr(db, "query", racing_query)
+    index.sync(db)
+    assert _ids(index) == [1]
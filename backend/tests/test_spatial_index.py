@@ -0,0 +1,66 @@
+import random
+from math import cos, radians
+
+import pytest
+
+import spatial_index
+
+
+def _brute(points, lat, lon, radius_km=None):
+    lat0 = radians(lat)
+    found = []
+    for sighting_id, (plat, plon) in points.items():
+        lat_r = radians(plat)
+        d = spatial_index._distance(lat0, radians(lon), cos(lat0), lat_r, radians(plon), cos(lat_r))
+        if radius_km is None or d <= radius_km:
+            found.append((d, sighting_id))
+    return sorted(found)
+
+
+@pytest.fixture
+def populated():
+    rng = random.Random(7)
+    index = spatial_index.SpatialIndex(cell_deg=0.1)
+    points = {}
+    for sighting_id in range(1, 3001):
+        # A dense cluster, a wide spread, and some points near the antimeridian and a pole
+        if sighting_id % 3 == 0:
+            lat, lon = rng.gauss(49.4, 0.3), rng.gauss(7.5, 0.4)
+        elif sighting_id % 3 == 1:
+            lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        else:
+            lat, lon = rng.uniform(80, 89.9), rng.choice([rng.uniform(175, 180), rng.uniform(-180, -175)])
+        points[sighting_id] = (lat, lon)
+        index.add(sighting_id, lat, lon)
+    return index, points
+
+
+@pytest.mark.parametrize("lat,lon,radius_km", [
+    (49.4, 7.5, 5), (49.4, 7.5, 50), (0, 0, 2000), (85, 179.9, 300), (85, -179.9, 1000),
+])
+def test_within_matches_brute_force(populated, lat, lon, radius_km):
+    index, points = populated
+    assert index.within(lat, lon, radius_km) == _brute(points, lat, lon, radius_km)
+
+
+@pytest.mark.parametrize("lat,lon,k,cap", [
+    (49.4, 7.5, 1, None), (49.4, 7.5, 25, None), (10, 100, 40, None), (88, 179.99, 15, None), (49.4, 7.5, 50, 20),
+])
+def test_nearest_matches_brute_force(populated, lat, lon, k, cap):
+    index, points = populated
+    assert index.nearest(lat, lon, k, cap) == _brute(points, lat, lon, cap)[:k]
+
+
+def test_moves_and_removes_are_reflected(populated):
+    index, points = populated
+    rng = random.Random(11)
+    for sighting_id in rng.sample(sorted(points), 500):
+        if rng.random() < 0.5:
+            index.remove(sighting_id)
+            del points[sighting_id]
+        else:
+            points[sighting_id] = (rng.gauss(49.4, 0.3), rng.gauss(7.5, 0.4))
+            index.add(sighting_id, *points[sighting_id])
+    assert len(index) == len(points)
+    assert index.within(49.4, 7.5, 40) == _brute(points, 49.4, 7.5, 40)
+    assert index.nearest(49.4, 7.5, 30) == _brute(points, 49.4, 7.5)[:30]
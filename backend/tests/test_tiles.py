@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+import models
+import tiles
+from conftest import make_sighting
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(11)
+    points = {}
+    for sighting_id in range(1, 2001):
+        if sighting_id % 2:
+            points[sighting_id] = (rng.gauss(49.4, 0.3), rng.gauss(7.5, 0.4), rng.choice(["SFGPUA", "SHGPUA"]))
+        else:
+            points[sighting_id] = (rng.uniform(-80, 80), rng.uniform(-180, 180), None)
+    return points
+
+
+def _build(points, max_zoom=10):
+    pyramid = tiles.ClusterPyramid(max_zoom)
+    for sighting_id, (lat, lon, symbol) in points.items():
+        pyramid.add(sighting_id, lat, lon, symbol)
+    return pyramid
+
+
+def _in_tile(z, x, y, lat, lon):
+    wx, wy = tiles._world_xy(lat, lon)
+    return int(wx * (1 << z)) == x and int(wy * (1 << z)) == y
+
+
+def _tile_of(z, lat, lon):
+    wx, wy = tiles._world_xy(lat, lon)
+    return int(wx * (1 << z)), int(wy * (1 << z))
+
+
+def test_tile_bounds_contain_their_points(points):
+    for lat, lon, _ in list(points.values())[:200]:
+        x, y = _tile_of(8, lat, lon)
+        south, west, north, east = tiles.tile_bounds(8, x, y)
+        assert south <= lat <= north and west <= lon <= east
+
+
+@pytest.mark.parametrize("z", [0, 3, 6, 10])
+def test_cluster_counts_and_means_match_the_points(points, z):
+    pyramid = _build(points)
+    x, y = _tile_of(z, 49.4, 7.5)
+    clusters = pyramid.clusters(z, x, y)
+    inside = [(lat, lon, s) for lat, lon, s in points.values() if _in_tile(z, x, y, lat, lon)]
+    assert sum(c["count"] for c in clusters) == len(inside)
+    assert sum(c["latitude"] * c["count"] for c in clusters) == pytest.approx(sum(lat for lat, _, _ in inside))
+
+
+def test_updates_match_a_fresh_build(points):
+    pyramid = _build(points)
+    rng = random.Random(2)
+    for sighting_id in rng.sample(sorted(points), 500):
+        pyramid.remove(sighting_id)
+        del points[sighting_id]
+    for sighting_id in rng.sample(sorted(points), 300):
+        lat, lon, symbol = rng.uniform(-60, 60), rng.uniform(-180, 180), "SFGPUA"
+        pyramid.add(sighting_id, lat, lon, symbol)
+        pyramid.add(sighting_id, lat, lon, symbol)  # repeated adds are no-ops
+        points[sighting_id] = (lat, lon, symbol)
+
+    fresh = _build(points)
+    for level, expected in zip(pyramid._levels, fresh._levels):
+        assert set(level) == set(expected)
+        for key, cluster in level.items():
+            assert cluster.count == expected[key].count
+            assert +cluster.symbols == +expected[key].symbols
+
+
+def test_tile_endpoint(api, db):
+    db.add_all([models.UASSighting(**make_sighting(latitude=49.44, longitude=7.6 + i / 20)) for i in range(3)])
+    db.commit()
+    x, y = _tile_of(3, 49.44, 7.6)
+    r = api.get(f"/sightings/tiles/3/{x}/{y}")
+    assert r.status_code == 200
+    assert r.json()["count"] == 3
+    assert r.json()["clusters"][0]["count"] == 3
+
+    z = tiles.TILE_MAX_CLUSTER_ZOOM + 1
+    x, y = _tile_of(z, 49.44, 7.6)
+    r = api.get(f"/sightings/tiles/{z}/{x}/{y}")
+    assert r.json()["clusters"] == []
+    assert len(r.json()["sightings"]) == 1
+    assert api.get("/sightings/tiles/2/4/0").status_code == 404
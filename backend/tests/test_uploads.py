@@ -0,0 +1,114 @@
+import hashlib
+import io
+import random
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import uploads
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_SESSION_DIR", tmp_path / "sessions")
+    uploads._spools.clear()
+    app = FastAPI()
+    app.include_router(uploads.router)
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def png():
+    rng = random.Random(1)
+    image = Image.frombytes("RGB", (200, 150), bytes(rng.getrandbits(8) for _ in range(200 * 150 * 3)))
+    buf = io.BytesIO()
+    image.save(buf, "PNG")
+    return buf.getvalue()
+
+
+def _start(client, data, filename="photo.png"):
+    response = client.post("/uploads", json={"filename": filename, "size": len(data)})
+    assert response.status_code == 200
+    return response.json()["upload_id"]
+
+
+def _put(client, upload_id, offset, chunk):
+    return client.put(f"/uploads/{upload_id}", params={"offset": offset}, content=chunk)
+
+
+def test_chunked_upload_resumes_from_the_reported_offset(client, png):
+    upload_id = _start(client, png)
+    assert _put(client, upload_id, 0, png[:10000]).json()["offset"] == 10000
+
+    # A restarted worker has no cached hash state and rebuilds it from the .part file
+    uploads._spools.clear()
+    offset = client.get(f"/uploads/{upload_id}").json()["offset"]
+    assert offset == 10000
+    while offset < len(png):
+        offset = _put(client, upload_id, offset, png[offset:offset + 7777]).json()["offset"]
+
+    assert uploads._spools[upload_id].hasher.hexdigest() == hashlib.sha256(png).hexdigest()
+    response = client.post(f"/uploads/{upload_id}/finalize")
+    assert response.status_code == 200
+    assert response.json()["image_url"].startswith("/static/uploads/" + hashlib.sha256(png).hexdigest())
+    assert client.get(f"/uploads/{upload_id}").status_code == 404
+
+
+def test_wrong_offset_and_early_finalize_are_conflicts(client, png):
+    upload_id = _start(client, png)
+    response = _put(client, upload_id, 5, png[:100])
+    assert response.status_code == 409
+    _put(client, upload_id, 0, png[:100])
+    assert _put(client, upload_id, 0, png[:100]).status_code == 409
+    assert client.post(f"/uploads/{upload_id}/finalize").status_code == 409
+    assert client.get(f"/uploads/{upload_id}").json()["offset"] == 100
+
+
+def test_data_past_the_declared_size_keeps_the_upload(client, png):
+    upload_id = _start(client, png)
+    assert _put(client, upload_id, 0, png).json()["offset"] == len(png)
+    # A repeated final PUT must not cost a complete upload
+    assert _put(client, upload_id, len(png), b"extra").status_code == 409
+    assert client.post(f"/uploads/{upload_id}/finalize").status_code == 200
+
+
+def test_non_image_is_rejected_on_its_first_bytes(client, png):
+    upload_id = _start(client, b"#!/bin/sh\n" + b"x" * 1000, filename="photo.jpg")
+    response = _put(client, upload_id, 0, b"#!/bin/sh\n" + b"x" * 100)
+    assert response.status_code == 400
+    assert client.get(f"/uploads/{upload_id}").status_code == 404
+
+    upload_id = _start(client, png, filename="photo.jpg")
+    response = _put(client, upload_id, 0, png[:50])
+    assert response.status_code == 400
+    assert "does not match" in response.json()["detail"]
+
+
+def test_start_validates_name_and_size(client):
+    assert client.post("/uploads", json={"filename": "a.gif", "size": 1000}).status_code == 400
+    too_big = uploads.CHUNKED_UPLOAD_MAX_BYTES + 1
+    assert client.post("/uploads", json={"filename": "a.png", "size": too_big}).status_code == 400
+    assert client.post("/uploads", json={"filename": "a.png", "size": 0}).status_code == 422
+    assert client.get("/uploads/../../etc").status_code == 404
+
+
+def test_sweep_removes_idle_sessions(client, png, monkeypatch):
+    upload_id = _start(client, png)
+    _put(client, upload_id, 0, png[:100])
+    monkeypatch.setattr(uploads, "UPLOAD_SESSION_MAX_AGE", -1)
+    uploads.sweep_sessions()
+    assert client.get(f"/uploads/{upload_id}").status_code == 404
+    assert list(uploads.UPLOAD_SESSION_DIR.iterdir()) == []
+
+
+def test_sweep_drops_hash_state_for_sessions_finished_elsewhere(client, png):
+    upload_id = _start(client, png)
+    _put(client, upload_id, 0, png[:100])
+    assert upload_id in uploads._spools
+    # Another worker finalizes it
+    for path in uploads._session_paths(upload_id):
+        path.unlink()
+    uploads.sweep_sessions()
+    assert upload_id not in uploads._spools
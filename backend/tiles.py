@@ -0,0 +1,172 @@
+"""
+Map tiles of clustered sightings in the web-mercator (slippy map) z/x/y scheme.
+
+Up to TILE_MAX_CLUSTER_ZOOM, tiles are answered from an in-memory cluster
+pyramid: every zoom level keeps a count, coordinate sums and symbol_code
+tally per grid cell, with each tile split into 8 x 8 cells. Inserts and
+deletes update every level in O(levels), so tiles never re-aggregate rows.
+Beyond that zoom a tile covers a small enough area to list its sightings.
+
+The pyramid follows this process's writes exactly; sighting_sync picks up the
+other workers' writes.
+"""
+
+from collections import Counter
+from math import atan, cos, degrees, log, pi, radians, sinh, tan
+from typing import Dict, List, Optional, Tuple
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+
+import database, models, response_cache, schemas, sighting_sync
+
+TILE_MAX_CLUSTER_ZOOM = int(os.getenv("TILE_MAX_CLUSTER_ZOOM", "13"))
+TILE_MAX_POINTS = int(os.getenv("TILE_MAX_POINTS", "2000"))  # sightings listed per high-zoom tile
+MAX_ZOOM = 22
+GRID_BITS = 3  # 2**3 = 8 cluster cells across each tile
+MAX_LAT = 85.05112878  # web mercator cut-off
+
+router = APIRouter()
+
+
+def _world_xy(lat: float, lon: float) -> Tuple[float, float]:
+    """Position as fractions [0, 1) of the web-mercator world, x east and y south."""
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - log(tan(radians(lat)) + 1.0 / cos(radians(lat))) / pi) / 2.0
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of a tile in degrees."""
+    n = 1 << z
+
+    def lat_at(ty: int) -> float:
+        return degrees(atan(sinh(pi * (1 - 2 * ty / n))))
+
+    return lat_at(y + 1), x / n * 360.0 - 180.0, lat_at(y), (x + 1) / n * 360.0 - 180.0
+
+
+class _Cluster:
+    __slots__ = ("count", "lat_sum", "lon_sum", "symbols")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        self.symbols: Counter = Counter()
+
+
+class ClusterPyramid(sighting_sync.Mirror):
+    def __init__(self, max_zoom: int = TILE_MAX_CLUSTER_ZOOM):
+        super().__init__()
+        self.max_zoom = max_zoom
+        self._levels: List[Dict[Tuple[int, int], _Cluster]] = [{} for _ in range(max_zoom + 1)]
+        # id -> (lat, lon, world x, world y, symbol_code), so removes and repeated adds are exact
+        self._members: Dict[int, Tuple[float, float, float, float, Optional[str]]] = {}
+
+    def _update(self, member: Tuple, delta: int) -> None:
+        lat, lon, wx, wy, symbol = member
+        for z, level in enumerate(self._levels):
+            scale = 1 << (z + GRID_BITS)
+            key = (int(wx * scale), int(wy * scale))
+            cluster = level.get(key)
+            if cluster is None:
+                cluster = level[key] = _Cluster()
+            cluster.count += delta
+            cluster.lat_sum += delta * lat
+            cluster.lon_sum += delta * lon
+            if symbol:
+                cluster.symbols[symbol] += delta
+                if cluster.symbols[symbol] <= 0:
+                    del cluster.symbols[symbol]
+            if cluster.count <= 0:
+                del level[key]
+
+    def add(self, sighting_id: int, lat: float, lon: float, symbol_code: Optional[str]) -> None:
+        """Insert or move a sighting. Safe to call more than once for the same id."""
+        member = (lat, lon, *_world_xy(lat, lon), symbol_code)
+        with self._lock:
+            self._record("add", sighting_id, lat, lon, symbol_code)
+            old = self._members.get(sighting_id)
+            if old == member:
+                return
+            if old is not None:
+                self._update(old, -1)
+            self._update(member, +1)
+            self._members[sighting_id] = member
+
+    def remove(self, sighting_id: int) -> None:
+        with self._lock:
+            self._record("remove", sighting_id)
+            old = self._members.pop(sighting_id, None)
+            if old is not None:
+                self._update(old, -1)
+
+    def add_row(self, row) -> None:
+        self.add(row.id, row.latitude, row.longitude, row.symbol_code)
+
+    def _empty(self) -> "ClusterPyramid":
+        return ClusterPyramid(self.max_zoom)
+
+    def _adopt(self, fresh: "ClusterPyramid") -> None:
+        self._levels, self._members = fresh._levels, fresh._members
+
+    def clusters(self, z: int, x: int, y: int) -> List[Dict]:
+        x0, y0 = x << GRID_BITS, y << GRID_BITS
+        found = []
+        with self._lock:
+            level = self._levels[z]
+            for cx in range(x0, x0 + (1 << GRID_BITS)):
+                for cy in range(y0, y0 + (1 << GRID_BITS)):
+                    cluster = level.get((cx, cy))
+                    if cluster is None:
+                        continue
+                    dominant = cluster.symbols.most_common(1)
+                    found.append({
+                        "latitude": cluster.lat_sum / cluster.count,
+                        "longitude": cluster.lon_sum / cluster.count,
+                        "count": cluster.count,
+                        "symbol_code": dominant[0][0] if dominant else None,
+                    })
+        return found
+
+
+# Shared per-process pyramid, kept in sync by the sighting create/delete routes
+pyramid = ClusterPyramid()
+sighting_sync.follower.register(pyramid)
+
+
+def _tile(db: Session, z: int, x: int, y: int) -> Dict:
+    if z <= pyramid.max_zoom:
+        pyramid.sync(db)
+        clusters = pyramid.clusters(z, x, y)
+        return {"z": z, "x": x, "y": y, "count": sum(c["count"] for c in clusters),
+                "clusters": clusters, "sightings": [], "truncated": False}
+
+    south, west, north, east = tile_bounds(z, x, y)
+    sighting = models.UASSighting
+    rows = (
+        db.query(sighting)
+          .filter(sighting.latitude >= south, sighting.latitude < north,
+                  sighting.longitude >= west, sighting.longitude < east)
+          .order_by(sighting.time.desc(), sighting.id.desc())
+          .limit(TILE_MAX_POINTS + 1)
+          .all()
+    )
+    truncated = len(rows) > TILE_MAX_POINTS
+    rows = rows[:TILE_MAX_POINTS]
+    return {"z": z, "x": x, "y": y, "count": len(rows), "clusters": [],
+            "sightings": [schemas.UASSighting.from_orm(s) for s in rows], "truncated": truncated}
+
+
+@router.get("/sightings/tiles/{z}/{x}/{y}", response_model=schemas.SightingTile)
+def get_tile(z: int, x: int, y: int, request: Request, db: Session = Depends(database.get_db)):
+    """
+    Clusters (count, mean position, most common symbol_code) up to
+    TILE_MAX_CLUSTER_ZOOM, individual sightings beyond it.
+    """
+    if not 0 <= z <= MAX_ZOOM or not 0 <= x < (1 << z) or not 0 <= y < (1 << z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    return response_cache.cached_response(request, lambda: _tile(db, z, x, y))
@@ -0,0 +1,21 @@
+"""
+Public URLs of uploaded images and their derivatives.
+
+Kept free of storage and imaging imports so schemas can build thumbnail and
+preview URLs without loading Pillow or the image pool.
+"""
+
+from typing import List
+
+URL_PREFIX = "/static/uploads/"
+
+
+def derivative_url(image_url: str, size: str) -> str:
+    """URL of a derivative for an image_urls entry; non-upload URLs are passed through."""
+    if not image_url.startswith(URL_PREFIX):
+        return image_url
+    return f"/images/{size}/{image_url[len(URL_PREFIX):]}"
+
+
+def derivative_urls(image_urls: List[str], size: str) -> List[str]:
+    return [derivative_url(u, size) for u in image_urls]
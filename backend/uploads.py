@@ -1,17 +1,28 @@
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Union
 from uuid import uuid4
 from io import BytesIO
-from pathlib import Path
+from datetime import datetime, timezone
+import asyncio
+import fcntl
+import json
+import logging
 import os
 import re
 import hashlib
+import time
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, Body, HTTPException, Query, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from PIL import Image
+from starlette.requests import ClientDisconnect
+
+import derivatives
+import image_pool
+import image_store
+from image_store import UPLOADS_DIR
 
 # --- paths ---
-STATIC_DIR = Path("static")
-UPLOADS_DIR = STATIC_DIR / "uploads"
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
 # --- config ---
@@ -19,6 +30,14 @@ ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
 MAX_BYTES = 8 * 1024 * 1024  # 8 MB
 MAX_DIM = 4096
 MAX_FILES = 10  # Maximum number of files per upload
+READ_CHUNK = 64 * 1024  # bytes read from an upload at a time
+
+# Chunked uploads: POST /uploads, PUT /uploads/{id}?offset=..., POST /uploads/{id}/finalize
+UPLOAD_SESSION_DIR = Path(os.getenv("UPLOAD_SESSION_DIR", "cache/upload_sessions"))
+# Same cap as /upload_images by default; every image is decoded in memory when stored
+CHUNKED_UPLOAD_MAX_BYTES = int(os.getenv("CHUNKED_UPLOAD_MAX_BYTES", str(MAX_BYTES)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))  # suggested to clients
+UPLOAD_SESSION_MAX_AGE = int(os.getenv("UPLOAD_SESSION_MAX_AGE", "86400"))  # seconds since the last chunk
 
 # Magic bytes for file type validation
 MAGIC_BYTES = {
@@ -85,65 +104,88 @@ def _validate_file_content(data: bytes) -> None:
     
     # No other content validation needed - PIL will safely process any image content
 
-def _save_image_strip_exif(file: UploadFile) -> str:
-    # Sanitize filename
-    original_filename = _sanitize_filename(file.filename or "")
-    
-    # Validate extension
-    ext = os.path.splitext(original_filename)[1].lower()
+def _check_extension(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
     if ext not in ALLOWED_EXTS:
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
+    return ext
 
-    # Read and limit size
-    data = file.file.read()
-    if len(data) > MAX_BYTES:
-        raise HTTPException(status_code=400, detail="File too large (max 8 MB)")
-    
-    if len(data) < 100:  # Minimum file size check
-        raise HTTPException(status_code=400, detail="File too small to be a valid image")
+class _Spool:
+    """
+    An upload being written to disk. Bytes are hashed and the file type is
+    checked as they arrive, so no step holds the whole file in memory.
+    """
+
+    def __init__(self, path: Path, ext: str, limit: int):
+        self.path = path
+        self.ext = ext
+        self.limit = limit
+        self.hasher = hashlib.sha256()
+        self.header = b""
+        self.size = 0
+
+    @classmethod
+    def resume(cls, path: Path, ext: str, limit: int) -> "_Spool":
+        """Rebuild the hash and header from what is already on disk, e.g. after a restart."""
+        spool = cls(path, ext, limit)
+        with open(path, "rb") as f:
+            while chunk := f.read(READ_CHUNK):
+                spool._take(chunk)
+        return spool
+
+    def _take(self, chunk: bytes) -> None:
+        if len(self.header) < 12:
+            self.header += chunk[:12 - len(self.header)]
+            if len(self.header) == 12:
+                # Reject a non-image on its first bytes, not after the whole file arrived
+                detected = _validate_magic_bytes(self.header)
+                if detected != self.ext and not (self.ext == ".jpeg" and detected == ".jpg"):
+                    raise HTTPException(status_code=400, detail=f"File extension {self.ext} does not match actual file type {detected}")
+                _validate_file_content(self.header)
+        self.hasher.update(chunk)
+        self.size += len(chunk)
 
-    # Validate magic bytes (actual file type)
-    detected_ext = _validate_magic_bytes(data)
-    if detected_ext != ext:
-        raise HTTPException(status_code=400, detail=f"File extension {ext} does not match actual file type {detected_ext}")
+    def write(self, f, chunk: bytes) -> None:
+        if self.size + len(chunk) > self.limit:
+            raise HTTPException(status_code=400, detail=f"File too large (max {self.limit // (1024 * 1024)} MB)")
+        self._take(chunk)
+        f.write(chunk)
 
-    # Additional content validation
-    _validate_file_content(data)
+    def finish(self) -> tuple:
+        """(sha256 hex digest, output extension) once every byte has been written."""
+        if self.size < 100 or len(self.header) < 12:  # Minimum file size check
+            raise HTTPException(status_code=400, detail="File too small to be a valid image")
+        detected = _validate_magic_bytes(self.header)
+        return self.hasher.hexdigest(), ".jpg" if detected in {".jpg", ".jpeg"} else detected
 
-    # Validate image + strip EXIF
+def _process_image(source: Union[bytes, str], out_path: str, out_ext: str, derivative_targets: Dict[str, int]) -> None:
+    """
+    Decode, strip metadata, downscale and re-encode one image, plus its derivatives.
+    source is the image's bytes or a path to them. Runs in a pool worker.
+    """
     try:
-        img = Image.open(BytesIO(data))
-        # Verify it's actually an image by attempting to load it
-        img.verify()
+        img = Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+        # Let the JPEG decoder downscale by a power of two while decoding huge images
+        if img.format == "JPEG":
+            img.draft("RGB", (MAX_DIM, MAX_DIM))
+        # A full decode is the validity check; no separate verify() + reopen
+        img.load()
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
+        raise image_pool.ImageProcessingError(f"Invalid image file: {str(e)}")
 
-    # Reopen image for processing (verify() closes the image)
-    img = Image.open(BytesIO(data))
-    
     # Convert to RGB to remove any potential alpha channels and metadata
     if img.mode in ('RGBA', 'LA', 'P'):
         img = img.convert('RGB')
-    
-    # Create new image without EXIF data
-    img_no_exif = Image.new(img.mode, img.size)
-    img_no_exif.putdata(list(img.getdata()))
 
     # Soft resize if huge
-    w, h = img_no_exif.size
+    w, h = img.size
     if max(w, h) > MAX_DIM:
         scale = MAX_DIM / float(max(w, h))
-        img_no_exif = img_no_exif.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
 
-    # Generate secure filename with UUID and hash
-    uid = uuid4().hex
-    file_hash = hashlib.sha256(data).hexdigest()[:8]  # First 8 chars of hash
-    out_ext = ".jpg" if detected_ext in {".jpg", ".jpeg"} else detected_ext
-    out_path = UPLOADS_DIR / f"{uid}_{file_hash}{out_ext}"
+    # Drop EXIF/ICC/text chunks; nothing from the source metadata is passed to save()
+    img.info = {}
 
-    # Ensure the uploads directory exists and is secure
-    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
-    
     # Save with security options
     save_kwargs = {}
     if out_ext == ".jpg":
@@ -152,14 +194,58 @@ def _save_image_strip_exif(file: UploadFile) -> str:
         save_kwargs.update({"optimize": True, "format": "PNG"})
     elif out_ext == ".webp":
         save_kwargs.update({"quality": 88, "optimize": True, "format": "WEBP"})
+    img.save(out_path, **save_kwargs)
+
+    # Thumbnails and previews come from the already-decoded image
+    for dst_path, max_dim in derivative_targets.items():
+        derivatives.render(img, dst_path, max_dim)
+
+async def _store_spooled(spool: _Spool) -> str:
+    """Process a fully written spool into content-addressed storage. Returns the image URL."""
+    # Content-addressed name: identical uploads map to the same file
+    digest, out_ext = spool.finish()
+    existing = image_store.lookup(digest, out_ext)
+    if existing is not None:
+        return existing
+    out_path = image_store.content_path(digest, out_ext)
+    # Write under a unique temp name and rename, so a concurrent identical upload never sees a partial file
+    tmp_path = UPLOADS_DIR / f".{digest}.{uuid4().hex}.tmp"
+
+    # Ensure the uploads directory exists and is secure
+    UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
+    targets = derivatives.eager_targets(out_path.name)
     try:
-        img_no_exif.save(out_path, **save_kwargs)
+        # The worker opens the spooled file itself; the bytes never pass through this process again
+        await image_pool.run(_process_image, str(spool.path), str(tmp_path), out_ext, targets)
+        os.replace(tmp_path, out_path)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save image: {str(e)}")
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    for path in targets:
+        derivatives.cache.add(Path(path))
 
     # URL path to return
-    return f"/static/uploads/{out_path.name}"
+    return image_store.url_for(out_path)
+
+async def _save_image_strip_exif(file: UploadFile) -> str:
+    # Sanitize filename
+    original_filename = _sanitize_filename(file.filename or "")
+    ext = _check_extension(original_filename)
+
+    # Copy to a spool file chunk by chunk, validating and hashing on the way
+    UPLOAD_SESSION_DIR.mkdir(parents=True, exist_ok=True)
+    spool = _Spool(UPLOAD_SESSION_DIR / f"{uuid4().hex}.spool", ext, MAX_BYTES)
+    try:
+        with open(spool.path, "wb") as f:
+            while chunk := await file.read(READ_CHUNK):
+                await run_in_threadpool(spool.write, f, chunk)
+        return await _store_spooled(spool)
+    finally:
+        spool.path.unlink(missing_ok=True)
 
 @router.post("/upload_images")
 async def upload_images(files: List[UploadFile] = File(...)):
@@ -170,13 +256,9 @@ async def upload_images(files: List[UploadFile] = File(...)):
     if len(files) == 0:
         raise HTTPException(status_code=400, detail="No files provided.")
     
-    urls: List[str] = []
     processed_files = set()  # Track processed files to prevent duplicates
     
     for f in files:
-        # Reset file pointer
-        f.file.seek(0)
-        
         # Check for empty files
         if not f.filename:
             raise HTTPException(status_code=400, detail="One or more files have no filename.")
@@ -185,14 +267,175 @@ async def upload_images(files: List[UploadFile] = File(...)):
         if f.filename in processed_files:
             raise HTTPException(status_code=400, detail=f"Duplicate file detected: {f.filename}")
         processed_files.add(f.filename)
-        
-        try:
-            urls.append(_save_image_strip_exif(f))
-        except HTTPException:
+
+        # Reset file pointer
+        await f.seek(0)
+
+    # Process the request's files in parallel; the first failure is reported
+    results = await asyncio.gather(*(_save_image_strip_exif(f) for f in files), return_exceptions=True)
+    for f, result in zip(files, results):
+        if isinstance(result, HTTPException):
             # Re-raise HTTP exceptions as-is
-            raise
-        except Exception as e:
+            raise result
+        if isinstance(result, Exception):
             # Catch any unexpected errors
-            raise HTTPException(status_code=500, detail=f"Unexpected error processing file {f.filename}: {str(e)}")
-    
-    return {"image_urls": urls}
\ No newline at end of file
+            raise HTTPException(status_code=500, detail=f"Unexpected error processing file {f.filename}: {str(result)}")
+
+    return {"image_urls": list(results)}
+
+
+# --- chunked, resumable uploads ---
+# A session is <id>.json (filename, declared size, extension) plus <id>.part
+# holding the bytes received so far. The .part file's length is the offset to
+# resume from, so a dropped connection loses nothing that reached the disk.
+#
+# Everything a session needs is in UPLOAD_SESSION_DIR, so its chunks may land on
+# any worker as long as the workers share that directory. _spools only caches
+# the running hash so appends don't re-read the file; a worker that sees a
+# session for the first time, or after another worker appended to it, rebuilds
+# the entry from the .part file.
+
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_spools: Dict[str, _Spool] = {}
+
+def _session_paths(upload_id: str):
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return UPLOAD_SESSION_DIR / f"{upload_id}.json", UPLOAD_SESSION_DIR / f"{upload_id}.part"
+
+def _load_session(upload_id: str) -> Dict:
+    meta_path, part_path = _session_paths(upload_id)
+    try:
+        session = json.loads(meta_path.read_text())
+        session["offset"] = part_path.stat().st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+def _status(upload_id: str, session: Dict) -> Dict:
+    return {
+        "upload_id": upload_id,
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": session["offset"],
+        "chunk_size": UPLOAD_CHUNK_BYTES,
+    }
+
+def _spool_for(upload_id: str, session: Dict) -> _Spool:
+    spool = _spools.get(upload_id)
+    if spool is None or spool.size != session["offset"]:
+        # First chunk seen by this worker, or another worker appended since
+        _, part_path = _session_paths(upload_id)
+        spool = _Spool.resume(part_path, session["ext"], session["size"])
+        _spools[upload_id] = spool
+    return spool
+
+def _discard_session(upload_id: str) -> None:
+    _spools.pop(upload_id, None)
+    for path in _session_paths(upload_id):
+        path.unlink(missing_ok=True)
+
+def sweep_sessions() -> None:
+    """Remove upload sessions that have not received a chunk for UPLOAD_SESSION_MAX_AGE seconds."""
+    cutoff = time.time() - UPLOAD_SESSION_MAX_AGE
+    removed = 0
+    for path in list(UPLOAD_SESSION_DIR.glob("*.part")) + list(UPLOAD_SESSION_DIR.glob("*.spool")):
+        try:
+            if path.stat().st_mtime < cutoff:
+                if path.suffix == ".part":
+                    _discard_session(path.stem)
+                else:
+                    path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    # Sessions finished or cancelled on another worker
+    for upload_id in list(_spools):
+        if not (UPLOAD_SESSION_DIR / f"{upload_id}.part").exists():
+            _spools.pop(upload_id, None)
+    if removed:
+        logging.info(f"Removed {removed} abandoned upload sessions")
+
+@router.post("/uploads")
+def start_upload(filename: str = Body(...), size: int = Body(..., gt=0)):
+    """Start a chunked upload of one image of `size` bytes. Send its bytes with PUT /uploads/{upload_id}."""
+    filename = _sanitize_filename(filename)
+    ext = _check_extension(filename)
+    if size > CHUNKED_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=400, detail=f"File too large (max {CHUNKED_UPLOAD_MAX_BYTES // (1024 * 1024)} MB)")
+    UPLOAD_SESSION_DIR.mkdir(parents=True, exist_ok=True)
+    upload_id = uuid4().hex
+    meta_path, part_path = _session_paths(upload_id)
+    session = {"filename": filename, "size": size, "ext": ext,
+               "created_at": datetime.now(timezone.utc).isoformat()}
+    part_path.touch()
+    meta_path.write_text(json.dumps(session))
+    return _status(upload_id, {**session, "offset": 0})
+
+@router.get("/uploads/{upload_id}")
+def get_upload(upload_id: str):
+    """How much of an upload has arrived; resume with PUT at this offset."""
+    return _status(upload_id, _load_session(upload_id))
+
+@router.put("/uploads/{upload_id}")
+async def append_upload(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Where this chunk starts; must equal the upload's current offset"),
+):
+    """Append the raw request body (application/octet-stream) at `offset`."""
+    session = _load_session(upload_id)
+    _, part_path = _session_paths(upload_id)
+    with open(part_path, "ab") as f:
+        try:
+            # One writer per session, across workers too
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise HTTPException(status_code=409, detail="Another chunk for this upload is being written")
+        session["offset"] = os.fstat(f.fileno()).st_size
+        if offset != session["offset"]:
+            raise HTTPException(status_code=409, detail=f"Expected offset {session['offset']}")
+        spool = await run_in_threadpool(_spool_for, upload_id, session)
+        try:
+            async for chunk in request.stream():
+                if spool.size + len(chunk) > session["size"]:
+                    # Keep what was received; a stray or repeated PUT mustn't cost a good upload
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"Data runs past the declared size of {session['size']} bytes; upload is at offset {spool.size}",
+                    )
+                # Hashing and the disk write are blocking
+                await run_in_threadpool(spool.write, f, chunk)
+        except ClientDisconnect:
+            # Keep what arrived; the client resumes from GET /uploads/{upload_id}
+            pass
+        except HTTPException as e:
+            if e.status_code == 400:
+                # Not an image: the session can't succeed
+                f.close()
+                _discard_session(upload_id)
+            raise
+    session["offset"] = spool.size
+    return _status(upload_id, session)
+
+@router.post("/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    """Process a completely received upload. Returns its image URL, like /upload_images."""
+    session = _load_session(upload_id)
+    if session["offset"] != session["size"]:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {session['offset']} of {session['size']} bytes")
+    spool = await run_in_threadpool(_spool_for, upload_id, session)
+    try:
+        url = await _store_spooled(spool)
+    except HTTPException as e:
+        if e.status_code == 400:
+            _discard_session(upload_id)
+        raise
+    _discard_session(upload_id)
+    return {"image_url": url}
+
+@router.delete("/uploads/{upload_id}")
+def cancel_upload(upload_id: str):
+    _load_session(upload_id)
+    _discard_session(upload_id)
+    return {"message": "Upload cancelled"}
@@ -0,0 +1,81 @@
+"""
+Compare two workload.py result files.
+
+    python benchmarks/compare.py results/base.json results/change.json --threshold 10
+
+Prints per-scenario p50/p95/p99 latency, throughput and peak RSS with the
+relative change, and exits with status 1 if any scenario's p95 latency got
+worse, or its throughput dropped, by more than --threshold percent.
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+import argparse
+import json
+import sys
+
+
+def _change(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    if before is None or after is None or before == 0:
+        return None
+    return (after - before) / before * 100.0
+
+
+def _cell(before: Optional[float], after: Optional[float]) -> str:
+    if after is None:
+        return f"{'-':>20}"
+    change = _change(before, after)
+    delta = f"{change:+6.1f}%" if change is not None else f"{'new':>7}"
+    return f"{after:11.1f} {delta:>8}"
+
+
+def compare(base: Dict, new: Dict, threshold: float) -> bool:
+    """Print the comparison; True when no scenario regressed past the threshold."""
+    for label, run in (("base", base), ("new", new)):
+        meta = run["meta"]
+        print(f"{label}: {meta.get('git_commit') or '?'}  rows={meta.get('rows')}  "
+              f"concurrency={meta.get('concurrency')}  duration={meta.get('duration_s')}s")
+    if base["meta"].get("rows") != new["meta"].get("rows"):
+        print("warning: the runs were made against different row counts", file=sys.stderr)
+
+    columns = ["p50 ms", "p95 ms", "p99 ms", "rps", "rss MB"]
+    print(f"\n{'scenario':18}" + "".join(f"{c:>20}" for c in columns))
+    ok = True
+    for name, after in new["scenarios"].items():
+        before = base["scenarios"].get(name)
+        if before is None:
+            print(f"{name:18} (not in base run)")
+            continue
+        values = [(before["latency_ms"][p], after["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        values += [(before["throughput_rps"], after["throughput_rps"]), (before.get("peak_rss_mb"), after.get("peak_rss_mb"))]
+        flags = []
+        p95_change = _change(*values[1])
+        rps_change = _change(*values[3])
+        if p95_change is not None and p95_change > threshold:
+            flags.append("p95")
+        if rps_change is not None and rps_change < -threshold:
+            flags.append("rps")
+        if after["errors"] > before["errors"]:
+            flags.append(f"errors {before['errors']}->{after['errors']}")
+        ok = ok and not flags
+        print(f"{name:18}" + "".join(_cell(b, a) for b, a in values) + (f"  REGRESSED ({', '.join(flags)})" if flags else ""))
+
+    rss = _change(base.get("peak_rss_mb"), new.get("peak_rss_mb"))
+    if rss is not None:
+        print(f"\npeak RSS: {base['peak_rss_mb']} MB -> {new['peak_rss_mb']} MB ({rss:+.1f}%)")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    ok = compare(json.loads(args.base.read_text()), json.loads(args.new.read_text()), args.threshold)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
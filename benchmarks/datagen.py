@@ -0,0 +1,101 @@
+"""
+Load a synthetic dataset into Postgres for benchmarking.
+
+    python benchmarks/datagen.py --rows 1000000 --seed 42
+
+Connects with DATABASE_URL like the backend. The sightings table and every
+summary table derived from it are truncated, the rows are streamed in with
+COPY, and the summary tables are rebuilt with the backend's own backfills, so
+the database ends up exactly as if the rows had been posted through the API.
+Running again with the same --rows, --seed and --start gives the same data.
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import csv
+import io
+import logging
+import sys
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import database, image_store, llm_context, mgrs_grid, models, rollups, stats  # noqa: E402
+from synthetic import SightingGenerator  # noqa: E402
+
+COLUMNS = [
+    "type_of_sighting", "time", "latitude", "longitude", "location_name", "description",
+    "symbol_code", "ascc", "unit", "mgrs_gzd", "mgrs_100km", "mgrs_1km",
+]
+SUMMARY_TABLES = ["uas_sighting_stats", "uas_image_refs", "uas_sighting_digests", "uas_sighting_rollups"]
+# Reference uas_sightings by foreign key, so they must be truncated with it
+DEPENDENT_TABLES = ["uas_geofence_alerts"]
+PRESETS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def _rows(value: str) -> int:
+    return PRESETS.get(value.lower()) or int(value.replace("_", ""))
+
+
+def load(rows: int, seed: int, start: datetime, days: int, chunk: int) -> None:
+    database.Base.metadata.create_all(bind=database.engine)
+    database.ensure_schema()
+    generator = SightingGenerator(seed=seed, start=start, days=days)
+
+    conn = database.engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"TRUNCATE uas_sightings, {', '.join(SUMMARY_TABLES + DEPENDENT_TABLES)} RESTART IDENTITY")
+        copy_sql = f"COPY uas_sightings ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+        started = time.monotonic()
+        written = 0
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for s in generator.sightings(rows):
+            keys = mgrs_grid.grid_keys(s["latitude"], s["longitude"])
+            writer.writerow([s[c] for c in COLUMNS[:9]] + [keys["mgrs_gzd"], keys["mgrs_100km"], keys["mgrs_1km"]])
+            written += 1
+            if written % chunk == 0 or written == rows:
+                buffer.seek(0)
+                cur.copy_expert(copy_sql, buffer)
+                buffer.seek(0)
+                buffer.truncate()
+                rate = written / max(time.monotonic() - started, 1e-9)
+                logging.info(f"Copied {written}/{rows} sightings ({rate:,.0f} rows/s)")
+        conn.commit()
+        # Fresh planner statistics, so the first benchmark run doesn't measure a bad plan
+        conn.set_isolation_level(0)
+        cur.execute("VACUUM ANALYZE uas_sightings")
+    finally:
+        conn.close()
+
+    logging.info("Rebuilding summary tables")
+    with database.SessionLocal() as db:
+        stats.backfill(db)
+        image_store.backfill(db)
+        llm_context.backfill(db)
+        mgrs_grid.backfill(db)
+        rollups.backfill(db)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=_rows, default=PRESETS["10k"], help="Row count, or one of 10k, 1m, 10m")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2025, 1, 1, tzinfo=timezone.utc),
+                        help="First day of the generated time range (ISO)")
+    parser.add_argument("--days", type=int, default=365, help="Length of the generated time range")
+    parser.add_argument("--chunk", type=int, default=50_000, help="Rows per COPY")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    started = time.monotonic()
+    load(args.rows, args.seed, args.start, args.days, args.chunk)
+    logging.info(f"Loaded {args.rows} sightings in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Synthetic sightings with realistic skew, shared by the data generator and the
+write workloads.
+
+- Locations cluster around installations in each ASCC's theatre (Gaussian
+  spread of a few km), with a thin uniform background across the theatre.
+  Busy sites get far more reports than quiet ones (Zipf weights).
+- Times are a diurnal background plus bursts: short incidents at one site that
+  produce many reports within an hour or two.
+- Units within an ASCC, and sighting types, are Zipf-skewed too, so a few
+  values dominate the way they do in real data.
+
+Everything is driven by one random.Random, so a seed reproduces a dataset.
+"""
+
+from datetime import datetime, timedelta, timezone
+from math import cos, pi, radians, sin
+from typing import Dict, Iterator, List, Sequence, Tuple
+import bisect
+import itertools
+import random
+
+# Same lists as the frontend (UnitSelectionModal.js / Home.js)
+UNITS = {
+    "ARCYBER": ["NETCOM"],
+    "SDDC": ["595th Transportation BDE", "596th Transportation BDE", "597th Transportation BDE",
+             "598th Transportation BDE", "599th Transportation BDE"],
+    "USARCENT": ["TF Spartan", "1st TSC", "160th Signal BDE", "ASG - Kuwait",
+                 "4th BN Coordination Detachment", "ASG - Jordan", "513th MIB"],
+    "USAREUR-AF": ["V Corps", "56th Artillery Command", "7th Army Training Command",
+                   "10th Army Air & Missile Defense Command", "21st Theater Sustainment Command",
+                   "Southern European Task Force – Africa", "Headquarters & Headquarters Battalion",
+                   "U.S. Army NATO Brigade", "68th Medical Command"],
+    "USARNORTH": ["CSTA", "TF 51", "DCE"],
+    "USARPAC": ["8th Army", "I Corps", "25th ID", "11th ABN DIV", "94th AMDC", "8th TSC", "7th ID",
+                "2nd ID", "5th SFAB", "1st MDTF", "3rd MDTF", "18th MEDCOM", "500th MI BDE"],
+    "USARSOUTH": ["470th MIB", "56th Signal BN", "1st BN", "228th Aviation Regiment"],
+    "USASMDC": ["100th Missile Defense Brigade", "1st Space Brigade", "SMDCOE"],
+    "USASOC": ["1st Special Forces Command", "1st SFG", "3rd SFG", "5th SFG", "7th SFG",
+               "10th SFG", "19th SFG", "20th SFG", "4th POG", "8th POG"],
+}
+
+TYPES = {
+    "UAS - Small Commercial": "SNGPUCVU--",
+    "UAS - Rotary Wing": "SHGPUCVUR-",
+    "UAS - Fixed Wing": "SHGPUCVUF-",
+    "UAS - Large Commercial": "SNGPUCVU--",
+    "Manned - Rotary Wing": "SHGPUCVF--",
+    "Manned - Fixed Wing": "SHGPUCVF--",
+}
+
+# (name, lat, lon, ascc)
+SITES = [
+    ("Grafenwoehr", 49.698, 11.940, "USAREUR-AF"),
+    ("Kaiserslautern", 49.444, 7.769, "USAREUR-AF"),
+    ("Ramstein", 49.437, 7.600, "USAREUR-AF"),
+    ("Vilseck", 49.614, 11.803, "USAREUR-AF"),
+    ("Hohenfels", 49.222, 11.838, "USAREUR-AF"),
+    ("Wiesbaden", 50.050, 8.325, "USAREUR-AF"),
+    ("Stuttgart", 48.735, 9.083, "USAREUR-AF"),
+    ("Ansbach", 49.306, 10.636, "USAREUR-AF"),
+    ("Vicenza", 45.545, 11.546, "USAREUR-AF"),
+    ("Poznan", 52.406, 16.925, "USAREUR-AF"),
+    ("Drawsko Pomorskie", 53.530, 15.808, "USAREUR-AF"),
+    ("Mihail Kogalniceanu", 44.362, 28.488, "USAREUR-AF"),
+    ("Camp Arifjan", 28.890, 48.154, "USARCENT"),
+    ("Camp Buehring", 29.694, 47.414, "USARCENT"),
+    ("Tower 22", 32.470, 38.760, "USARCENT"),
+    ("Al Asad", 33.786, 42.441, "USARCENT"),
+    ("Camp Humphreys", 36.963, 127.031, "USARPAC"),
+    ("Osan", 37.090, 127.030, "USARPAC"),
+    ("Camp Casey", 37.918, 127.058, "USARPAC"),
+    ("Camp Zama", 35.500, 139.387, "USARPAC"),
+    ("Schofield Barracks", 21.495, -158.064, "USARPAC"),
+    ("Joint Base Lewis-McChord", 47.086, -122.581, "USARPAC"),
+    ("Fort Bliss", 31.812, -106.421, "USARNORTH"),
+    ("Joint Base San Antonio", 29.458, -98.479, "USARNORTH"),
+    ("Fort Bragg", 35.139, -79.006, "USASOC"),
+    ("Fort Campbell", 36.663, -87.475, "USASOC"),
+    ("Eglin", 30.483, -86.525, "USASOC"),
+    ("Soto Cano", 14.382, -87.621, "USARSOUTH"),
+    ("Fort Sam Houston", 29.459, -98.433, "USARSOUTH"),
+    ("Redstone Arsenal", 34.684, -86.648, "USASMDC"),
+    ("Fort Greely", 63.979, -145.735, "USASMDC"),
+    ("Fort Eisenhower", 33.417, -82.143, "ARCYBER"),
+    ("Military Ocean Terminal Sunny Point", 34.022, -77.958, "SDDC"),
+    ("Rotterdam", 51.950, 4.140, "SDDC"),
+]
+
+BACKGROUND_SHARE = 0.05  # reports spread uniformly around a theatre rather than at a site
+BURST_SHARE = 0.35       # reports that belong to a burst
+
+DESCRIPTIONS = [
+    "Quadcopter observed hovering near the perimeter fence",
+    "Fixed wing UAS crossed the range at low altitude",
+    "Multiple lights moving in formation over the motor pool",
+    "Small drone loitering above the ammunition supply point",
+    "Aircraft heard but not seen, heading north",
+    "UAS followed convoy for approximately ten minutes",
+    "Drone landed briefly in the training area and departed",
+    "Rotary wing UAS observed filming the gate",
+]
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class _Choice:
+    """Weighted choice by bisecting cumulative weights; faster than random.choices per call."""
+
+    def __init__(self, values: Sequence, weights: Sequence[float]):
+        self.values = list(values)
+        self.cumulative = list(itertools.accumulate(weights))
+
+    def pick(self, rng: random.Random):
+        return self.values[bisect.bisect(self.cumulative, rng.random() * self.cumulative[-1])]
+
+
+class SightingGenerator:
+    def __init__(self, seed: int = 42, start: datetime = None, days: int = 365):
+        self.rng = random.Random(seed)
+        self.end = start + timedelta(days=days) if start else datetime.now(timezone.utc).replace(microsecond=0)
+        self.start = start or self.end - timedelta(days=days)
+        self.span = (self.end - self.start).total_seconds()
+
+        site_order = list(SITES)
+        self.rng.shuffle(site_order)
+        self.sites = _Choice(site_order, _zipf_weights(len(site_order), 0.9))
+        self.units = {ascc: _Choice(units, _zipf_weights(len(units))) for ascc, units in UNITS.items()}
+        self.types = _Choice(list(TYPES), _zipf_weights(len(TYPES), 1.3))
+        # Each site has its own spread: airfields report over a wider area than a gate
+        self.spread_km = {site[0]: self.rng.uniform(1.5, 12.0) for site in SITES}
+
+    def _diurnal_time(self) -> datetime:
+        # More reports in the evening than at dawn: accept by a sinusoid peaking at 21:00 local-ish
+        while True:
+            t = self.start + timedelta(seconds=self.rng.random() * self.span)
+            hour = t.hour + t.minute / 60.0
+            if self.rng.random() < 0.6 + 0.4 * cos((hour - 21.0) / 24.0 * 2 * pi):
+                return t
+
+    def _near(self, lat: float, lon: float, spread_km: float) -> Tuple[float, float]:
+        distance = abs(self.rng.gauss(0.0, spread_km))
+        bearing = self.rng.random() * 2 * pi
+        dlat = distance * cos(bearing) / 111.0
+        dlon = distance * sin(bearing) / (111.0 * max(cos(radians(lat)), 1e-6))
+        return round(lat + dlat, 6), round(lon + dlon, 6)
+
+    def _sighting(self, site, when: datetime, background: bool = False) -> Dict:
+        name, lat, lon, ascc = site
+        if background:
+            latitude, longitude = self._near(lat, lon, 250.0)
+            location = f"{name} region"
+        else:
+            latitude, longitude = self._near(lat, lon, self.spread_km[name])
+            location = f"{name} area"
+        type_of_sighting = self.types.pick(self.rng)
+        return {
+            "type_of_sighting": type_of_sighting,
+            "time": when,
+            "latitude": max(-89.9, min(89.9, latitude)),
+            "longitude": ((longitude + 180.0) % 360.0) - 180.0,
+            "location_name": location,
+            "description": f"{self.rng.choice(DESCRIPTIONS)} ({type_of_sighting.lower()})",
+            "symbol_code": TYPES[type_of_sighting],
+            "ascc": ascc,
+            "unit": self.units[ascc].pick(self.rng),
+        }
+
+    def sightings(self, n: int) -> Iterator[Dict]:
+        """n sightings in no particular time order."""
+        produced = 0
+        while produced < n:
+            roll = self.rng.random()
+            if roll < BURST_SHARE:
+                # One incident: a site, a start time and a run of reports within a couple of hours
+                site = self.sites.pick(self.rng)
+                burst_start = self._diurnal_time()
+                duration = self.rng.expovariate(1 / 3600.0)
+                for _ in range(min(n - produced, int(self.rng.paretovariate(1.5) * 5))):
+                    when = burst_start + timedelta(seconds=self.rng.random() * duration)
+                    yield self._sighting(site, min(when, self.end))
+                    produced += 1
+            else:
+                yield self._sighting(self.sites.pick(self.rng), self._diurnal_time(),
+                                     background=roll > 1.0 - BACKGROUND_SHARE)
+                produced += 1
+
+    def payload(self, n: int = 1) -> List[Dict]:
+        """n sightings as JSON-ready dicts for POST /sightings and /sightings/bulk."""
+        return [{**s, "time": s["time"].isoformat()} for s in self.sightings(n)]
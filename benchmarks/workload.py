@@ -0,0 +1,482 @@
+"""
+Run scripted workloads against a running backend and record latency,
+throughput and memory.
+
+    python benchmarks/workload.py --base-url http://localhost:8000 \\
+        --server-pid $(pgrep -f "uvicorn main:app" | head -1) --output results/base.json
+
+or let the runner start and stop the server itself:
+
+    python benchmarks/workload.py --spawn --output results/base.json
+
+Each scenario runs --concurrency closed-loop clients for --duration seconds
+(after --warmup seconds that are not recorded) and reports p50/p95/p99
+latency, throughput, status codes and the server's peak RSS during the
+scenario. Request parameters are drawn from the loaded data and a seeded
+random generator, so two runs against the same dataset send the same mix.
+"""
+
+from datetime import datetime, timedelta, timezone
+from math import cos, log, pi, radians, tan
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic import SightingGenerator  # noqa: E402
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+RSS_SAMPLE_INTERVAL = 0.05  # seconds
+
+
+class Context:
+    """What the scenarios draw parameters from: a sample of the loaded sightings."""
+
+    def __init__(self, sightings: List[Dict], stats: Dict, seed: int):
+        self.sightings = sightings
+        self.units = list(stats["by_unit"]) or [None]
+        self.asccs = list(stats["by_ascc"]) or [None]
+        self.total = stats["total"]
+        # Time windows span the whole dataset, not just the sample's (newest) rows
+        days = sorted(stats["by_time"])
+        self.first = datetime.fromisoformat(days[0]).replace(tzinfo=timezone.utc)
+        self.last = datetime.fromisoformat(days[-1]).replace(tzinfo=timezone.utc) + timedelta(days=1)
+        self.generator = SightingGenerator(seed=seed)
+        self.created_ids: List[int] = []
+        self.uploaded: List[str] = []
+
+    def sighting(self, rng: random.Random) -> Dict:
+        return rng.choice(self.sightings)
+
+    def window(self, rng: random.Random, length: timedelta) -> Dict:
+        span = max((self.last - self.first - length).total_seconds(), 0)
+        start = self.first + timedelta(seconds=rng.random() * span)
+        return {"start_time": start.isoformat(), "end_time": (start + length).isoformat()}
+
+
+def _image(rng: random.Random, size=(1600, 1200)) -> bytes:
+    # Noise blocks compress like a photo rather than like a flat colour
+    small = Image.frombytes("RGB", (size[0] // 16, size[1] // 16), rng.randbytes(size[0] // 16 * size[1] // 16 * 3))
+    out = io.BytesIO()
+    small.resize(size, Image.BILINEAR).save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+def _tile(lat: float, lon: float, z: int) -> str:
+    n = 1 << z
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - log(tan(radians(lat)) + 1.0 / cos(radians(lat))) / pi) / 2.0 * n)
+    return f"/sightings/tiles/{z}/{min(x, n - 1)}/{min(max(y, 0), n - 1)}"
+
+
+# Each scenario builds one request: (method, path, keyword arguments for httpx)
+Scenario = Callable[[Context, random.Random], tuple]
+
+
+def _list_page(ctx, rng):
+    return "GET", "/sightings", {"params": {"limit": 100}}
+
+
+def _list_fields(ctx, rng):
+    return "GET", "/sightings", {"params": {"limit": 1000, "fields": "id,time,latitude,longitude"}}
+
+
+def _get_by_id(ctx, rng):
+    return "GET", f"/sightings/{ctx.sighting(rng)['id']}", {}
+
+
+def _search_time(ctx, rng):
+    return "GET", "/sightings/search/time", {"params": ctx.window(rng, timedelta(days=1))}
+
+
+def _search_proximity(ctx, rng):
+    s = ctx.sighting(rng)
+    return "GET", "/sightings/search/proximity", {"params": {
+        "latitude": s["latitude"], "longitude": s["longitude"], "radius_km": rng.choice([1, 5, 25])}}
+
+
+def _search_combined(ctx, rng):
+    s = ctx.sighting(rng)
+    params = {**ctx.window(rng, timedelta(days=7)), "latitude": s["latitude"], "longitude": s["longitude"],
+              "radius_km": 50, "order_by": "distance", "limit": 500}
+    if s.get("unit"):
+        params["unit"] = s["unit"]
+    return "GET", "/sightings/search", {"params": params}
+
+
+def _search_text(ctx, rng):
+    return "GET", "/sightings/search/text", {"params": {"q": rng.choice(["convoy", "perimeter", "gate", "formation"]),
+                                                        "ascc": rng.choice(ctx.asccs)}}
+
+
+def _search_nearest(ctx, rng):
+    s = ctx.sighting(rng)
+    return "GET", "/sightings/search/nearest", {"params": {"latitude": s["latitude"], "longitude": s["longitude"], "k": 25}}
+
+
+def _search_mgrs_area(ctx, rng):
+    s = ctx.sighting(rng)
+    key = s.get("mgrs_1km") or ""
+    area = rng.choice([s.get("mgrs_100km"), key[:7], key]) or s.get("mgrs_gzd")
+    return "GET", "/sightings/search/mgrs/area", {"params": {"mgrs": area}}
+
+
+def _mgrs_convert(ctx, rng):
+    points = [[s["latitude"], s["longitude"]] for s in rng.sample(ctx.sightings, min(500, len(ctx.sightings)))]
+    return "POST", "/mgrs/convert", {"json": {"points": points}}
+
+
+def _stats(ctx, rng):
+    return "GET", "/sightings/stats", {"params": {"bucket": rng.choice(["day", "month"]), "days": 365}}
+
+
+def _histogram(ctx, rng):
+    s = ctx.sighting(rng)
+    params = {**ctx.window(rng, timedelta(days=30)), "bucket": rng.choice(["hour", "day"])}
+    if rng.random() < 0.5:
+        params.update(latitude=s["latitude"], longitude=s["longitude"], radius_km=50)
+    return "GET", "/sightings/histogram", {"params": params}
+
+
+def _tiles(ctx, rng):
+    s = ctx.sighting(rng)
+    return "GET", _tile(s["latitude"], s["longitude"], rng.randint(3, 16)), {}
+
+
+def _groups(ctx, rng):
+    return "GET", "/sightings/groups", {"params": ctx.window(rng, timedelta(days=7))}
+
+
+def _export(ctx, rng):
+    return "GET", "/sightings/export", {"params": {**ctx.window(rng, timedelta(days=7)),
+                                                   "format": rng.choice(["ndjson", "csv", "geojson"])}}
+
+
+def _llm_context(ctx, rng):
+    return "GET", "/llm/context", {"params": {"ascc": rng.choice(ctx.asccs)}}
+
+
+def _create(ctx, rng):
+    return "POST", "/sightings", {"json": ctx.generator.payload(1)[0]}
+
+
+def _bulk(ctx, rng):
+    return "POST", "/sightings/bulk", {"json": ctx.generator.payload(500)}
+
+
+def _upload(ctx, rng):
+    files = [("files", (f"bench-{rng.getrandbits(64):x}.jpg", _image(rng), "image/jpeg")) for _ in range(3)]
+    return "POST", "/upload_images", {"files": files}
+
+
+def _derivative(ctx, rng):
+    if not ctx.uploaded:
+        return _upload(ctx, rng)
+    return "GET", f"/images/{rng.choice(['thumb', 'preview'])}/{rng.choice(ctx.uploaded)}", {}
+
+
+def _delete(ctx, rng):
+    if not ctx.created_ids:
+        return _create(ctx, rng)
+    return "DELETE", f"/sightings/{ctx.created_ids.pop()}", {}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "list_page": _list_page,
+    "list_fields": _list_fields,
+    "get_by_id": _get_by_id,
+    "search_time": _search_time,
+    "search_proximity": _search_proximity,
+    "search_combined": _search_combined,
+    "search_text": _search_text,
+    "search_nearest": _search_nearest,
+    "search_mgrs_area": _search_mgrs_area,
+    "mgrs_convert": _mgrs_convert,
+    "stats": _stats,
+    "histogram": _histogram,
+    "tiles": _tiles,
+    "groups": _groups,
+    "export": _export,
+    "llm_context": _llm_context,
+    "create": _create,
+    "bulk_ingest": _bulk,
+    "upload_images": _upload,
+    "image_derivative": _derivative,
+    "delete": _delete,
+}
+GROUPS = {
+    "read": [name for name in SCENARIOS if name not in ("create", "bulk_ingest", "upload_images", "image_derivative", "delete")],
+    "write": ["create", "bulk_ingest", "delete"],
+    "images": ["upload_images", "image_derivative"],
+}
+GROUPS["all"] = GROUPS["read"] + GROUPS["write"] + GROUPS["images"]
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    queue.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """Peak resident memory of the server and its worker processes, sampled from /proc."""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.peak_kb = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def current_kb(self) -> int:
+        return sum(_status_kb(p, "VmRSS") for p in _process_tree(self.pid)) if self.pid else 0
+
+    def high_water_kb(self) -> int:
+        return sum(_status_kb(p, "VmHWM") for p in _process_tree(self.pid)) if self.pid else 0
+
+    async def _run(self):
+        while True:
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+    def start(self):
+        self.peak_kb = self.current_kb()
+        if self.pid:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Optional[float]:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return round(self.peak_kb / 1024.0, 1) if self.pid else None
+
+
+async def _send(client: httpx.AsyncClient, ctx: Context, name: str, method: str, path: str, kwargs: Dict) -> int:
+    response = await client.request(method, path, **kwargs)
+    await response.aread()
+    if response.status_code < 400:
+        # Feed later scenarios: ids to delete and uploads to derive from
+        if name in ("create", "delete") and method == "POST":
+            ctx.created_ids.append(response.json()["id"])
+        elif name == "bulk_ingest":
+            ctx.created_ids.extend(r["id"] for r in response.json()["results"] if r.get("id"))
+        elif method == "POST" and path == "/upload_images":
+            ctx.uploaded.extend(url.rsplit("/", 1)[-1] for url in response.json()["image_urls"])
+    return response.status_code
+
+
+async def run_scenario(client, ctx, name, concurrency, duration, warmup, seed, sampler) -> Dict:
+    scenario = SCENARIOS[name]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    recording = False
+
+    async def worker(index: int):
+        nonlocal errors
+        rng = random.Random(f"{seed}-{name}-{index}")
+        while True:
+            # Built off the event loop: generating upload images would otherwise stall every worker's timing
+            method, path, kwargs = await asyncio.to_thread(scenario, ctx, rng)
+            started = time.perf_counter()
+            try:
+                status = str(await _send(client, ctx, name, method, path, kwargs))
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if recording:
+                latencies.append(round(elapsed * 1000.0, 3))
+                statuses[status] = statuses.get(status, 0) + 1
+                if not status.isdigit() or int(status) >= 400:
+                    errors += 1
+
+    tasks = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+    await asyncio.sleep(warmup)
+    recording = True
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    recording = False
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    peak_rss = await sampler.stop()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "max": latencies[-1] if latencies else None,
+        },
+        "peak_rss_mb": peak_rss,
+    }
+
+
+async def _load_context(client: httpx.AsyncClient, seed: int) -> Context:
+    stats = (await client.get("/sightings/stats", params={"days": 3660})).raise_for_status().json()
+    if not stats["by_time"]:
+        raise SystemExit("No sightings to benchmark against; load some with benchmarks/datagen.py first")
+    sample: List[Dict] = []
+    cursor = None
+    while len(sample) < 5000:
+        params = {"limit": 1000, **({"cursor": cursor} if cursor else {})}
+        response = (await client.get("/sightings", params=params)).raise_for_status()
+        sample.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    return Context(sample, stats, seed)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_until_up(base_url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise SystemExit(f"Server at {base_url} did not come up within {timeout:.0f}s")
+
+
+async def run(args) -> Dict:
+    names = []
+    for item in args.scenarios.split(","):
+        names.extend(GROUPS.get(item, [item]))
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}. Known: {', '.join(SCENARIOS)} or {', '.join(GROUPS)}")
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    server = None
+    pid = args.server_pid
+    if args.spawn:
+        port = args.base_url.rsplit(":", 1)[-1].strip("/")
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", port,
+                                   "--workers", str(args.workers), "--log-level", "warning"], cwd=BACKEND_DIR)
+        pid = server.pid
+        await _wait_until_up(args.base_url)
+
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+            ctx = await _load_context(client, args.seed)
+            sampler = RSSSampler(pid)
+            results = {}
+            for name in names:
+                results[name] = await run_scenario(client, ctx, name, args.concurrency, args.duration,
+                                                   args.warmup, args.seed, sampler)
+                r = results[name]
+                print(f"{name:18} {r['requests']:7d} req {r['throughput_rps']:9.1f} rps  "
+                      f"p50 {r['latency_ms']['p50'] or 0:8.1f}  p95 {r['latency_ms']['p95'] or 0:8.1f}  "
+                      f"p99 {r['latency_ms']['p99'] or 0:8.1f} ms  errors {r['errors']}", file=sys.stderr)
+            high_water = sampler.high_water_kb()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    return {
+        "meta": {
+            "started_at": started_at,
+            "base_url": args.base_url,
+            "git_commit": _git_commit(),
+            "rows": ctx.total,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "workers": args.workers if args.spawn else None,
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+        },
+        "peak_rss_mb": round(high_water / 1024.0, 1) if pid else None,
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenarios", default="all", help=f"Comma-separated scenario or group names ({', '.join(GROUPS)})")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="Recorded seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unrecorded seconds before each scenario")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server-pid", type=int, help="Server process to sample RSS from (its workers are included)")
+    parser.add_argument("--spawn", action="store_true", help="Start uvicorn from backend/ for the run")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --spawn")
+    parser.add_argument("--output", type=Path, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import { FaUserPlus, FaUserEdit, FaDatabase, FaEye, FaTrash, FaEdit, FaMapMarkerAlt } from 'react-icons/fa';
 import './App.css';
+import { fetchAllSightings } from './api';
 
 const Admin = () => {
   const [activeTab, setActiveTab] = useState('users');
@@ -117,11 +118,8 @@ const Admin = () => {
   // Fetch sightings
   const fetchSightings = useCallback(async () => {
     try {
-      const response = await fetch(`${API_URL}/sightings`);
-      if (response.ok) {
-        const data = await response.json();
-        setSightings(data);
-      }
+      const data = await fetchAllSightings(API_URL);
+      setSightings(data);
     } catch (error) {
       console.error('Error fetching sightings:', error);
     }
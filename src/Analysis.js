@@ -2,6 +2,15 @@ import React, { useState, useRef, useEffect } from 'react';
 import { FaBrain, FaRobot, FaPaperPlane } from 'react-icons/fa';
 import './App.css';
 
+const filterInputStyle = {
+  padding: '0.4rem 0.5rem',
+  backgroundColor: '#2d2d2d',
+  color: '#E0E0E0',
+  border: '1px solid #555',
+  borderRadius: '6px',
+  fontFamily: 'inherit'
+};
+
 const Analysis = () => {
   const [messages, setMessages] = useState([
     {
@@ -11,6 +20,8 @@ const Analysis = () => {
   ]);
   const [inputMessage, setInputMessage] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // Which sightings the answer is grounded in; blank fields don't filter
+  const [contextFilters, setContextFilters] = useState({ start_time: '', end_time: '', unit: '' });
   const messagesEndRef = useRef(null);
 
   const API_URL = (process.env.REACT_APP_API_URL || 'http://localhost:8000').replace(/\/$/, '');
@@ -23,6 +34,19 @@ const Analysis = () => {
     scrollToBottom();
   }, [messages]);
 
+  const updateFilter = (name) => (e) => {
+    const value = e.target.value;
+    setContextFilters(prev => ({ ...prev, [name]: value }));
+  };
+
+  const buildContext = () => {
+    const context = {};
+    Object.entries(contextFilters).forEach(([name, value]) => {
+      if (value.trim()) context[name] = value.trim();
+    });
+    return context;
+  };
+
   const sendMessage = async () => {
     // Only send if there's a message and we're not already loading
     if (!inputMessage.trim() || isLoading) return;
@@ -50,7 +74,9 @@ const Analysis = () => {
           model: 'qwen-3-235b-a22b-instruct-2507',
           temperature: 0.7,
           top_p: 0.8,
-          max_completion_tokens: 20000
+          max_completion_tokens: 20000,
+          // Ground answers in the reporting database; the backend adds a summary of the sightings matching these filters
+          context: buildContext()
         })
       });
 
@@ -190,6 +216,51 @@ const Analysis = () => {
               <div ref={messagesEndRef} />
             </div>
 
+            {/* Context Filters */}
+            <div style={{
+              display: 'flex',
+              flexWrap: 'wrap',
+              alignItems: 'center',
+              gap: '0.75rem',
+              padding: '0.75rem 1rem',
+              marginBottom: '1rem',
+              backgroundColor: '#1a1a1a',
+              borderRadius: '8px',
+              border: '1px solid #333',
+              color: '#E0E0E0',
+              fontSize: '0.875rem'
+            }}>
+              <span style={{ color: '#FFFF00', fontWeight: 'bold' }}>Sightings in context</span>
+              <label>
+                From{' '}
+                <input
+                  type="datetime-local"
+                  value={contextFilters.start_time}
+                  onChange={updateFilter('start_time')}
+                  style={filterInputStyle}
+                />
+              </label>
+              <label>
+                To{' '}
+                <input
+                  type="datetime-local"
+                  value={contextFilters.end_time}
+                  onChange={updateFilter('end_time')}
+                  style={filterInputStyle}
+                />
+              </label>
+              <label>
+                Unit{' '}
+                <input
+                  type="text"
+                  value={contextFilters.unit}
+                  onChange={updateFilter('unit')}
+                  placeholder="All units"
+                  style={filterInputStyle}
+                />
+              </label>
+            </div>
+
             {/* Chat Input Area */}
             <div style={{ 
               display: 'flex', 
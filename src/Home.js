@@ -4,6 +4,7 @@ import L from 'leaflet';
 import 'leaflet/dist/leaflet.css';
 import './App.css';
 import UnitSelectionModal from './UnitSelectionModal';
+import { uploadImageResumable } from './api';
 
 // Custom component to handle map clicks
 function MapClickHandler({ onMapClick }) {
@@ -64,10 +65,10 @@ const Home = () => {
   // Function to fetch sightings count
   const fetchSightingsCount = async () => {
     try {
-      const response = await fetch(`${API_URL}/sightings`);
+      const response = await fetch(`${API_URL}/sightings/stats`);
       if (response.ok) {
         const data = await response.json();
-        setSightingsCount(data.length);
+        setSightingsCount(data.total);
       }
     } catch (error) {
       console.error('Error fetching sightings count:', error);
@@ -378,19 +379,10 @@ const Home = () => {
     try {
       setUploadBusy(true);
       setUploadError('');
-      const fd = new FormData();
-      photoFiles.forEach((f) => fd.append('files', f));
-      const res = await fetch(`${API_URL}/upload_images`, {
-        method: 'POST',
-        body: fd,
-      });
-      if (!res.ok) {
-        const text = await res.text();
-        throw new Error(`Upload failed ${res.status}: ${text}`);
-      }
-      const data = await res.json();
-      setImageUrls(data.image_urls || []);
-      setMessage(`Uploaded ${data.image_urls?.length || 0} image(s).`);
+      // Chunked and resumable, so a dropped field link doesn't restart the whole upload
+      const urls = await Promise.all(photoFiles.map((f) => uploadImageResumable(API_URL, f)));
+      setImageUrls(urls);
+      setMessage(`Uploaded ${urls.length} image(s).`);
     } catch (err) {
       console.error(err);
       setUploadError(err.message || String(err));
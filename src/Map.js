@@ -1,10 +1,11 @@
 import React, { useState, useEffect, useRef, useCallback } from 'react';
-import { MapContainer, TileLayer, Marker, Circle, Popup, useMapEvents } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Circle, Popup, useMap, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
 import 'leaflet-draw/dist/leaflet.draw.css';
 import L from 'leaflet';
 import 'leaflet-draw';
 import './App.css';
+import { fetchSightingTiles } from './api';
 import ms from 'milsymbol';
 
 // Fix default marker icons for leaflet
@@ -43,8 +44,47 @@ const createMilitarySymbolIcon = (symbolCode) => {
   }
 };
 
+// Count badge for a server-side cluster of sightings
+const createClusterIcon = (count) => {
+  const size = count < 10 ? 30 : count < 100 ? 36 : count < 1000 ? 42 : 48;
+  return L.divIcon({
+    className: 'sighting-cluster-marker',
+    html: `<div style="width: ${size}px; height: ${size}px; line-height: ${size}px; border-radius: 50%; background: rgba(255, 255, 0, 0.85); color: #000; font-weight: bold; text-align: center; border: 2px solid #000;">${count}</div>`,
+    iconSize: [size, size],
+    iconAnchor: [size / 2, size / 2]
+  });
+};
+
+// Reloads the viewport's tiles whenever the map stops moving
+function ViewportTileLoader({ onViewportChange }) {
+  const map = useMapEvents({
+    moveend: () => onViewportChange(map.getBounds(), map.getZoom()),
+  });
+  useEffect(() => {
+    onViewportChange(map.getBounds(), map.getZoom());
+  }, [map, onViewportChange]);
+  return null;
+}
+
+function ClusterMarkers({ clusters, militaryIcons }) {
+  const map = useMap();
+  return clusters.map((cluster) => (
+    <Marker
+      key={`cluster-${cluster.latitude}-${cluster.longitude}`}
+      position={[cluster.latitude, cluster.longitude]}
+      icon={cluster.count > 1
+        ? createClusterIcon(cluster.count)
+        : militaryIcons[cluster.symbol_code] || L.Icon.Default.prototype}
+      eventHandlers={{
+        click: () => map.setView([cluster.latitude, cluster.longitude], Math.min(map.getZoom() + 2, map.getMaxZoom()))
+      }}
+    />
+  ));
+}
+
 const Map = () => {
   const [sightings, setSightings] = useState([]);
+  const [clusters, setClusters] = useState([]);
   const [filteredSightings, setFilteredSightings] = useState([]);
   const [usingBackendResults, setUsingBackendResults] = useState(false);
   const [message, setMessage] = useState('');
@@ -68,14 +108,16 @@ const Map = () => {
     return `${year}-${month}-${day}T${hours}:${minutes}`;
   };
 
-  const fetchSightings = useCallback(async () => {
+  const latestTileRequest = useRef(0);
+
+  // Clusters at low zoom, individual sightings at high zoom, for the visible tiles only
+  const fetchSightings = useCallback(async (bounds, zoom) => {
+    const request = ++latestTileRequest.current;
     try {
-      const response = await fetch(`${API_URL}/sightings`);
-      if (response.ok) {
-        const data = await response.json();
-        setSightings(data);
-        setFilteredSightings(data);
-      }
+      const data = await fetchSightingTiles(API_URL, bounds, zoom);
+      if (request !== latestTileRequest.current) return;
+      setClusters(data.clusters);
+      setSightings(data.sightings);
     } catch (error) {
       console.error('Error fetching sightings:', error);
     }
@@ -175,25 +217,30 @@ const Map = () => {
   };
 
   useEffect(() => {
-    fetchSightings();
-  }, [fetchSightings]);
+    if (!usingBackendResults) {
+      setFilteredSightings(sightings);
+    }
+  }, [sightings, usingBackendResults]);
 
-  // Effect to create military icons for sightings
+  // Effect to create military icons for the symbol codes on the map, once per code
   useEffect(() => {
-    if (sightings.length === 0) return;
-    
-    const icons = {};
-    sightings.forEach((sighting) => {
-      if (sighting.symbol_code) {
+    const codes = new Set(
+      [...filteredSightings, ...clusters].map((item) => item.symbol_code).filter(Boolean)
+    );
+    setMilitaryIcons((icons) => {
+      const missing = [...codes].filter((code) => !icons[code]);
+      if (missing.length === 0) return icons;
+      const next = { ...icons };
+      missing.forEach((code) => {
         try {
-          icons[sighting.id] = createMilitarySymbolIcon(sighting.symbol_code);
+          next[code] = createMilitarySymbolIcon(code);
         } catch (error) {
-          console.error('Error creating icon for sighting', sighting.id, error);
+          console.error('Error creating icon for symbol', code, error);
         }
-      }
+      });
+      return next;
     });
-    setMilitaryIcons(icons);
-  }, [sightings]);
+  }, [filteredSightings, clusters]);
 
   return (
     <div className="map-page">
@@ -241,13 +288,19 @@ const Map = () => {
                 attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
               />
               <MapWithDrawControls />
+              <ViewportTileLoader onViewportChange={fetchSightings} />
+
+              {/* Server-side clusters; clicking one zooms in on it */}
+              {!usingBackendResults && (
+                <ClusterMarkers clusters={clusters} militaryIcons={militaryIcons} />
+              )}
               
               {/* Show markers for filtered sightings */}
               {filteredSightings.map((sighting) => (
                 <Marker
                   key={sighting.id}
                   position={[sighting.latitude, sighting.longitude]}
-                  icon={militaryIcons[sighting.id] || L.Icon.Default.prototype}
+                  icon={militaryIcons[sighting.symbol_code] || L.Icon.Default.prototype}
                 >
                   <Popup>
                     <div style={{ minWidth: '200px' }}>
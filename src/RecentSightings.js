@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import './App.css';
+import { fetchAllSightings, subscribeToSightingFeed } from './api';
 
 const RecentSightings = () => {
   const [sightings, setSightings] = useState([]);
@@ -30,12 +31,9 @@ const RecentSightings = () => {
 
   const fetchSightings = useCallback(async () => {
     try {
-      const response = await fetch(`${API_URL}/sightings`);
-      if (response.ok) {
-        const data = await response.json();
-        setSightings(data);
-        setFilteredSightings(data); // Initialize filtered sightings with all data
-      }
+      const data = await fetchAllSightings(API_URL);
+      setSightings(data);
+      setFilteredSightings(data); // Initialize filtered sightings with all data
     } catch (error) {
       console.error('Error fetching sightings:', error);
     }
@@ -190,6 +188,15 @@ const RecentSightings = () => {
     fetchSightings();
   }, [fetchSightings]);
 
+  // Apply pushed creates and deletes instead of re-fetching the whole list
+  useEffect(() => {
+    return subscribeToSightingFeed(API_URL, {
+      onCreated: (sighting) => setSightings((prev) => [sighting, ...prev.filter((s) => s.id !== sighting.id)]),
+      onDeleted: (sighting) => setSightings((prev) => prev.filter((s) => s.id !== sighting.id)),
+      onReset: fetchSightings,
+    });
+  }, [API_URL, fetchSightings]);
+
   // Effect to filter sightings when search query changes
   useEffect(() => {
     filterSightings(searchQuery);
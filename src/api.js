@@ -0,0 +1,110 @@
+// Fetch every sighting by following the X-Next-Cursor header page by page
+export const fetchAllSightings = async (apiUrl, pageSize = 1000) => {
+  const all = [];
+  let cursor = null;
+  do {
+    const params = new URLSearchParams({ limit: String(pageSize) });
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`${apiUrl}/sightings?${params.toString()}`);
+    if (!response.ok) {
+      throw new Error(`Failed to fetch sightings: ${response.status}`);
+    }
+    all.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  return all;
+};
+
+// Follow /sightings/feed; EventSource reconnects by itself and resumes from Last-Event-ID.
+// onReset means events were missed and the caller should reload. Returns a function that closes the feed.
+export const subscribeToSightingFeed = (apiUrl, { onCreated, onDeleted, onReset }, filters = {}) => {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') params.set(key, String(value));
+  });
+  const query = params.toString();
+  const source = new EventSource(`${apiUrl}/sightings/feed${query ? `?${query}` : ''}`);
+  source.addEventListener('created', (e) => onCreated && onCreated(JSON.parse(e.data).sighting));
+  source.addEventListener('deleted', (e) => onDeleted && onDeleted(JSON.parse(e.data).sighting));
+  source.addEventListener('reset', () => onReset && onReset());
+  return () => source.close();
+};
+
+// Slippy-map tile numbers covering a Leaflet LatLngBounds at zoom z
+export const tilesForBounds = (bounds, z) => {
+  const n = 2 ** z;
+  const clamp = (v) => Math.min(n - 1, Math.max(0, v));
+  const tileX = (lon) => clamp(Math.floor(((lon + 180) / 360) * n));
+  const tileY = (lat) => {
+    const rad = (Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI) / 180;
+    return clamp(Math.floor(((1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2) * n));
+  };
+  const tiles = [];
+  for (let x = tileX(bounds.getWest()); x <= tileX(bounds.getEast()); x++) {
+    for (let y = tileY(bounds.getNorth()); y <= tileY(bounds.getSouth()); y++) {
+      tiles.push({ z, x, y });
+    }
+  }
+  return tiles;
+};
+
+// Fetch the clustered tiles covering the viewport in parallel and merge them
+export const fetchSightingTiles = async (apiUrl, bounds, zoom) => {
+  const z = Math.max(0, Math.min(22, Math.round(zoom)));
+  const responses = await Promise.all(
+    tilesForBounds(bounds, z).map(async ({ x, y }) => {
+      const response = await fetch(`${apiUrl}/sightings/tiles/${z}/${x}/${y}`);
+      if (!response.ok) {
+        throw new Error(`Failed to fetch tile ${z}/${x}/${y}: ${response.status}`);
+      }
+      return response.json();
+    })
+  );
+  const clusters = [];
+  const byId = new Map();
+  responses.forEach((tile) => {
+    clusters.push(...tile.clusters);
+    tile.sightings.forEach((s) => byId.set(s.id, s));
+  });
+  return { clusters, sightings: [...byId.values()] };
+};
+
+// Upload one image in chunks; after a dropped connection, resume from the offset the server reports
+export const uploadImageResumable = async (apiUrl, file, maxRetries = 5) => {
+  const request = async (url, options) => {
+    const response = await fetch(url, options);
+    if (!response.ok) {
+      const text = await response.text();
+      const error = new Error(`Upload failed ${response.status}: ${text}`);
+      error.status = response.status;
+      throw error;
+    }
+    return response.json();
+  };
+  let session = await request(`${apiUrl}/uploads`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size }),
+  });
+  const base = `${apiUrl}/uploads/${session.upload_id}`;
+  let failures = 0;
+  while (session.offset < session.size) {
+    try {
+      session = await request(`${base}?offset=${session.offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(session.offset, session.offset + session.chunk_size),
+      });
+      failures = 0;
+    } catch (err) {
+      // 400 means the file was rejected; anything else is worth resuming
+      if (err.status === 400 || ++failures > maxRetries) {
+        throw err;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 1000 * failures));
+      session = await request(base);
+    }
+  }
+  const data = await request(`${base}/finalize`, { method: 'POST' });
+  return data.image_url;
+};